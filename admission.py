@@ -0,0 +1,238 @@
+"""Admission control and load shedding per route class.
+
+Each route class (search, export, bulk, read, write) gets its own concurrency
+limit and bounded wait queue so one burst of expensive calls cannot occupy
+every threadpool slot while cheap reads and health probes queue behind it.
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from prometheus_client import Counter, Gauge
+
+from config import Settings
+
+ROUTE_CLASSES = ("search", "export", "bulk", "read", "write")
+
+_EXEMPT_PREFIXES = ("/health", "/metrics", "/docs", "/redoc", "/openapi.json")
+_READ_METHODS = {"GET", "HEAD"}
+
+QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "Requests waiting for an admission slot.",
+    ["route_class"],
+)
+IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Requests currently holding an admission slot.",
+    ["route_class"],
+)
+REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Requests rejected by admission control.",
+    ["route_class", "reason"],
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted before its deadline."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def classify_route(method: str, path: str) -> Optional[str]:
+    """Return the route class for a request, or ``None`` if it is exempt."""
+    if path.startswith(_EXEMPT_PREFIXES):
+        return None
+    if path.startswith("/recipes/search"):
+        return "search"
+    if "/export" in path:
+        return "export"
+    if "/bulk" in path or path.startswith(("/shopping-list", "/admin/")):
+        return "bulk"
+    if method.upper() in _READ_METHODS:
+        return "read"
+    return "write"
+
+
+class AdmissionLimiter:
+    """Concurrency limiter with a bounded FIFO queue and deadline checks."""
+
+    def __init__(
+        self,
+        route_class: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+    ) -> None:
+        self.route_class = route_class
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Exponentially weighted service time, used to estimate queue wait.
+        self._service_time = 0.05
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self, position: int) -> float:
+        return position * self._service_time / self.max_concurrency
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.estimated_wait(self.queue_depth + 1)))
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejected:
+        REJECTIONS.labels(self.route_class, reason).inc()
+        return AdmissionRejected(status_code, reason, self._retry_after())
+
+    def _update_gauges(self) -> None:
+        QUEUE_DEPTH.labels(self.route_class).set(len(self._waiters))
+        IN_FLIGHT.labels(self.route_class).set(self.in_flight)
+
+    async def acquire(self, deadline: float) -> None:
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self._update_gauges()
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(429, "queue_full")
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or self.estimated_wait(len(self._waiters) + 1) > remaining:
+            raise self._reject(503, "deadline")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=remaining)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on.
+                self.release()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            self._update_gauges()
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            raise self._reject(503, "timeout") from None
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        if service_time is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * service_time
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot directly to the next waiter.
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self.in_flight = max(0, self.in_flight - 1)
+        self._update_gauges()
+
+
+class AdmissionController:
+    """Holds one limiter per route class."""
+
+    def __init__(self, settings: Settings) -> None:
+        self.queue_timeout = settings.admission_queue_timeout
+        self.limiters: Dict[str, AdmissionLimiter] = {
+            route_class: AdmissionLimiter(
+                route_class,
+                settings.admission_concurrency.get(route_class, 8),
+                settings.admission_queue_sizes.get(route_class, 0),
+                settings.admission_queue_timeout,
+            )
+            for route_class in ROUTE_CLASSES
+        }
+
+    def limiter_for(self, method: str, path: str) -> Optional[AdmissionLimiter]:
+        route_class = classify_route(method, path)
+        if route_class is None:
+            return None
+        return self.limiters[route_class]
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {"in_flight": limiter.in_flight, "queued": limiter.queue_depth}
+            for name, limiter in self.limiters.items()
+        }
+
+
+def _request_deadline(scope, queue_timeout: float) -> float:
+    """Combine the configured queue timeout with an optional client deadline."""
+    timeout = queue_timeout
+    for name, value in scope.get("headers", []):
+        if name == b"x-request-timeout":
+            try:
+                timeout = min(timeout, float(value.decode("latin-1")))
+            except ValueError:
+                pass
+            break
+    return time.monotonic() + timeout
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware that admits, queues or sheds requests by route class."""
+
+    def __init__(self, app, controller: AdmissionController) -> None:
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.controller.limiter_for(scope["method"], scope["path"])
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire(
+                _request_deadline(scope, self.controller.queue_timeout)
+            )
+        except AdmissionRejected as rejected:
+            await _send_rejection(send, rejected)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.monotonic() - started)
+
+
+async def _send_rejection(send, rejected: AdmissionRejected) -> None:
+    body = json.dumps(
+        {"detail": "Server is busy, retry later", "reason": rejected.reason}
+    ).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": rejected.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(rejected.retry_after).encode("latin-1")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,23 @@
+"""Shared-secret guard for operational endpoints (profiling, backups)."""
+
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from config import get_settings
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def admin_token_matches(candidate: Optional[str], expected: str) -> bool:
+    """Constant-time token check; an unset ``ADMIN_TOKEN`` never matches."""
+    if not expected or not candidate:
+        return False
+    return hmac.compare_digest(candidate.encode("utf-8"), expected.encode("utf-8"))
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """FastAPI dependency; responds 404 so operational routes stay hidden."""
+    if not admin_token_matches(x_admin_token, get_settings().admin_token):
+        raise HTTPException(status_code=404, detail="Not Found")
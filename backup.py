@@ -0,0 +1,349 @@
+"""Online backups and snapshot restore for the SQLite database.
+
+:func:`create_backup` copies the live database with SQLite's online backup
+API while the app keeps serving:
+
+* the copy moves ``BACKUP_STEP_PAGES`` pages per step and sleeps
+  ``BACKUP_STEP_SLEEP_MS`` between steps. It never holds the disk, or the
+  source for long, so foreground latency does not notice it;
+* in WAL mode (the default, see ``SQLITE_WAL``) every step reads inside one
+  read transaction, so the backup is a point-in-time snapshot of the moment
+  it started. Writers keep committing to the WAL meanwhile and are never
+  blocked. In rollback-journal mode a commit during the copy restarts it.
+
+Each backup is written to ``BACKUP_DIR`` as ``recipes-<UTC time>.db``. It
+is switched to rollback-journal mode, so it is one self-contained file. A
+``.json`` manifest next to it records its SHA-256, size, data stamp and
+timing. Only the newest ``BACKUP_KEEP`` backups are kept. :func:`verify`
+re-hashes a backup and runs ``PRAGMA quick_check``.
+
+:func:`restore` verifies a backup, copies it into a new file next to the
+live database and returns that file's URL. :func:`database.swap_engine` then
+points new sessions at it; the live file is left untouched. The recipes
+stamp in the restored copy is moved past both the live one and its own, so
+a catalog built from the replaced data can never match it. The copy is
+migrated to the current schema before it is served, and a backup written by
+newer code (a higher ``schema_version``) is refused. Point
+``DATABASE_URL`` at the restored file to keep it across restarts::
+
+    python -m backup create
+    python -m backup list
+    python -m backup verify recipes-20261019T101500123456Z.db
+    python -m backup restore recipes-20261019T101500123456Z.db
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from prometheus_client import Gauge
+from sqlalchemy import create_engine
+
+import database
+import migrations
+from catalog import STAMP_NAME
+from config import get_settings
+
+settings = get_settings()
+
+_NAME = re.compile(r"^recipes-\d{8}T\d{12}Z\.db$")
+
+LAST_BACKUP = Gauge(
+    "database_backup_last_success_timestamp_seconds",
+    "Unix time the last successful database backup finished.",
+)
+BACKUP_DURATION = Gauge(
+    "database_backup_duration_seconds", "Duration of the last successful backup."
+)
+
+
+class BackupError(Exception):
+    """A backup could not be taken, or failed verification."""
+
+
+class BackupNotFoundError(BackupError):
+    """No backup with that name exists."""
+
+
+def database_path(engine) -> str:
+    path = engine.url.database
+    if engine.dialect.name != "sqlite" or path in (None, "", ":memory:"):
+        raise BackupError("online backups need a file-backed SQLite database")
+    return os.path.abspath(path)
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fsync(path: str) -> None:
+    with open(path, "rb") as handle:
+        os.fsync(handle.fileno())
+
+
+def _read_only(path: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+
+
+def _scalar(connection: sqlite3.Connection, sql: str, *params):
+    try:
+        row = connection.execute(sql, params).fetchone()
+    except sqlite3.OperationalError:  # table not created in this database
+        return None
+    return row[0] if row else None
+
+
+def _read_stamp(connection: sqlite3.Connection) -> Optional[int]:
+    return _scalar(
+        connection, "SELECT version FROM data_stamps WHERE name = ?", STAMP_NAME
+    )
+
+
+def backup_path(name: str, directory: Optional[str] = None) -> str:
+    path = os.path.join(directory or settings.backup_dir, name)
+    if not _NAME.match(name) or not os.path.exists(path):
+        raise BackupNotFoundError(f"unknown backup {name!r}")
+    return path
+
+
+def list_backups(directory: Optional[str] = None) -> List[Dict[str, object]]:
+    """Manifests of every backup in ``directory``, newest first."""
+    directory = directory or settings.backup_dir
+    if not os.path.isdir(directory):
+        return []
+    manifests = []
+    for entry in sorted(os.listdir(directory), reverse=True):
+        if _NAME.match(entry) and os.path.exists(os.path.join(directory, entry)):
+            manifest_path = os.path.join(directory, entry + ".json")
+            try:
+                with open(manifest_path) as handle:
+                    manifests.append(json.load(handle))
+            except (OSError, ValueError):
+                manifests.append({"name": entry})
+    return manifests
+
+
+def prune(directory: str, keep: int) -> List[str]:
+    """Delete all but the newest ``keep`` backups; returns the removed names."""
+    removed = []
+    for manifest in list_backups(directory)[keep:]:
+        name = str(manifest["name"])
+        for path in (name, name + ".json"):
+            try:
+                os.unlink(os.path.join(directory, path))
+            except FileNotFoundError:
+                pass
+        removed.append(name)
+    return removed
+
+
+def create_backup(
+    engine=None,
+    directory: Optional[str] = None,
+    step_pages: Optional[int] = None,
+    step_sleep: Optional[float] = None,
+) -> Dict[str, object]:
+    """Copy the live database into a new backup, a few pages at a time."""
+    source_path = database_path(engine if engine is not None else database.engine)
+    directory = directory or settings.backup_dir
+    step_pages = step_pages or settings.backup_step_pages
+    if step_sleep is None:
+        step_sleep = settings.backup_step_sleep_ms / 1000
+    os.makedirs(directory, exist_ok=True)
+    name = f"recipes-{_timestamp()}.db"
+    path = os.path.join(directory, name)
+    partial = path + ".partial"
+    steps = 0
+
+    def throttle(status, remaining, total) -> None:
+        nonlocal steps
+        steps += 1
+        if remaining and step_sleep:
+            time.sleep(step_sleep)
+
+    started = time.perf_counter()
+    with closing(sqlite3.connect(source_path, isolation_level=None)) as source, closing(
+        sqlite3.connect(partial)
+    ) as target:
+        source.execute(f"PRAGMA busy_timeout = {int(settings.sqlite_busy_timeout_ms)}")
+        point_in_time = source.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        if point_in_time:
+            # Pin one WAL read snapshot for every step of the copy.
+            source.execute("BEGIN")
+        stamp = _read_stamp(source)
+        schema_version = _scalar(source, "SELECT max(version) FROM schema_migrations")
+        source.backup(target, pages=step_pages, progress=throttle)
+        if point_in_time:
+            source.execute("COMMIT")
+        target.execute("PRAGMA journal_mode = DELETE")
+    _fsync(partial)
+    os.replace(partial, path)
+    duration = time.perf_counter() - started
+
+    manifest = {
+        "name": name,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "source": source_path,
+        "bytes": os.path.getsize(path),
+        "sha256": _sha256(path),
+        "stamp": stamp,
+        "schema_version": schema_version,
+        "point_in_time": point_in_time,
+        "steps": steps,
+        "duration_s": round(duration, 3),
+    }
+    with open(path + ".json.partial", "w") as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    os.replace(path + ".json.partial", path + ".json")
+    prune(directory, settings.backup_keep)
+    LAST_BACKUP.set(time.time())
+    BACKUP_DURATION.set(duration)
+    return manifest
+
+
+def verify(name: str, directory: Optional[str] = None) -> Dict[str, object]:
+    """Compare a backup with its manifest checksum and check its pages."""
+    path = backup_path(name, directory)
+    try:
+        with open(path + ".json") as handle:
+            expected = json.load(handle).get("sha256")
+    except (OSError, ValueError):
+        expected = None
+    checksum = _sha256(path)
+    try:
+        with closing(_read_only(path)) as connection:
+            integrity = connection.execute("PRAGMA quick_check").fetchone()[0]
+    except sqlite3.DatabaseError as exc:
+        integrity = str(exc)
+    checksum_ok = checksum == expected
+    return {
+        "name": name,
+        "sha256": checksum,
+        "checksum_ok": checksum_ok,
+        "integrity": integrity,
+        "ok": checksum_ok and integrity == "ok",
+    }
+
+
+def _upgrade(path: str) -> List[int]:
+    """Bring a restored copy to the current schema, as startup does."""
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        database.Base.metadata.create_all(bind=engine)
+        return migrations.upgrade(engine)
+    finally:
+        engine.dispose()
+
+
+def restore(
+    name: str, engine=None, directory: Optional[str] = None
+) -> Dict[str, object]:
+    """Copy a verified backup into a new file beside the live database.
+
+    The copy is migrated to the current schema before it is moved into
+    place. A backup from newer code than this is refused. Returns the new
+    file's ``database_url`` for :func:`database.swap_engine`.
+    """
+    report = verify(name, directory)
+    if not report["ok"]:
+        raise BackupError(
+            f"{name} failed verification (checksum_ok={report['checksum_ok']}, "
+            f"integrity={report['integrity']!r})"
+        )
+    supported = max(migration.version for migration in migrations.MIGRATIONS)
+    with closing(_read_only(backup_path(name, directory))) as source:
+        schema_version = _scalar(
+            source, f"SELECT max(version) FROM {migrations.VERSION_TABLE}"
+        )
+    if (schema_version or 0) > supported:
+        raise BackupError(
+            f"{name} has schema version {schema_version}; this code supports "
+            f"up to {supported}"
+        )
+    live_path = database_path(engine if engine is not None else database.engine)
+    root, extension = os.path.splitext(live_path)
+    target = f"{root}.restored-{_timestamp()}{extension or '.db'}"
+    partial = target + ".partial"
+    with closing(_read_only(backup_path(name, directory))) as source, closing(
+        sqlite3.connect(partial, isolation_level=None)
+    ) as copy:
+        source.backup(copy)
+        with closing(_read_only(live_path)) as live:
+            live_stamp = _read_stamp(live) or 0
+        stamp = _read_stamp(copy)
+        if stamp is not None:
+            stamp = max(stamp, live_stamp) + 1
+            copy.execute(
+                "INSERT INTO data_stamps (name, version) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET version = excluded.version",
+                (STAMP_NAME, stamp),
+            )
+    try:
+        applied = _upgrade(partial)
+    except Exception:
+        os.unlink(partial)
+        raise
+    _fsync(partial)
+    os.replace(partial, target)
+    return {
+        "name": name,
+        "database": target,
+        "database_url": f"sqlite:///{target}",
+        "stamp": stamp,
+        "migrations_applied": applied,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    command = args[0] if args else "list"
+    try:
+        if command == "create":
+            result = create_backup()
+            print(
+                f"{result['name']}: {result['bytes']} bytes in "
+                f"{result['duration_s']}s, sha256 {result['sha256']}"
+            )
+        elif command == "list":
+            for manifest in list_backups():
+                print(
+                    f"{manifest['name']}  {manifest.get('bytes', '?'):>12}  "
+                    f"stamp={manifest.get('stamp')}"
+                )
+        elif command == "verify" and len(args) > 1:
+            report = verify(args[1])
+            print(json.dumps(report, indent=2))
+            return 0 if report["ok"] else 1
+        elif command == "restore" and len(args) > 1:
+            result = restore(args[1])
+            print(f"restored into {result['database']}")
+            print(f"serve it with DATABASE_URL={result['database_url']}")
+        else:
+            print(
+                "usage: python -m backup [create|list|verify NAME|restore NAME]",
+                file=sys.stderr,
+            )
+            return 2
+    except BackupError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""Database size, page-cache hit rate and read latency per text storage mode.
+
+Seeds one database with recipes whose ingredients and instructions look like
+real ones (shared phrases, varying amounts), then copies it once per mode:
+plain text, zlib, zlib with a trained dictionary, and zstd (with and without
+a dictionary) when ``zstandard`` is installed. Each copy is migrated with
+``compression.migrate`` and vacuumed. Two workloads then run on one
+connection with a deliberately small page cache:
+
+* ``facet scan``: the columns a listing filters and shows (no text);
+* ``point reads``: ingredients and instructions for random ids, decoded.
+
+Hit rate comes from SQLite's own ``SQLITE_DBSTATUS_CACHE_HIT``/``MISS``
+counters, read through ``ctypes``. Where that is unavailable it is reported
+as ``n/a``. Read-model documents are not part of this comparison.
+
+Run with::
+
+    PYTHONPATH=. python benchmarks/bench_compression.py [--recipes 20000]
+"""
+
+import argparse
+import ctypes
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.orm import Session
+
+import compression
+import models
+from config import Settings
+from database import Base
+
+SQLITE_DBSTATUS_CACHE_HIT = 7
+SQLITE_DBSTATUS_CACHE_MISS = 8
+CUISINES = ["Italian", "Thai", "Mexican", "Greek", "Indian", "Japanese"]
+PANTRY = [
+    "all-purpose flour",
+    "unsalted butter",
+    "extra virgin olive oil",
+    "garlic cloves, minced",
+    "yellow onion, diced",
+    "kosher salt",
+    "freshly ground black pepper",
+    "granulated sugar",
+    "large eggs",
+    "whole milk",
+    "chicken stock",
+    "canned tomatoes",
+    "fresh basil leaves",
+    "ground cumin",
+    "lemon juice",
+]
+STEPS = [
+    "Preheat the oven to 200C and line a baking tray with parchment.",
+    "Heat the oil in a large pan over medium heat.",
+    "Add the onion and garlic and cook until soft, about 5 minutes.",
+    "Season generously with salt and pepper.",
+    "Stir in the remaining ingredients and bring to a simmer.",
+    "Cover and cook for 20 minutes, stirring occasionally.",
+    "Transfer to the oven and bake until golden.",
+    "Rest for 10 minutes before serving.",
+]
+
+
+def _recipe(rng: random.Random, index: int) -> dict:
+    ingredients = "\n".join(
+        f"{rng.choice(['1', '2', '3', '1/2', '1/4'])} "
+        f"{rng.choice(['cups', 'tbsp', 'tsp', 'g', ''])} {item}".replace("  ", " ")
+        for item in rng.sample(PANTRY, rng.randint(5, 10))
+    )
+    steps = rng.sample(STEPS, rng.randint(4, len(STEPS)))
+    instructions = " ".join(f"{n}. {step}" for n, step in enumerate(steps, 1))
+    return {
+        "title": f"Recipe {index}",
+        "ingredients": ingredients,
+        "instructions": instructions,
+        "cuisine": rng.choice(CUISINES),
+        "meal_type": rng.choice(["Breakfast", "Lunch", "Dinner"]),
+    }
+
+
+def _engine(path: str):
+    return create_engine(f"sqlite:///{path}")
+
+
+def _use(mode: str, dictionary_id: int = 0) -> None:
+    compression.settings = Settings(
+        text_compression=mode,
+        text_compression_min_bytes=64,
+        text_compression_dictionary=dictionary_id,
+    )
+
+
+def _status_reader():
+    """``read(connection) -> (hits, misses)`` or ``None`` if unavailable."""
+    try:
+        import _sqlite3
+
+        library = ctypes.CDLL(_sqlite3.__file__)
+        db_status = library.sqlite3_db_status
+        filename = library.sqlite3_db_filename
+    except (ImportError, OSError, AttributeError):
+        return None
+    db_status.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_int,
+        ctypes.POINTER(ctypes.c_int),
+        ctypes.POINTER(ctypes.c_int),
+        ctypes.c_int,
+    ]
+    filename.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+    filename.restype = ctypes.c_char_p
+
+    def read(connection, path: str, reset: bool = False):
+        # CPython's sqlite3.Connection keeps its ``sqlite3 *`` first.
+        handle = ctypes.c_void_p.from_address(
+            id(connection) + object.__basicsize__
+        ).value
+        if not handle or filename(handle, b"main") != os.path.abspath(path).encode():
+            return None
+        values = []
+        for op in (SQLITE_DBSTATUS_CACHE_HIT, SQLITE_DBSTATUS_CACHE_MISS):
+            current, high = ctypes.c_int(), ctypes.c_int()
+            db_status(handle, op, ctypes.byref(current), ctypes.byref(high), reset)
+            values.append(current.value)
+        return tuple(values)
+
+    return read
+
+
+def _measure(path: str, reads: int, cache_kib: int, status) -> dict:
+    engine = _engine(path)
+    rng = random.Random(7)
+    recipes = models.Recipe.__table__
+    with engine.connect() as conn:
+        raw = conn.connection.driver_connection
+        conn.exec_driver_sql(f"PRAGMA cache_size = -{cache_kib}")
+        max_id = conn.scalar(select(recipes.c.id).order_by(recipes.c.id.desc()))
+        if status:
+            status(raw, path, reset=True)
+        started = time.perf_counter()
+        for cuisine in CUISINES:
+            conn.execute(
+                select(recipes.c.id, recipes.c.title, recipes.c.cuisine).where(
+                    recipes.c.cuisine == cuisine
+                )
+            ).all()
+        scan_ms = (time.perf_counter() - started) * 1000
+        latencies = []
+        for _ in range(reads):
+            recipe_id = rng.randint(1, max_id)
+            started = time.perf_counter()
+            conn.execute(
+                select(recipes.c.ingredients, recipes.c.instructions).where(
+                    recipes.c.id == recipe_id
+                )
+            ).one()
+            latencies.append((time.perf_counter() - started) * 1e6)
+        counters = status(raw, path) if status else None
+    engine.dispose()
+    hit_rate = "n/a"
+    if counters and sum(counters):
+        hit_rate = f"{counters[0] / sum(counters):.1%}"
+    latencies.sort()
+    return {
+        "size_kib": os.path.getsize(path) / 1024,
+        "hit_rate": hit_rate,
+        "scan_ms": scan_ms,
+        "p50_us": statistics.median(latencies),
+        "p95_us": latencies[int(len(latencies) * 0.95)],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=20000)
+    parser.add_argument("--reads", type=int, default=5000)
+    parser.add_argument("--cache-kib", type=int, default=1024)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-compression-")
+    try:
+        base = os.path.join(workdir, "seed.db")
+        engine = _engine(base)
+        Base.metadata.create_all(engine)
+        rng = random.Random(42)
+        _use("off")
+        with engine.begin() as conn:
+            conn.execute(
+                insert(models.Recipe.__table__),
+                [_recipe(rng, index) for index in range(args.recipes)],
+            )
+        engine.dispose()
+
+        modes = [("plain", "off", None), ("zlib", "zlib", None)]
+        modes.append(("zlib + dictionary", "zlib", "zlib"))
+        if compression.zstandard is not None:
+            modes += [("zstd", "zstd", None), ("zstd + dictionary", "zstd", "zstd")]
+        status = _status_reader()
+        print(
+            f"{args.recipes} recipes, {args.reads} point reads, "
+            f"{args.cache_kib} KiB page cache"
+        )
+        print(
+            f"{'mode':<18} {'db KiB':>9} {'cache hit':>9} {'scan ms':>8} "
+            f"{'p50 us':>7} {'p95 us':>7}"
+        )
+        for label, mode, dictionary_codec in modes:
+            path = os.path.join(workdir, f"{label.replace(' ', '')}.db")
+            shutil.copy(base, path)
+            engine = _engine(path)
+            with Session(engine) as db:
+                dictionary_id = 0
+                if dictionary_codec:
+                    dictionary_id = compression.train(db, codec=dictionary_codec)
+                    db.commit()
+                _use(mode, dictionary_id)
+                compression.migrate(db, chunk_size=1000)
+            with engine.connect() as conn:
+                conn.execute(text("VACUUM"))
+            engine.dispose()
+            result = _measure(path, args.reads, args.cache_kib, status)
+            print(
+                f"{label:<18} {result['size_kib']:>9.0f} {result['hit_rate']:>9} "
+                f"{result['scan_ms']:>8.1f} {result['p50_us']:>7.1f} "
+                f"{result['p95_us']:>7.1f}"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Per-call Python overhead of the ``RecipeRepository`` hot paths.
+
+Seeds a small database (so SQLite itself is cheap), then calls each hot
+path many times on one session. Time spent inside the DBAPI ``execute``
+is measured separately through cursor events. The remainder is what the
+ORM and SQL construction cost per call: building the statement, cache-key
+generation, compilation (or a compiled-cache hit) and result processing.
+
+Run it on two checkouts to compare them::
+
+    PYTHONPATH=. python benchmarks/bench_repository.py [--calls 2000]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+import counts
+import read_model
+from crud import RecipeRepository
+from database import Base
+from models import Recipe, Tag, User
+
+
+def _seed(engine, recipes: int) -> None:
+    with Session(engine) as db:
+        tags = [Tag(name=f"tag-{index}") for index in range(20)]
+        users = [User(email=f"cook{index}@example.com") for index in range(20)]
+        db.add_all(tags + users)
+        db.add_all(
+            Recipe(
+                title=f"Recipe {index}",
+                ingredients="2 cups rice, 1 onion",
+                instructions="Simmer.",
+                cuisine=f"Cuisine {index % 6}",
+                meal_type=("Breakfast", "Lunch", "Dinner")[index % 3],
+                owner=users[index % len(users)],
+                tags=[tags[index % len(tags)], tags[(index + 1) % len(tags)]],
+            )
+            for index in range(recipes)
+        )
+        db.commit()
+        read_model.rebuild(db)
+        counts.rebuild(db)
+        db.commit()
+
+
+class _SqlTimer:
+    """Time spent between ``before_`` and ``after_cursor_execute``."""
+
+    def __init__(self, engine) -> None:
+        self.seconds = 0.0
+        self.statements = 0
+        self._started = 0.0
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _before(self, *args) -> None:
+        self._started = time.perf_counter()
+
+    def _after(self, *args) -> None:
+        self.seconds += time.perf_counter() - self._started
+        self.statements += 1
+
+
+def _paths(recipes: int):
+    ids = list(range(1, 51))
+
+    def get(repository, index):
+        return repository.get(index % recipes + 1)
+
+    def get_document(repository, index):
+        return repository.get_document(index % recipes + 1)
+
+    def list_page(repository, index):
+        return repository.document_head(skip=(index % 50) * 20, size=20)
+
+    def filter_all(repository, index):
+        return repository.filter_documents(
+            meal_type="Dinner", cuisine=f"Cuisine {index % 6}"
+        )
+
+    def batch_get(repository, index):
+        return repository.ingredients_for(ids)
+
+    def tag_resolution(repository, index):
+        return repository._ensure_tags(["tag-1", "tag-2", f"new-{index % 5}"])
+
+    return [
+        ("get (ORM)", get, True),
+        ("get document", get_document, False),
+        ("list page", list_page, False),
+        ("filter", filter_all, False),
+        ("batch get", batch_get, False),
+        ("tag resolution", tag_resolution, True),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=2000)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    descriptor, path = tempfile.mkstemp(suffix=".db")
+    os.close(descriptor)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(engine)
+        _seed(engine, args.recipes)
+        timer = _SqlTimer(engine)
+        print(f"{args.recipes} recipes, {args.calls} calls per path")
+        print(
+            f"{'path':<18} {'total us':>9} {'sql us':>8} {'python us':>10} "
+            f"{'stmts':>6}"
+        )
+        with Session(engine) as db:
+            repository = RecipeRepository(db)
+            for label, call, reset in _paths(args.recipes):
+                for index in range(50):  # warm the compiled cache
+                    call(repository, index)
+                    if reset:
+                        db.rollback()
+                totals = []
+                timer.seconds, timer.statements = 0.0, 0
+                for index in range(args.calls):
+                    started = time.perf_counter()
+                    call(repository, index)
+                    totals.append(time.perf_counter() - started)
+                    if reset:
+                        # Fresh identity map, as in a new request.
+                        db.rollback()
+                        db.expunge_all()
+                total_us = statistics.mean(totals) * 1e6
+                sql_us = timer.seconds / args.calls * 1e6
+                print(
+                    f"{label:<18} {total_us:>9.1f} {sql_us:>8.1f} "
+                    f"{total_us - sql_us:>10.1f} "
+                    f"{timer.statements / args.calls:>6.1f}"
+                )
+    finally:
+        engine.dispose()
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compare plain ``StaticFiles``/``FileResponse`` with the precompressed setup.
+
+Builds a synthetic React-like build directory, then measures requests per
+second and bytes on the wire for a hashed JS bundle and for SPA navigations::
+
+    PYTHONPATH=. python benchmarks/bench_static.py [--requests 500]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import FileResponse
+from fastapi.staticfiles import StaticFiles
+from fastapi.testclient import TestClient
+
+import static_assets
+
+BROWSER_HEADERS = {"accept-encoding": "gzip, deflate, br"}
+
+
+def _make_build(root: str) -> None:
+    js_dir = os.path.join(root, "static", "js")
+    os.makedirs(js_dir)
+    bundle = "".join(
+        f"function component{i}(props){{return props.recipes.map(r=>r.title+{i});}}\n"
+        for i in range(8000)
+    )
+    with open(os.path.join(js_dir, "main.1a2b3c4d.js"), "w") as handle:
+        handle.write(bundle)
+    with open(os.path.join(root, "index.html"), "w") as handle:
+        handle.write("<!doctype html><html><head>" + "<meta>" * 200 + "</head></html>")
+    static_assets.precompress(root)
+
+
+def _baseline_app(root: str) -> FastAPI:
+    """Mirror of the previous main.py wiring."""
+    app = FastAPI()
+    app.mount(
+        "/static", StaticFiles(directory=os.path.join(root, "static")), name="static"
+    )
+
+    @app.get("/{full_path:path}")
+    async def serve_react_app(full_path: str):
+        return FileResponse(os.path.join(root, "index.html"))
+
+    return app
+
+
+def _optimized_app(root: str) -> FastAPI:
+    app = FastAPI()
+    static_assets.mount_frontend(app, root)
+    return app
+
+
+def _measure(client: TestClient, path: str, requests: int, revalidate: bool):
+    transferred = 0
+    etag = None
+    started = time.perf_counter()
+    for _ in range(requests):
+        headers = dict(BROWSER_HEADERS)
+        if revalidate and etag:
+            headers["if-none-match"] = etag
+        response = client.get(path, headers=headers)
+        # Count encoded bytes as a browser would receive them.
+        transferred += int(response.headers.get("content-length", 0))
+        etag = response.headers.get("etag")
+    elapsed = time.perf_counter() - started
+    return requests / elapsed, transferred / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        _make_build(root)
+        cases = (
+            ("/static/js/main.1a2b3c4d.js", False),
+            ("/recipes-browser", False),
+            ("/recipes-browser", True),
+        )
+        print(f"{'app':<10} {'path':<28} {'etag':<5} {'req/s':>8} {'bytes/req':>10}")
+        apps = (("baseline", _baseline_app), ("optimized", _optimized_app))
+        for name, factory in apps:
+            with TestClient(factory(root)) as client:
+                for path, revalidate in cases:
+                    rate, size = _measure(client, path, args.requests, revalidate)
+                    print(
+                        f"{name:<10} {path:<28} {str(revalidate):<5} "
+                        f"{rate:>8.0f} {size:>10.0f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
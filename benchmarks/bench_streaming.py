@@ -0,0 +1,106 @@
+"""Peak RSS and time-to-first-byte for very large recipe pages.
+
+Seeds a temporary database, then requests ``GET /recipes/?limit=N`` once
+buffered (stream threshold above N) and once streamed, each in a fresh
+process so the peak-RSS figures do not contaminate each other::
+
+    PYTHONPATH=. python benchmarks/bench_streaming.py [--recipes 50000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = r"""
+import json, sys, time
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+import main, streaming
+
+limit = int(sys.argv[1])
+with TestClient(main.app) as client:
+    started = time.perf_counter()
+    response = client.get("/recipes/", params={"limit": limit})
+    total = time.perf_counter() - started
+# TestClient buffers the body, so first-byte time comes from the server metric.
+first_byte = sum(
+    REGISTRY.get_sample_value(
+        "recipes_response_first_byte_seconds_sum", {"mode": mode}
+    ) or 0.0
+    for mode in ("buffered", "streamed")
+)
+print(json.dumps({
+    "first_byte": first_byte,
+    "total": total,
+    "bytes": len(response.content),
+    "peak_rss": streaming.peak_rss_bytes(),
+}))
+"""
+
+
+def _seed(database: str, count: int) -> None:
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{database}"}
+    script = (
+        "import main, read_model\n"
+        "from database import SessionLocal\n"
+        "from models import Recipe\n"
+        "with SessionLocal() as db:\n"
+        f"    db.add_all(Recipe(title=f'Recipe {{i}}', ingredients='flour, water, "
+        f"salt, yeast', instructions='Knead and bake. ' * 20, cuisine='Test') "
+        f"for i in range({count}))\n"
+        "    db.commit()\n"
+        "    read_model.rebuild(db)\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=REPO_ROOT, env=env, check=True)
+
+
+def _run(database: str, limit: int, threshold: int) -> dict:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{database}",
+        "RECIPES_MAX_PAGE_SIZE": str(limit),
+        "RECIPES_STREAM_THRESHOLD": str(threshold),
+        "OUTBOX_WORKER_ENABLED": "0",
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD, str(limit)],
+        cwd=REPO_ROOT,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recipes", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = os.path.join(workdir, "bench.db")
+        started = time.perf_counter()
+        _seed(database, args.recipes)
+        print(f"seeded {args.recipes} recipes in {time.perf_counter() - started:.1f}s")
+        print(
+            f"{'mode':<10} {'ttfb ms':>9} {'total ms':>9} {'MB sent':>8} "
+            f"{'peak RSS MB':>12}"
+        )
+        for mode, threshold in (("buffered", args.recipes + 1), ("streamed", 500)):
+            result = _run(database, args.recipes, threshold)
+            print(
+                f"{mode:<10} {result['first_byte'] * 1000:>9.1f} "
+                f"{result['total'] * 1000:>9.1f} {result['bytes'] / 1e6:>8.1f} "
+                f"{result['peak_rss'] / 1e6:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""Memory-mapped columnar catalog for serving recipe reads without SQLite.
+
+With ``CATALOG_PATH`` set, ``get``, ``list`` and ``filter`` payloads can come
+from one read-only file. The file holds:
+
+* the recipe ids, sorted, as an ``int64`` array;
+* ``int64`` offsets into one blob of stored read-model documents, each
+  followed by a comma. A page is then a single slice of the blob;
+* per-cuisine and per-meal-type arrays of ``int32`` positions.
+
+The file is ``mmap``-ed read-only, so every worker process on a host shares
+the same page-cache pages, and nothing is parsed per request. Publishing
+writes a new file next to the old one and renames it into place;
+:class:`CatalogReader` notices the new inode and maps it.
+
+Consistency comes from a version stamp. Each recipe write bumps
+``data_stamps["recipes"]`` in its own transaction, and each file records
+the stamp it was built at. The reader serves from the file only while the
+two stamps match. After any write (in this process, or in another one
+detected through :mod:`coherence`), the reader checks the stamp again with
+one primary-key read. Until a fresh file is published, reads fall back to
+SQLite, so the catalog never serves data older than a committed write::
+
+    python -m catalog build
+    python -m catalog watch 30   # rebuild whenever the stamp moves
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models import DataStamp, Recipe, RecipeDocument
+from read_model import documents_by_id
+
+MAGIC = b"RCATLOG1"
+STAMP_NAME = "recipes"
+_HEADER_LENGTH = struct.Struct("<I")
+_FACETS = ("cuisine", "meal_type")
+
+READS = Counter(
+    "catalog_reads_total",
+    "Recipe reads by source: the mapped catalog or the database fallback.",
+    ["source"],
+)
+
+
+def bump_stamp(db: Session) -> None:
+    """Advance the recipes stamp inside the caller's transaction (no commit)."""
+    statement = insert(DataStamp).values(name=STAMP_NAME, version=1)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[DataStamp.name],
+            set_={"version": DataStamp.version + 1},
+        )
+    )
+
+
+def _stamp_query():
+    return select(DataStamp.version).where(DataStamp.name == STAMP_NAME)
+
+
+def read_stamp(db: Session) -> int:
+    return db.scalar(_stamp_query()) or 0
+
+
+def _align(buffer: bytearray) -> None:
+    buffer.extend(b"\0" * (-len(buffer) % 8))
+
+
+def build(db: Session, path: str) -> dict:
+    """Write a catalog for the current data to ``path`` and swap it in.
+
+    Rows and stamp come from one statement, so the file is a consistent
+    snapshot of exactly the version it claims.
+    """
+    rows = db.execute(
+        select(
+            Recipe.id,
+            RecipeDocument.document,
+            Recipe.cuisine,
+            Recipe.meal_type,
+            _stamp_query().scalar_subquery(),
+        )
+        .outerjoin(RecipeDocument, RecipeDocument.recipe_id == Recipe.id)
+        .order_by(Recipe.id)
+    ).all()
+    stamp = (rows[0][4] or 0) if rows else read_stamp(db)
+    documents = documents_by_id(db, [(row[0], row[1]) for row in rows])
+    rows = [row for row in rows if row[0] in documents]
+
+    ids = array("q", (row[0] for row in rows))
+    offsets = array("q", [0])
+    blob = bytearray()
+    positions: Dict[str, Dict[str, array]] = {facet: {} for facet in _FACETS}
+    for position, (recipe_id, _, cuisine, meal_type, _) in enumerate(rows):
+        blob += documents[recipe_id]
+        blob += b","
+        offsets.append(len(blob))
+        for facet, value in zip(_FACETS, (cuisine, meal_type)):
+            if value:
+                positions[facet].setdefault(value, array("i")).append(position)
+
+    body = bytearray()
+    sections = {}
+
+    def add(name, data: bytes, count: int) -> list:
+        _align(body)
+        sections[name] = [len(body), count]
+        body.extend(data)
+        return sections[name]
+
+    add("ids", ids.tobytes(), len(ids))
+    add("offsets", offsets.tobytes(), len(offsets))
+    add("blob", bytes(blob), len(blob))
+    facets = {
+        facet: {
+            value: add(f"{facet}:{value}", values.tobytes(), len(values))
+            for value, values in sorted(by_value.items())
+        }
+        for facet, by_value in positions.items()
+    }
+    header = json.dumps(
+        {
+            "stamp": stamp,
+            "count": len(ids),
+            "built_at": time.time(),
+            "ids": sections["ids"],
+            "offsets": sections["offsets"],
+            "blob": sections["blob"],
+            "facets": facets,
+        },
+        sort_keys=True,
+    ).encode()
+    prefix = bytearray(MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+    _align(prefix)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".catalog")
+    with os.fdopen(descriptor, "wb") as handle:
+        handle.write(prefix)
+        handle.write(body)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+    return {"stamp": stamp, "recipes": len(ids), "bytes": len(prefix) + len(body)}
+
+
+def _contains(values, value: int) -> bool:
+    """Membership in a sorted array."""
+    index = bisect.bisect_left(values, value)
+    return index < len(values) and values[index] == value
+
+
+class Catalog:
+    """Read-only view over one catalog file."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as handle:
+            self.inode = os.fstat(handle.fileno()).st_ino
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        if view[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a recipe catalog")
+        (length,) = _HEADER_LENGTH.unpack_from(view, len(MAGIC))
+        start = len(MAGIC) + _HEADER_LENGTH.size
+        header = json.loads(bytes(view[start : start + length]))
+        base = start + length + (-(start + length) % 8)
+        self.stamp: int = header["stamp"]
+        self.count: int = header["count"]
+
+        def section(bounds, code=None):
+            offset, count = bounds
+            if code is None:
+                return view[base + offset : base + offset + count]
+            size = array(code).itemsize
+            return view[base + offset : base + offset + count * size].cast(code)
+
+        self._ids = section(header["ids"], "q")
+        self._offsets = section(header["offsets"], "q")
+        self._blob = section(header["blob"])
+        self._facets = {
+            facet: {value: section(bounds, "i") for value, bounds in values.items()}
+            for facet, values in header["facets"].items()
+        }
+
+    def _document(self, position: int) -> bytes:
+        return bytes(
+            self._blob[self._offsets[position] : self._offsets[position + 1] - 1]
+        )
+
+    def get(self, recipe_id: int) -> Optional[bytes]:
+        position = bisect.bisect_left(self._ids, recipe_id)
+        if position < self.count and self._ids[position] == recipe_id:
+            return self._document(position)
+        return None
+
+    def page(self, skip: int, limit: int) -> bytes:
+        """``skip``/``limit`` over all recipes in id order: one blob slice."""
+        skip = max(skip, 0)
+        start, end = min(skip, self.count), min(skip + limit, self.count)
+        if start >= end:
+            return b"[]"
+        documents = self._blob[self._offsets[start] : self._offsets[end] - 1]
+        return b"[" + bytes(documents) + b"]"
+
+    def filter(
+        self,
+        meal_type: Optional[str] = None,
+        cuisine: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> bytes:
+        return self.filter_page(meal_type, cuisine, skip, limit)[0]
+
+    def filter_page(
+        self,
+        meal_type: Optional[str] = None,
+        cuisine: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> Tuple[bytes, bool]:
+        """:meth:`filter`, plus whether more matches follow the page."""
+        skip = max(skip, 0)
+        selected = [
+            self._facets[facet].get(value, ())
+            for facet, value in (("cuisine", cuisine), ("meal_type", meal_type))
+            if value
+        ]
+        if not selected:
+            return self.page(skip, limit), skip + limit < self.count
+        if len(selected) == 1:
+            matches = selected[0]
+        else:
+            smaller, larger = sorted(selected, key=len)
+            matches = [p for p in smaller if _contains(larger, p)]
+        positions = matches[skip : skip + limit]
+        documents = b"[" + b",".join(self._document(p) for p in positions) + b"]"
+        return documents, skip + limit < len(matches)
+
+
+class CatalogReader:
+    """The current catalog for ``path``, if it matches the database stamp.
+
+    ``mark_dirty`` is called after every write. The next :meth:`current`
+    call then re-reads the stamp once. Any call remaps the file if a new
+    one was published.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._catalog: Optional[Catalog] = None
+        self._stamp: Optional[int] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def mark_dirty(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._stamp = None
+
+    def _mapped(self) -> Optional[Catalog]:
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+        catalog = self._catalog
+        if catalog is None or catalog.inode != inode:
+            # The previous map is released once in-flight reads drop it.
+            catalog = self._catalog = Catalog(self.path)
+        return catalog
+
+    def current(self, read_db_stamp: Callable[[], int]) -> Optional[Catalog]:
+        catalog = self._mapped()
+        if catalog is None:
+            READS.labels("database").inc()
+            return None
+        with self._lock:
+            stamp, generation = self._stamp, self._generation
+        if stamp is None:
+            stamp = read_db_stamp()
+            with self._lock:
+                # A write that landed meanwhile keeps the reader dirty.
+                if generation == self._generation:
+                    self._stamp = stamp
+        if stamp != catalog.stamp:
+            READS.labels("database").inc()
+            return None
+        READS.labels("catalog").inc()
+        return catalog
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import models  # noqa: F401 - registers the tables on Base.metadata
+    from config import get_settings
+    from database import Base, SessionLocal, engine
+
+    args = sys.argv[1:] if argv is None else argv
+    command = args[0] if args else "build"
+    path = get_settings().catalog_path
+    if command not in ("build", "watch") or not path:
+        print("usage: CATALOG_PATH=... python -m catalog [build|watch SECONDS]")
+        return 2
+    Base.metadata.create_all(bind=engine)
+    published = None
+    while True:
+        with SessionLocal() as db:
+            if published is None or read_stamp(db) != published:
+                result = build(db, path)
+                published = result["stamp"]
+                print(
+                    f"published stamp={result['stamp']} recipes={result['recipes']} "
+                    f"bytes={result['bytes']} to {path}"
+                )
+        if command == "build":
+            return 0
+        time.sleep(float(args[1]) if len(args) > 1 else 30.0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Cross-process invalidation for in-process state.
+
+With ``WEB_CONCURRENCY > 1`` every worker process keeps its own caches
+(single-flight groups today, more later). A write committed by one worker
+must invalidate them everywhere. SQLite already tracks this:
+``PRAGMA data_version`` on a connection changes whenever *any other*
+connection, in any process, commits to the database file. A
+:class:`CoherenceMonitor` holds one dedicated connection and reads that
+counter:
+
+* at the start of every request (:class:`CoherenceMiddleware`), so a read
+  that follows a write on another worker never joins stale in-process state;
+* from a background thread every ``COHERENCE_POLL_INTERVAL`` seconds, so idle
+  workers drop caches promptly too.
+
+When the counter moves, every callback registered with :func:`on_change`
+runs. No broker, socket or shared memory is needed beyond the database file
+the workers already share.
+"""
+
+import logging
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+_subscribers: List[Callable[[], None]] = []
+
+INVALIDATIONS = Counter(
+    "coherence_invalidations_total",
+    "Times another connection's commit invalidated in-process caches.",
+)
+
+
+def on_change(callback: Callable[[], None]) -> Callable[[], None]:
+    """Run ``callback`` whenever the database changed under this process."""
+    _subscribers.append(callback)
+    return callback
+
+
+def notify_subscribers() -> None:
+    for callback in list(_subscribers):
+        try:
+            callback()
+        except Exception:  # pragma: no cover - one bad cache must not stop others
+            logger.exception("coherence callback %r failed", callback)
+
+
+class CoherenceMonitor:
+    """Watches ``PRAGMA data_version`` on a dedicated SQLite connection."""
+
+    def __init__(self, database_path: str, poll_interval: float = 0.25) -> None:
+        self.poll_interval = poll_interval
+        self._conn = sqlite3.connect(
+            database_path, check_same_thread=False, isolation_level=None
+        )
+        self._lock = threading.Lock()
+        self._version = self._read()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def for_engine(cls, engine, poll_interval: float = 0.25):
+        """A monitor for a file-backed SQLite engine, otherwise ``None``."""
+        database = engine.url.database
+        if engine.dialect.name != "sqlite" or database in (None, "", ":memory:"):
+            return None
+        return cls(database, poll_interval)
+
+    def use_database(self, database_path: str) -> None:
+        """Watch another database file from now on (after a restore)."""
+        conn = sqlite3.connect(
+            database_path, check_same_thread=False, isolation_level=None
+        )
+        with self._lock:
+            previous, self._conn = self._conn, conn
+            self._version = self._read()
+        previous.close()
+
+    def _read(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def check(self) -> bool:
+        """Notify subscribers if another connection committed since last time."""
+        with self._lock:
+            version = self._read()
+            changed = version != self._version
+            self._version = version
+        if changed:
+            INVALIDATIONS.inc()
+            notify_subscribers()
+        return changed
+
+    def start(self) -> None:
+        if self._thread is not None or self.poll_interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="coherence-poller", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self) -> None:
+        self.stop()
+        self._conn.close()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except sqlite3.Error:  # pragma: no cover - retried next tick
+                logger.exception("coherence poll failed")
+
+
+class CoherenceMiddleware:
+    """Checks for foreign commits before each HTTP request is handled."""
+
+    def __init__(self, app, monitor: CoherenceMonitor) -> None:
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            # A single PRAGMA read on an idle connection: microseconds.
+            self.monitor.check()
+        await self.app(scope, receive, send)
@@ -0,0 +1,405 @@
+"""Opt-in compressed storage for recipe ingredients and instructions.
+
+The two free-text columns hold most of the bytes in ``recipes``. With
+``TEXT_COMPRESSION=zlib``, or ``zstd`` when the ``zstandard`` package is
+installed, :class:`CompressedText` stores each value of at least
+``TEXT_COMPRESSION_MIN_BYTES`` as a BLOB in the same column. The BLOB holds
+one codec byte, a four-byte dictionary id (0 for none) and the compressed
+bytes. Values that would not shrink stay plain ``TEXT``, and ``TEXT`` is
+always read back unchanged. Compressed and plain rows can therefore coexist,
+and the setting can be switched either way at any time.
+
+Values are inflated only when a statement selects the column. Listings and
+filters serve stored documents (see :mod:`read_model`), so they never pay for
+it. Search matches ingredients through ``decompress_text``, an SQL function
+registered on every SQLite connection, but only for rows stored as BLOBs:
+plain rows are matched as stored, so search costs nothing extra until rows
+are actually compressed.
+
+Short recipes compress poorly on their own. ``train`` builds a dictionary
+from existing rows and stores it in ``text_dictionaries``, keyed by a hash
+of its content. Writers use it once ``TEXT_COMPRESSION_DICTIONARY`` names
+that id. Readers load dictionaries when a connection opens. They look up an
+unknown id again on demand, so rows written with a dictionary trained by
+another process stay readable.
+
+Existing rows are rewritten in keyset-ordered chunks, each committed on its
+own, so writers are never blocked for long::
+
+    python -m compression train            # optional; prints the id
+    TEXT_COMPRESSION=zlib python -m compression migrate [CHUNK_SIZE]
+    python -m compression status
+
+``VACUUM`` afterwards returns the freed pages to the filesystem.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import closing
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import (
+    String,
+    bindparam,
+    case,
+    cast,
+    event,
+    func,
+    select,
+    type_coerce,
+    update,
+)
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from config import get_settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+_CODEC_TAGS = {"zlib": b"z", "zstd": b"s"}
+_TAG_CODECS = {tag: codec for codec, tag in _CODEC_TAGS.items()}
+_DICTIONARY_ID = struct.Struct(">I")
+_HEADER_SIZE = 1 + _DICTIONARY_ID.size
+DEFAULT_DICTIONARY_SIZE = 16 * 1024
+
+
+@lru_cache(maxsize=1)
+def _warn_zstd_missing() -> None:
+    logger.warning("TEXT_COMPRESSION=zstd needs zstandard; using zlib")
+
+
+def active_codec() -> Optional[str]:
+    """The codec new values are written with, or ``None`` when off."""
+    codec = settings.text_compression
+    if codec == "off":
+        return None
+    if codec == "zstd" and zstandard is None:
+        _warn_zstd_missing()
+        return "zlib"
+    return codec
+
+
+class _Dictionaries:
+    """Trained dictionaries by id, shared by every connection in the process."""
+
+    def __init__(self) -> None:
+        self._entries: Dict[int, Tuple[str, bytes]] = {}
+        self._sources: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def add(self, dictionary_id: int, codec: str, data: bytes) -> None:
+        with self._lock:
+            self._entries[dictionary_id] = (codec, bytes(data))
+
+    def load(self, connection: sqlite3.Connection) -> None:
+        try:
+            rows = connection.execute(
+                "SELECT id, codec, data FROM text_dictionaries"
+            ).fetchall()
+        except sqlite3.OperationalError:  # the table does not exist yet
+            return
+        for dictionary_id, codec, data in rows:
+            self.add(dictionary_id, codec, data)
+
+    def attach(self, connection: sqlite3.Connection) -> None:
+        """Load ``connection``'s dictionaries and remember its file for misses."""
+        for _, name, path in connection.execute("PRAGMA database_list"):
+            if name == "main" and path:
+                with self._lock:
+                    self._sources.add(path)
+        self.load(connection)
+
+    def get(self, dictionary_id: int) -> Tuple[str, bytes]:
+        entry = self._entries.get(dictionary_id)
+        if entry is None:
+            with self._lock:
+                sources = list(self._sources)
+            for path in sources:
+                try:
+                    uri = f"file:{path}?mode=ro"
+                    with closing(sqlite3.connect(uri, uri=True)) as connection:
+                        self.load(connection)
+                except sqlite3.Error:
+                    with self._lock:
+                        self._sources.discard(path)
+            entry = self._entries.get(dictionary_id)
+        if entry is None:
+            raise LookupError(f"unknown text dictionary {dictionary_id}")
+        return entry
+
+
+dictionaries = _Dictionaries()
+
+
+def _compress(codec: str, raw: bytes, dictionary: Optional[bytes]) -> bytes:
+    if codec == "zstd":
+        data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdCompressor(dict_data=data).compress(raw)
+    if dictionary:
+        compressor = zlib.compressobj(zdict=dictionary)
+    else:
+        compressor = zlib.compressobj()
+    return compressor.compress(raw) + compressor.flush()
+
+
+def _decompress(codec: str, payload: bytes, dictionary: Optional[bytes]) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed text needs the zstandard package")
+        data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=data).decompress(payload)
+    if dictionary:
+        decompressor = zlib.decompressobj(zdict=dictionary)
+    else:
+        decompressor = zlib.decompressobj()
+    return decompressor.decompress(payload) + decompressor.flush()
+
+
+def encode(value: Optional[str]) -> Union[str, bytes, None]:
+    """The stored form of ``value`` under the current settings."""
+    codec = active_codec()
+    if value is None or codec is None:
+        return value
+    raw = value.encode("utf-8")
+    if len(raw) < settings.text_compression_min_bytes:
+        return value
+    dictionary_id = settings.text_compression_dictionary
+    dictionary = None
+    if dictionary_id:
+        dictionary_codec, dictionary = dictionaries.get(dictionary_id)
+        if dictionary_codec != codec:
+            dictionary_id, dictionary = 0, None
+    stored = (
+        _CODEC_TAGS[codec]
+        + _DICTIONARY_ID.pack(dictionary_id)
+        + _compress(codec, raw, dictionary)
+    )
+    return stored if len(stored) < len(raw) else value
+
+
+def decode(value: Union[str, bytes, None]) -> Optional[str]:
+    """The text behind a stored value, compressed or not."""
+    if not isinstance(value, bytes):
+        return value
+    codec = _TAG_CODECS.get(value[:1])
+    if codec is None:
+        raise ValueError("stored text has an unknown compression header")
+    (dictionary_id,) = _DICTIONARY_ID.unpack_from(value, 1)
+    dictionary = dictionaries.get(dictionary_id)[1] if dictionary_id else None
+    return _decompress(codec, value[_HEADER_SIZE:], dictionary).decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """``String`` column whose large values may be stored compressed."""
+
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return encode(value)
+
+    def process_result_value(self, value, dialect):
+        return decode(value)
+
+
+def searchable(column):
+    """``column`` as plain text inside SQL, for ``LIKE`` and friends.
+
+    Only BLOB values go through ``decompress_text``; plain rows are compared
+    as stored, so a database without compressed rows searches at full speed.
+    """
+    return case(
+        (func.typeof(column) == "blob", func.decompress_text(column, type_=String)),
+        else_=type_coerce(column, String),
+    )
+
+
+@event.listens_for(Pool, "connect")
+def _register_sqlite_functions(dbapi_connection, connection_record) -> None:
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    dbapi_connection.create_function("decompress_text", 1, decode, deterministic=True)
+    dictionaries.attach(dbapi_connection)
+
+
+def _zlib_dictionary(samples: List[bytes], size: int) -> bytes:
+    """Repeated lines and words, the most valuable last (nearest the data)."""
+    counts: Counter = Counter()
+    for sample in samples:
+        for line in sample.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            counts[line + b"\n"] += 1
+            for word in line.split():
+                if len(word) > 3:
+                    counts[word + b" "] += 1
+    ranked = sorted(
+        (chunk for chunk, seen in counts.items() if seen > 1),
+        key=lambda chunk: counts[chunk] * len(chunk),
+        reverse=True,
+    )
+    chosen: List[bytes] = []
+    total = 0
+    for chunk in ranked:
+        if total + len(chunk) <= size:
+            chosen.append(chunk)
+            total += len(chunk)
+    return b"".join(reversed(chosen))
+
+
+def train(
+    db: Session,
+    codec: Optional[str] = None,
+    size: int = DEFAULT_DICTIONARY_SIZE,
+    sample_limit: int = 5000,
+) -> int:
+    """Train a dictionary on recent recipes and store it (no commit).
+
+    Returns the id to set as ``TEXT_COMPRESSION_DICTIONARY``.
+    """
+    from models import Recipe, TextDictionary
+
+    codec = codec or active_codec() or "zlib"
+    rows = db.execute(
+        select(Recipe.ingredients, Recipe.instructions)
+        .order_by(Recipe.id.desc())
+        .limit(sample_limit)
+    )
+    samples = [value.encode("utf-8") for row in rows for value in row if value]
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("training a zstd dictionary needs zstandard")
+        data = zstandard.train_dictionary(size, samples).as_bytes()
+    else:
+        data = _zlib_dictionary(samples, size)
+    if not data:
+        raise ValueError("not enough recipe text to train a dictionary")
+    dictionary_id = int.from_bytes(hashlib.sha256(data).digest()[:4], "big") or 1
+    db.merge(
+        TextDictionary(id=dictionary_id, codec=codec, data=data, created_at=time.time())
+    )
+    dictionaries.add(dictionary_id, codec, data)
+    return dictionary_id
+
+
+def migrate(db: Session, chunk_size: int = 500) -> int:
+    """Rewrite every recipe's text in the current storage format.
+
+    Rows are read and written back in id order, ``chunk_size`` at a time,
+    committing after each chunk. Returns the number of rows rewritten.
+    """
+    from models import Recipe
+
+    table = Recipe.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values(
+            ingredients=bindparam("ingredients"),
+            instructions=bindparam("instructions"),
+        )
+    )
+    after_id, rewritten = 0, 0
+    while True:
+        rows = db.execute(
+            select(table.c.id, table.c.ingredients, table.c.instructions)
+            .where(table.c.id > after_id)
+            .order_by(table.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return rewritten
+        db.execute(
+            statement,
+            [
+                {
+                    "row_id": recipe_id,
+                    "ingredients": ingredients,
+                    "instructions": instructions,
+                }
+                for recipe_id, ingredients, instructions in rows
+            ],
+        )
+        db.commit()
+        after_id = rows[-1][0]
+        rewritten += len(rows)
+
+
+def storage_stats(db: Session) -> Dict[str, int]:
+    """Row count, compressed values and stored bytes of the two text columns."""
+    from models import Recipe
+
+    columns = (Recipe.__table__.c.ingredients, Recipe.__table__.c.instructions)
+    row = db.execute(
+        select(
+            func.count(),
+            *(
+                func.coalesce(
+                    func.sum(case((func.typeof(column) == "blob", 1), else_=0)), 0
+                )
+                for column in columns
+            ),
+            *(
+                func.coalesce(func.sum(func.length(cast(column, LargeBinary))), 0)
+                for column in columns
+            ),
+        ).select_from(Recipe.__table__)
+    ).one()
+    return {
+        "recipes": row[0],
+        "compressed_values": row[1] + row[2],
+        "stored_bytes": row[3] + row[4],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import models  # noqa: F401 - registers the tables on Base.metadata
+    from database import Base, SessionLocal, engine
+
+    args = sys.argv[1:] if argv is None else argv
+    command = args[0] if args else "status"
+    if command not in ("train", "migrate", "status"):
+        print(
+            "usage: python -m compression [train|migrate CHUNK_SIZE|status]",
+            file=sys.stderr,
+        )
+        return 2
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if command == "train":
+            dictionary_id = train(db)
+            db.commit()
+            print(
+                f"trained dictionary; set TEXT_COMPRESSION_DICTIONARY={dictionary_id}"
+            )
+        elif command == "migrate":
+            chunk_size = int(args[1]) if len(args) > 1 else 500
+            rewritten = migrate(db, chunk_size=chunk_size)
+            print(f"rewrote {rewritten} recipe(s) as {active_codec() or 'plain text'}")
+        stats = storage_stats(db)
+    print(
+        f"recipes={stats['recipes']} compressed_values={stats['compressed_values']} "
+        f"stored_bytes={stats['stored_bytes']}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
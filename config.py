@@ -1,9 +1,11 @@
 import os
 from dataclasses import dataclass, field
 from functools import lru_cache
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 _DEFAULT_CORS_ORIGINS = "http://localhost:3000,http://localhost:3001"
+_DEFAULT_ADMISSION_CONCURRENCY = "search=4,export=2,bulk=2,read=20,write=8"
+_DEFAULT_ADMISSION_QUEUE_SIZES = "search=16,export=4,bulk=4,read=200,write=50"
 
 
 def _parse_csv_list(raw_value: Optional[str]) -> List[str]:
@@ -12,6 +14,22 @@ def _parse_csv_list(raw_value: Optional[str]) -> List[str]:
     return [item.strip() for item in raw_value.split(",") if item.strip()]
 
 
+def _parse_csv_mapping(raw_value: Optional[str]) -> Dict[str, int]:
+    """Parse ``key=value`` pairs such as ``search=4,read=32`` into a dict."""
+    mapping: Dict[str, int] = {}
+    for item in _parse_csv_list(raw_value):
+        key, _, value = item.partition("=")
+        key = key.strip()
+        if not key or not value.strip():
+            continue
+        mapping[key] = int(value)
+    return mapping
+
+
+def _parse_bool(raw_value: Optional[str]) -> bool:
+    return (raw_value or "").strip().lower() in {"1", "true", "yes", "on"}
+
+
 def _default_cors_origins() -> List[str]:
     cors_env_value = os.getenv("CORS_ALLOW_ORIGINS", _DEFAULT_CORS_ORIGINS)
     return _parse_csv_list(cors_env_value)
@@ -25,19 +43,321 @@ def _default_page_size() -> int:
     return int(os.getenv("RECIPES_PAGE_SIZE", "100"))
 
 
+def _default_max_page_size() -> int:
+    return int(os.getenv("RECIPES_MAX_PAGE_SIZE", "10000"))
+
+
+def _default_stream_threshold() -> int:
+    return int(os.getenv("RECIPES_STREAM_THRESHOLD", "500"))
+
+
+def _default_stream_chunk_size() -> int:
+    return int(os.getenv("RECIPES_STREAM_CHUNK_SIZE", "500"))
+
+
+def _default_admission_enabled() -> bool:
+    return _parse_bool(os.getenv("ADMISSION_CONTROL_ENABLED", "1"))
+
+
+def _default_admission_concurrency() -> Dict[str, int]:
+    limits = _parse_csv_mapping(_DEFAULT_ADMISSION_CONCURRENCY)
+    limits.update(_parse_csv_mapping(os.getenv("ADMISSION_CONCURRENCY")))
+    return limits
+
+
+def _default_admission_queue_sizes() -> Dict[str, int]:
+    sizes = _parse_csv_mapping(_DEFAULT_ADMISSION_QUEUE_SIZES)
+    sizes.update(_parse_csv_mapping(os.getenv("ADMISSION_QUEUE_SIZE")))
+    return sizes
+
+
+def _default_admission_queue_timeout() -> float:
+    return float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0"))
+
+
+def _default_outbox_worker_enabled() -> bool:
+    return _parse_bool(os.getenv("OUTBOX_WORKER_ENABLED", "1"))
+
+
+def _default_outbox_workers() -> int:
+    return int(os.getenv("OUTBOX_WORKERS", "2"))
+
+
+def _default_outbox_batch_size() -> int:
+    return int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+
+
+def _default_outbox_poll_interval() -> float:
+    return float(os.getenv("OUTBOX_POLL_INTERVAL", "0.5"))
+
+
+def _default_outbox_max_attempts() -> int:
+    return int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+
+
+def _default_admin_token() -> str:
+    return os.getenv("ADMIN_TOKEN", "")
+
+
+def _default_profile_sample_rate() -> float:
+    return float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+
+def _default_profile_mode() -> str:
+    return os.getenv("PROFILE_MODE", "sample").strip().lower()
+
+
+def _default_profile_dir() -> str:
+    return os.getenv("PROFILE_DIR", "./profiles")
+
+
+def _default_profile_keep() -> int:
+    return int(os.getenv("PROFILE_KEEP", "50"))
+
+
+def _default_slow_query_threshold_ms() -> float:
+    return float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+
+
+def _default_slow_query_log_path() -> str:
+    return os.getenv("SLOW_QUERY_LOG_PATH", "")
+
+
+def _default_slow_query_explain() -> bool:
+    return _parse_bool(os.getenv("SLOW_QUERY_EXPLAIN", "1"))
+
+
+def _default_web_concurrency() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+def _default_sqlite_wal() -> bool:
+    return _parse_bool(os.getenv("SQLITE_WAL", "1"))
+
+
+def _default_sqlite_busy_timeout_ms() -> int:
+    return int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def _default_coherence_poll_interval() -> float:
+    return float(os.getenv("COHERENCE_POLL_INTERVAL", "0.25"))
+
+
+def _default_count_cache_ttl() -> float:
+    return float(os.getenv("COUNT_CACHE_TTL", "30"))
+
+
+def _default_count_cache_max_age() -> float:
+    return float(os.getenv("COUNT_CACHE_MAX_AGE", "300"))
+
+
+def _default_count_wait_ms() -> float:
+    return float(os.getenv("COUNT_WAIT_MS", "50"))
+
+
+def _default_snapshot_dir() -> str:
+    return os.getenv("SNAPSHOT_DIR", "")
+
+
+def _default_catalog_path() -> str:
+    return os.getenv("CATALOG_PATH", "")
+
+
+def _default_db_pool_size() -> int:
+    return int(os.getenv("DB_POOL_SIZE", "5"))
+
+
+def _default_db_max_overflow() -> int:
+    return int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+
+def _default_db_pool_timeout() -> float:
+    return float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def _default_health_probe_interval() -> float:
+    return float(os.getenv("HEALTH_PROBE_INTERVAL", "5"))
+
+
+def _default_ready_max_pool_utilization() -> float:
+    return float(os.getenv("READY_MAX_POOL_UTILIZATION", "0.9"))
+
+
+def _default_ready_max_pool_wait_ms() -> float:
+    return float(os.getenv("READY_MAX_POOL_WAIT_MS", "250"))
+
+
+def _default_ready_max_loop_lag_ms() -> float:
+    return float(os.getenv("READY_MAX_LOOP_LAG_MS", "250"))
+
+
+def _default_ready_max_threadpool_lag_ms() -> float:
+    return float(os.getenv("READY_MAX_THREADPOOL_LAG_MS", "500"))
+
+
+def _default_text_compression() -> str:
+    return os.getenv("TEXT_COMPRESSION", "off").strip().lower()
+
+
+def _default_text_compression_min_bytes() -> int:
+    return int(os.getenv("TEXT_COMPRESSION_MIN_BYTES", "256"))
+
+
+def _default_text_compression_dictionary() -> int:
+    return int(os.getenv("TEXT_COMPRESSION_DICTIONARY", "0"))
+
+
+def _default_backup_dir() -> str:
+    return os.getenv("BACKUP_DIR", "./backups")
+
+
+def _default_backup_step_pages() -> int:
+    return int(os.getenv("BACKUP_STEP_PAGES", "128"))
+
+
+def _default_backup_step_sleep_ms() -> float:
+    return float(os.getenv("BACKUP_STEP_SLEEP_MS", "10"))
+
+
+def _default_backup_keep() -> int:
+    return int(os.getenv("BACKUP_KEEP", "7"))
+
+
+def _default_popularity_flush_interval() -> float:
+    return float(os.getenv("POPULARITY_FLUSH_INTERVAL", "5"))
+
+
+def _default_popularity_half_life_hours() -> float:
+    return float(os.getenv("POPULARITY_HALF_LIFE_HOURS", "72"))
+
+
 @dataclass(frozen=True)
 class Settings:
     database_url: str = field(default_factory=_default_database_url)
     cors_allow_origins: List[str] = field(default_factory=_default_cors_origins)
     recipes_page_size: int = field(default_factory=_default_page_size)
+    recipes_max_page_size: int = field(default_factory=_default_max_page_size)
+    recipes_stream_threshold: int = field(default_factory=_default_stream_threshold)
+    recipes_stream_chunk_size: int = field(default_factory=_default_stream_chunk_size)
+    admission_enabled: bool = field(default_factory=_default_admission_enabled)
+    admission_concurrency: Dict[str, int] = field(
+        default_factory=_default_admission_concurrency
+    )
+    admission_queue_sizes: Dict[str, int] = field(
+        default_factory=_default_admission_queue_sizes
+    )
+    admission_queue_timeout: float = field(
+        default_factory=_default_admission_queue_timeout
+    )
+    outbox_worker_enabled: bool = field(default_factory=_default_outbox_worker_enabled)
+    outbox_workers: int = field(default_factory=_default_outbox_workers)
+    outbox_batch_size: int = field(default_factory=_default_outbox_batch_size)
+    outbox_poll_interval: float = field(default_factory=_default_outbox_poll_interval)
+    outbox_max_attempts: int = field(default_factory=_default_outbox_max_attempts)
+    admin_token: str = field(default_factory=_default_admin_token)
+    profile_sample_rate: float = field(default_factory=_default_profile_sample_rate)
+    profile_mode: str = field(default_factory=_default_profile_mode)
+    profile_dir: str = field(default_factory=_default_profile_dir)
+    profile_keep: int = field(default_factory=_default_profile_keep)
+    slow_query_threshold_ms: float = field(
+        default_factory=_default_slow_query_threshold_ms
+    )
+    slow_query_log_path: str = field(default_factory=_default_slow_query_log_path)
+    slow_query_explain: bool = field(default_factory=_default_slow_query_explain)
+    web_concurrency: int = field(default_factory=_default_web_concurrency)
+    sqlite_wal: bool = field(default_factory=_default_sqlite_wal)
+    sqlite_busy_timeout_ms: int = field(default_factory=_default_sqlite_busy_timeout_ms)
+    coherence_poll_interval: float = field(
+        default_factory=_default_coherence_poll_interval
+    )
+    count_cache_ttl: float = field(default_factory=_default_count_cache_ttl)
+    count_cache_max_age: float = field(default_factory=_default_count_cache_max_age)
+    count_wait_ms: float = field(default_factory=_default_count_wait_ms)
+    snapshot_dir: str = field(default_factory=_default_snapshot_dir)
+    catalog_path: str = field(default_factory=_default_catalog_path)
+    db_pool_size: int = field(default_factory=_default_db_pool_size)
+    db_max_overflow: int = field(default_factory=_default_db_max_overflow)
+    db_pool_timeout: float = field(default_factory=_default_db_pool_timeout)
+    health_probe_interval: float = field(default_factory=_default_health_probe_interval)
+    ready_max_pool_utilization: float = field(
+        default_factory=_default_ready_max_pool_utilization
+    )
+    ready_max_pool_wait_ms: float = field(
+        default_factory=_default_ready_max_pool_wait_ms
+    )
+    ready_max_loop_lag_ms: float = field(default_factory=_default_ready_max_loop_lag_ms)
+    ready_max_threadpool_lag_ms: float = field(
+        default_factory=_default_ready_max_threadpool_lag_ms
+    )
+    text_compression: str = field(default_factory=_default_text_compression)
+    text_compression_min_bytes: int = field(
+        default_factory=_default_text_compression_min_bytes
+    )
+    text_compression_dictionary: int = field(
+        default_factory=_default_text_compression_dictionary
+    )
+    backup_dir: str = field(default_factory=_default_backup_dir)
+    backup_step_pages: int = field(default_factory=_default_backup_step_pages)
+    backup_step_sleep_ms: float = field(default_factory=_default_backup_step_sleep_ms)
+    backup_keep: int = field(default_factory=_default_backup_keep)
+    popularity_flush_interval: float = field(
+        default_factory=_default_popularity_flush_interval
+    )
+    popularity_half_life_hours: float = field(
+        default_factory=_default_popularity_half_life_hours
+    )
 
     def __post_init__(self) -> None:
-        if self.recipes_page_size < 1:
-            object.__setattr__(self, "recipes_page_size", 1)
+        if self.recipes_max_page_size < 1:
+            object.__setattr__(self, "recipes_max_page_size", 1)
+        object.__setattr__(
+            self,
+            "recipes_page_size",
+            min(max(self.recipes_page_size, 1), self.recipes_max_page_size),
+        )
+        if self.recipes_stream_threshold < 1:
+            object.__setattr__(self, "recipes_stream_threshold", 1)
+        if self.recipes_stream_chunk_size < 1:
+            object.__setattr__(self, "recipes_stream_chunk_size", 1)
         if not self.cors_allow_origins:
             object.__setattr__(
                 self, "cors_allow_origins", _parse_csv_list(_DEFAULT_CORS_ORIGINS)
             )
+        if self.admission_queue_timeout < 0:
+            object.__setattr__(self, "admission_queue_timeout", 0.0)
+        if self.db_pool_size < 1:
+            object.__setattr__(self, "db_pool_size", 1)
+        if self.health_probe_interval <= 0:
+            object.__setattr__(self, "health_probe_interval", 5.0)
+        if self.outbox_workers < 1:
+            object.__setattr__(self, "outbox_workers", 1)
+        if self.outbox_batch_size < 1:
+            object.__setattr__(self, "outbox_batch_size", 1)
+        object.__setattr__(
+            self, "profile_sample_rate", min(max(self.profile_sample_rate, 0.0), 1.0)
+        )
+        if self.profile_mode not in {"sample", "cprofile"}:
+            object.__setattr__(self, "profile_mode", "sample")
+        if self.profile_keep < 1:
+            object.__setattr__(self, "profile_keep", 1)
+        if self.web_concurrency < 1:
+            object.__setattr__(self, "web_concurrency", 1)
+        if self.sqlite_busy_timeout_ms < 0:
+            object.__setattr__(self, "sqlite_busy_timeout_ms", 0)
+        if self.text_compression not in {"off", "zlib", "zstd"}:
+            object.__setattr__(self, "text_compression", "off")
+        if self.text_compression_min_bytes < 0:
+            object.__setattr__(self, "text_compression_min_bytes", 0)
+        if self.backup_step_pages < 1:
+            object.__setattr__(self, "backup_step_pages", 1)
+        if self.backup_step_sleep_ms < 0:
+            object.__setattr__(self, "backup_step_sleep_ms", 0.0)
+        if self.backup_keep < 1:
+            object.__setattr__(self, "backup_keep", 1)
+        if self.popularity_flush_interval <= 0:
+            object.__setattr__(self, "popularity_flush_interval", 5.0)
+        if self.popularity_half_life_hours <= 0:
+            object.__setattr__(self, "popularity_half_life_hours", 72.0)
 
 
 @lru_cache(maxsize=1)
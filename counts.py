@@ -0,0 +1,231 @@
+"""Total counts for paginated recipe endpoints.
+
+Two sources, picked by how expensive the predicate is:
+
+* **Maintained counters** (``recipe_facet_counts``) answer the unfiltered
+  list and every meal type / cuisine filter exactly, with one primary-key
+  read. ``RecipeRepository`` adjusts them in the same transaction as each
+  write, using the facets it already records before and after the write.
+* **A TTL cache** (:class:`CountCache`) answers free-text search, whose
+  ``LIKE`` predicate cannot use an index. A count is never older than
+  ``COUNT_CACHE_MAX_AGE`` seconds, and it is recomputed in the background
+  once it is older than ``COUNT_CACHE_TTL``. A request only waits for a
+  cold count up to ``COUNT_WAIT_MS``; if it is not ready by then, the
+  response goes out without a total and the count is ready for the next
+  page.
+
+Counters can be verified or rebuilt from the base table::
+
+    python -m counts check
+    python -m counts rebuild
+"""
+
+import sys
+import threading
+import time
+from collections import Counter as Tally
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models import Recipe, RecipeFacetCount
+
+ALL = "all"
+
+LOOKUPS = Counter(
+    "recipe_count_lookups_total",
+    "Total-count lookups by source and outcome.",
+    ["source", "outcome"],
+)
+
+
+def facet_key(meal_type: Optional[str] = None, cuisine: Optional[str] = None) -> str:
+    """Counter key for a filter; empty values mean "no filter", as in crud."""
+    if meal_type and cuisine:
+        return f"cuisine+meal_type:{cuisine}\x1f{meal_type}"
+    if cuisine:
+        return f"cuisine:{cuisine}"
+    if meal_type:
+        return f"meal_type:{meal_type}"
+    return ALL
+
+
+def facet_keys(facets: Optional[dict]) -> List[str]:
+    """Every counter a recipe with these facets contributes to."""
+    if facets is None:
+        return []
+    meal_type, cuisine = facets.get("meal_type"), facets.get("cuisine")
+    keys = {ALL, facet_key(meal_type=meal_type), facet_key(cuisine=cuisine)}
+    keys.add(facet_key(meal_type=meal_type, cuisine=cuisine))
+    return sorted(keys)
+
+
+def apply_delta(db: Session, before: Optional[dict], after: Optional[dict]) -> None:
+    """Move a recipe's contribution from ``before`` to ``after`` (no commit)."""
+    delta = Tally(facet_keys(after))
+    delta.subtract(facet_keys(before))
+    changes = [
+        {"key": key, "count": change} for key, change in sorted(delta.items()) if change
+    ]
+    if not changes:
+        return
+    statement = insert(RecipeFacetCount)
+    # One executemany for every touched counter.
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[RecipeFacetCount.key],
+            set_={"count": RecipeFacetCount.count + statement.excluded.count},
+        ),
+        changes,
+    )
+
+
+def exact_count(db: Session, key: str) -> int:
+    LOOKUPS.labels("counter", "exact").inc()
+    return (
+        db.scalar(select(RecipeFacetCount.count).where(RecipeFacetCount.key == key))
+        or 0
+    )
+
+
+def computed_counts(db: Session) -> Dict[str, int]:
+    """Counter values recomputed from the recipes table."""
+    counts: Dict[str, int] = Tally()
+    rows = db.execute(
+        select(Recipe.meal_type, Recipe.cuisine, func.count()).group_by(
+            Recipe.meal_type, Recipe.cuisine
+        )
+    )
+    for meal_type, cuisine, count in rows:
+        for key in facet_keys({"meal_type": meal_type, "cuisine": cuisine}):
+            counts[key] += count
+    return dict(counts)
+
+
+def stored_counts(db: Session) -> Dict[str, int]:
+    return {
+        key: count
+        for key, count in db.execute(
+            select(RecipeFacetCount.key, RecipeFacetCount.count)
+        )
+        if count
+    }
+
+
+def rebuild(db: Session) -> int:
+    """Replace every counter with values computed from the base table."""
+    counts = computed_counts(db)
+    db.execute(delete(RecipeFacetCount))
+    if counts:
+        db.execute(
+            insert(RecipeFacetCount),
+            [{"key": key, "count": count} for key, count in counts.items()],
+        )
+    return len(counts)
+
+
+class CountCache:
+    """Bounded TTL cache of expensive counts, refreshed on a small pool."""
+
+    def __init__(
+        self,
+        ttl: float = 30.0,
+        max_age: float = 300.0,
+        max_entries: int = 1024,
+        workers: int = 2,
+    ) -> None:
+        self.ttl = ttl
+        self.max_age = max(max_age, ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[object, Tuple[int, float]]" = OrderedDict()
+        self._pending: Dict[object, Future] = {}
+        # Re-entrant: a future that is already done runs its callback inline.
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="counts"
+        )
+
+    def _store(self, key, future: Future) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.exception() is None:
+                self._entries[key] = (future.result(), time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def _refresh(self, key, compute: Callable[[], int]) -> Future:
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._executor.submit(compute)
+                self._pending[key] = future
+                future.add_done_callback(lambda done: self._store(key, done))
+        return future
+
+    def lookup(
+        self, key, compute: Callable[[], int], wait: float = 0.05
+    ) -> Optional[Tuple[int, float]]:
+        """``(count, age_seconds)``, or ``None`` if it is not known in time."""
+        with self._lock:
+            entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            count, computed_at = entry
+            age = now - computed_at
+            if age <= self.ttl:
+                LOOKUPS.labels("cache", "fresh").inc()
+                return count, age
+            self._refresh(key, compute)
+            if age <= self.max_age:
+                LOOKUPS.labels("cache", "stale").inc()
+                return count, age
+        future = self._refresh(key, compute)
+        try:
+            count = future.result(timeout=wait)
+        except FutureTimeout:
+            LOOKUPS.labels("cache", "pending").inc()
+            return None
+        LOOKUPS.labels("cache", "computed").inc()
+        return count, 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import models  # noqa: F401 - registers the tables on Base.metadata
+    from database import Base, SessionLocal, engine
+
+    args = sys.argv[1:] if argv is None else argv
+    command = args[0] if args else "check"
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if command == "rebuild":
+            print(f"rebuilt {rebuild(db)} counters")
+            db.commit()
+            return 0
+        if command == "check":
+            expected, actual = computed_counts(db), stored_counts(db)
+            drift = {
+                key: (actual.get(key, 0), expected.get(key, 0))
+                for key in set(expected) | set(actual)
+                if actual.get(key, 0) != expected.get(key, 0)
+            }
+            for key, (stored, computed) in sorted(drift.items()):
+                print(f"{key!r}: stored={stored} actual={computed}")
+            print(f"checked={len(expected)} drifted={len(drift)}")
+            return 1 if drift else 0
+    print("usage: python -m counts [check|rebuild]", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
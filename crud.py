@@ -1,14 +1,191 @@
-from typing import Optional
-
-from sqlalchemy import or_
-from sqlalchemy.orm import Session, selectinload
-
+import json
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import delete, func, lambda_stmt, literal, or_, select, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from catalog import CatalogReader, bump_stamp, read_stamp
+from coherence import on_change
+from compression import searchable
 from config import get_settings
-from models import Recipe, Tag, User
+from counts import CountCache, apply_delta, exact_count, facet_key
+from database import on_engine_swap
+from dedupe import (
+    DEFAULT_THRESHOLD,
+    DuplicateRecipeError,
+    content_fingerprint,
+    find_duplicates,
+)
+from models import Recipe, RecipeDocument, RecipePopularity, Tag, User, recipe_tags
+from outbox import enqueue, notify_workers, register_handler
+from popularity import forget, track
+from read_model import (
+    delete_documents,
+    documents_for,
+    join_documents,
+    recipe_ids_for_owner,
+    recipe_ids_for_tag,
+    refresh_documents,
+    store_documents,
+)
 from schemas import RecipeCreate, TagCreate, UserCreate
+from shopping_list import aggregate
+from singleflight import SingleFlight
+from streaming import json_array_stream, observe_first_byte
 
 settings = get_settings()
 
+# Shared by every request so identical concurrent reads run one query.
+read_coalescer = SingleFlight("recipes")
+# Writes from other worker processes start a new generation here too.
+on_change(read_coalescer.invalidate)
+# Optional memory-mapped catalog; checked against the write stamp on change.
+catalog_reader = CatalogReader(settings.catalog_path) if settings.catalog_path else None
+if catalog_reader is not None:
+    on_change(catalog_reader.mark_dirty)
+# Search totals; bounded staleness instead of a COUNT(*) per page.
+search_counts = CountCache(
+    ttl=settings.count_cache_ttl, max_age=settings.count_cache_max_age
+)
+# A restored database (see backup) shares nothing with the cached totals.
+on_engine_swap(lambda engine: search_counts.clear())
+
+
+def _search_condition(query: str):
+    like_pattern = f"%{query}%"
+    return or_(
+        Recipe.title.ilike(like_pattern),
+        Recipe.cuisine.ilike(like_pattern),
+        Recipe.meal_type.ilike(like_pattern),
+        searchable(Recipe.ingredients).ilike(like_pattern),
+    )
+
+
+def _clean_names(names: List[str]) -> List[str]:
+    """Stripped, non-empty names in first-seen order, without repeats."""
+    return list(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+# SQLAlchemy cannot cache SQLite ``ON CONFLICT`` clauses or multi-row
+# ``VALUES``, so an ORM upsert is recompiled on every call. Passing the names
+# as one JSON array keeps this statement's text, and its compiled form, the
+# same however many tags it resolves.
+_UPSERT_TAGS = text(
+    "INSERT INTO tags (name) SELECT value FROM json_each(:names) WHERE true "
+    "ON CONFLICT (name) DO UPDATE SET name = excluded.name RETURNING id, name"
+).columns(Tag.id, Tag.name)
+
+
+def _upsert_tags(
+    db: Session, names: List[str], rows: bool = False
+) -> Dict[str, object]:
+    """Tags for ``names`` by name, creating the missing ones, in one statement.
+
+    The no-op ``DO UPDATE`` makes ``RETURNING`` include tags that already
+    existed, so the caller gets every id without a separate lookup. Returns
+    ``Tag`` objects, or ``(id, name)`` rows with ``rows=True``.
+    """
+    cleaned = _clean_names(names)
+    if not cleaned:
+        return {}
+    params = {"names": json.dumps(cleaned)}
+    if rows:
+        results = db.execute(_UPSERT_TAGS, params).all()
+    else:
+        results = db.scalars(
+            select(Tag).from_statement(_UPSERT_TAGS),
+            params,
+            execution_options={"populate_existing": True},
+        )
+    by_name = {result.name: result for result in results}
+    return {name: by_name[name] for name in cleaned}
+
+
+def _recipe_facets(recipe: Recipe) -> dict:
+    """Fields derived work cares about, recorded before and after each write."""
+    return {
+        "cuisine": recipe.cuisine,
+        "meal_type": recipe.meal_type,
+        "owner_id": recipe.owner_id,
+        "tags": sorted(tag.name for tag in recipe.tags),
+    }
+
+
+def _filter_conditions(meal_type: Optional[str], cuisine: Optional[str]) -> list:
+    conditions = []
+    if meal_type:
+        conditions.append(Recipe.meal_type == meal_type)
+    if cuisine:
+        conditions.append(Recipe.cuisine == cuisine)
+    return conditions
+
+
+def _after_popular(score: float, recipe_id: int):
+    """Rows after ``(score, recipe_id)`` in ``score DESC, recipe_id`` order."""
+    return or_(
+        RecipePopularity.score < score,
+        (RecipePopularity.score == score) & (RecipePopularity.recipe_id > recipe_id),
+    )
+
+
+# Hot-path reads are lambda statements: SQLAlchemy builds each one once per
+# code location, then only pulls the closure variables out as bound values,
+# skipping statement construction and cache-key generation on every call
+# (see benchmarks/bench_repository.py). Each lambda has one fixed shape;
+# optional filters pick a lambda rather than chaining ``+=`` steps, which
+# measured slower than a plain ``select()``.
+
+_RECIPE_LOADERS = (selectinload(Recipe.tags), joinedload(Recipe.owner))
+# SQLite's "no limit", so unbounded pages share the bounded pages' shape.
+_NO_LIMIT = -1
+
+
+def _recipes():
+    return select(Recipe).options(*_RECIPE_LOADERS)
+
+
+def _document_columns():
+    return select(Recipe.id, RecipeDocument.document).outerjoin(
+        RecipeDocument, RecipeDocument.recipe_id == Recipe.id
+    )
+
+
+def _document_page(
+    meal_type: Optional[str], cuisine: Optional[str], skip: int, limit: int
+):
+    """``(id, document)`` rows of a list or facet filter page, in id order."""
+    if meal_type and cuisine:
+        return lambda_stmt(
+            lambda: _document_columns()
+            .where(Recipe.meal_type == meal_type, Recipe.cuisine == cuisine)
+            .order_by(Recipe.id)
+            .offset(skip)
+            .limit(limit)
+        )
+    if meal_type:
+        return lambda_stmt(
+            lambda: _document_columns()
+            .where(Recipe.meal_type == meal_type)
+            .order_by(Recipe.id)
+            .offset(skip)
+            .limit(limit)
+        )
+    if cuisine:
+        return lambda_stmt(
+            lambda: _document_columns()
+            .where(Recipe.cuisine == cuisine)
+            .order_by(Recipe.id)
+            .offset(skip)
+            .limit(limit)
+        )
+    return lambda_stmt(
+        lambda: _document_columns().order_by(Recipe.id).offset(skip).limit(limit)
+    )
+
 
 class RecipeRepository:
     """Handles persistence for Recipe entities."""
@@ -16,123 +193,410 @@ class RecipeRepository:
     def __init__(self, db: Session) -> None:
         self._db = db
 
-    def _query(self):
-        return self._db.query(Recipe).options(
-            selectinload(Recipe.tags), selectinload(Recipe.owner)
+    def _ensure_tags(self, names: list[str]):
+        tags_by_name = _upsert_tags(self._db, names)
+        return list(tags_by_name.values())
+
+    def _duplicate_of(
+        self, fingerprint: str, exclude_id: Optional[int] = None
+    ) -> Optional[int]:
+        statement = select(Recipe.id).where(Recipe.content_fingerprint == fingerprint)
+        if exclude_id is not None:
+            statement = statement.where(Recipe.id != exclude_id)
+        return self._db.scalars(statement.limit(1)).first()
+
+    def _fingerprint(self, recipe: Recipe) -> None:
+        """Stamp the content fingerprint, rejecting an existing copy early."""
+        fingerprint = content_fingerprint(
+            recipe.title, recipe.ingredients, recipe.instructions
         )
+        existing_id = self._duplicate_of(fingerprint, exclude_id=recipe.id)
+        if existing_id is not None:
+            raise DuplicateRecipeError(existing_id)
+        recipe.content_fingerprint = fingerprint
+
+    def _commit_write(self, recipe: Recipe) -> None:
+        try:
+            self._db.commit()
+        except IntegrityError:
+            # A concurrent write claimed the same fingerprint first.
+            self._db.rollback()
+            existing_id = self._duplicate_of(recipe.content_fingerprint)
+            if existing_id is None:
+                raise
+            raise DuplicateRecipeError(existing_id) from None
+        notify_workers()
+
+    def _sync_document(self, recipe: Recipe) -> None:
+        # Flush so the recipe has an id, and reload the owner in case
+        # owner_id changed, before writing the document in the same transaction.
+        self._db.flush()
+        self._db.expire(recipe, ["owner"])
+        store_documents(self._db, [recipe])
+
+    def _document_rows(
+        self,
+        *conditions,
+        skip: int = 0,
+        limit: Optional[int] = None,
+        meal_type: Optional[str] = None,
+        cuisine: Optional[str] = None,
+    ) -> list:
+        if not conditions:
+            limit = _NO_LIMIT if limit is None else limit
+            statement = _document_page(meal_type, cuisine, skip, limit)
+            return self._db.execute(statement).all()
+        statement = (
+            _document_columns()
+            .where(*conditions, *_filter_conditions(meal_type, cuisine))
+            .order_by(Recipe.id)
+            .offset(skip)
+        )
+        if limit is not None:
+            statement = statement.limit(limit)
+        return self._db.execute(statement).all()
+
+    def has_row(
+        self,
+        *conditions,
+        skip: int,
+        meal_type: Optional[str] = None,
+        cuisine: Optional[str] = None,
+    ) -> bool:
+        """Whether a ``skip``-th matching row exists (an id-only index probe)."""
+        statement = (
+            select(Recipe.id)
+            .where(*conditions, *_filter_conditions(meal_type, cuisine))
+            .order_by(Recipe.id)
+            .offset(skip)
+            .limit(1)
+        )
+        return self._db.scalar(statement) is not None
+
+    def _popular_rows(self, *conditions, skip: int = 0, limit: int) -> list:
+        """``(id, document, score)`` rows, most popular first."""
+        statement = (
+            select(Recipe.id, RecipeDocument.document, RecipePopularity.score)
+            .select_from(RecipePopularity)
+            .join(Recipe, Recipe.id == RecipePopularity.recipe_id)
+            .outerjoin(RecipeDocument, RecipeDocument.recipe_id == Recipe.id)
+            .where(*conditions)
+            .order_by(RecipePopularity.score.desc(), RecipePopularity.recipe_id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return self._db.execute(statement).all()
 
-    def _ensure_tags(self, names: list[str]):
-        cleaned: list[str] = []
-        seen = set()
-        for name in names:
-            normalized = name.strip()
-            if not normalized or normalized in seen:
-                continue
-            cleaned.append(normalized)
-            seen.add(normalized)
-
-        if not cleaned:
-            return []
+    def _popular_documents(self, rows: list) -> List[bytes]:
+        return documents_for(
+            self._db, [(recipe_id, document) for recipe_id, document, _ in rows]
+        )
 
-        existing = self._db.query(Tag).filter(Tag.name.in_(cleaned)).all()
-        tags_by_name = {tag.name: tag for tag in existing}
-        resolved: list[Tag] = []
+    def popular_head(
+        self, *conditions, skip: int = 0, size: int
+    ) -> Tuple[List[bytes], Optional[tuple]]:
+        """Up to ``size`` documents by popularity, plus the keyset after them.
+
+        The keyset is the last row's ``(score, recipe_id)``, or ``None`` when
+        no more rows follow.
+        """
+        rows = self._popular_rows(*conditions, skip=skip, limit=size + 1)
+        more = len(rows) > size
+        rows = rows[:size]
+        after = (rows[-1][2], rows[-1][0]) if more and rows else None
+        return self._popular_documents(rows), after
+
+    def has_popular_row(self, *conditions, after: tuple, skip: int) -> bool:
+        """Whether a ``skip``-th recipe follows the keyset ``after``."""
+        return bool(
+            self._popular_rows(*conditions, _after_popular(*after), skip=skip, limit=1)
+        )
 
-        for name in cleaned:
-            tag = tags_by_name.get(name)
-            if tag is None:
-                tag = Tag(name=name)
-                self._db.add(tag)
-                self._db.flush()
-                tags_by_name[name] = tag
-            resolved.append(tag)
-        return resolved
+    def iter_popular_chunks(
+        self, *conditions, after: tuple, limit: int, chunk_size: int
+    ) -> Iterator[List[bytes]]:
+        """Chunks of documents by popularity after the ``(score, id)`` keyset.
+
+        Read on a session of their own, as in :meth:`iter_document_chunks`.
+        """
+        with Session(bind=self._db.get_bind()) as db:
+            repository = RecipeRepository(db)
+            remaining = limit
+            while remaining > 0:
+                rows = repository._popular_rows(
+                    *conditions,
+                    _after_popular(*after),
+                    limit=min(chunk_size, remaining),
+                )
+                if not rows:
+                    return
+                after = (rows[-1][2], rows[-1][0])
+                remaining -= len(rows)
+                yield repository._popular_documents(rows)
+                db.expunge_all()
+
+    def _documents(self, *conditions, **page) -> List[bytes]:
+        return documents_for(self._db, self._document_rows(*conditions, **page))
+
+    def document_head(
+        self,
+        *conditions,
+        skip: int = 0,
+        size: int,
+        meal_type: Optional[str] = None,
+        cuisine: Optional[str] = None,
+    ) -> Tuple[List[bytes], Optional[int]]:
+        """Up to ``size`` documents, plus the id to continue after if more exist."""
+        rows = self._document_rows(
+            *conditions,
+            skip=skip,
+            limit=size + 1,
+            meal_type=meal_type,
+            cuisine=cuisine,
+        )
+        more = len(rows) > size
+        rows = rows[:size]
+        return documents_for(self._db, rows), rows[-1][0] if more and rows else None
+
+    def iter_document_chunks(
+        self,
+        *conditions,
+        after_id: int,
+        limit: int,
+        chunk_size: int,
+        meal_type: Optional[str] = None,
+        cuisine: Optional[str] = None,
+    ) -> Iterator[List[bytes]]:
+        """Keyset-ordered chunks of documents after ``after_id``.
+
+        Streamed responses outlive the request's session, so the chunks are
+        read on a session of their own, opened when iteration starts.
+        """
+        with Session(bind=self._db.get_bind()) as db:
+            repository = RecipeRepository(db)
+            remaining = limit
+            while remaining > 0:
+                rows = repository._document_rows(
+                    *conditions,
+                    Recipe.id > after_id,
+                    limit=min(chunk_size, remaining),
+                    meal_type=meal_type,
+                    cuisine=cuisine,
+                )
+                if not rows:
+                    return
+                after_id = rows[-1][0]
+                remaining -= len(rows)
+                yield documents_for(db, rows)
+                # Keep the identity map from growing with the stream.
+                db.expunge_all()
 
     def get(self, recipe_id: int):
-        return self._query().filter(Recipe.id == recipe_id).first()
+        return self._db.scalars(
+            lambda_stmt(lambda: _recipes().where(Recipe.id == recipe_id))
+        ).first()
 
     def list(self, skip: int, limit: int):
-        return self._query().offset(skip).limit(limit).all()
+        return self._db.scalars(
+            lambda_stmt(lambda: _recipes().offset(skip).limit(limit))
+        ).all()
 
     def create(self, payload: dict):
         tags = payload.pop("tags", []) if payload else []
         recipe = Recipe(**payload)
+        self._fingerprint(recipe)
         if tags:
             recipe.tags = self._ensure_tags(tags)
         self._db.add(recipe)
-        self._db.commit()
+        self._sync_document(recipe)
+        track(self._db, recipe.id)
+        after = _recipe_facets(recipe)
+        apply_delta(self._db, None, after)
+        bump_stamp(self._db)
+        enqueue(
+            self._db,
+            "recipe.created",
+            {"recipe_id": recipe.id, "before": None, "after": after},
+        )
+        self._commit_write(recipe)
         self._db.refresh(recipe)
         return recipe
 
     def update(self, recipe: Recipe, payload: dict):
+        before = _recipe_facets(recipe)
         tags = payload.pop("tags", None)
         for field, value in payload.items():
             setattr(recipe, field, value)
+        try:
+            self._fingerprint(recipe)
+        except DuplicateRecipeError:
+            self._db.rollback()
+            raise
         if tags is not None:
             recipe.tags = self._ensure_tags(tags)
-        self._db.commit()
+        self._sync_document(recipe)
+        after = _recipe_facets(recipe)
+        apply_delta(self._db, before, after)
+        bump_stamp(self._db)
+        enqueue(
+            self._db,
+            "recipe.updated",
+            {"recipe_id": recipe.id, "before": before, "after": after},
+        )
+        self._commit_write(recipe)
         self._db.refresh(recipe)
         return recipe
 
     def delete(self, recipe: Recipe):
+        before = _recipe_facets(recipe)
+        apply_delta(self._db, before, None)
+        bump_stamp(self._db)
+        enqueue(
+            self._db,
+            "recipe.deleted",
+            {"recipe_id": recipe.id, "before": before, "after": None},
+        )
+        delete_documents(self._db, [recipe.id])
+        forget(self._db, [recipe.id])
         self._db.delete(recipe)
         self._db.commit()
+        notify_workers()
         return recipe
 
     def search(self, query: str):
-        like_pattern = f"%{query}%"
-        return (
-            self._query()
-            .filter(
-                or_(
-                    Recipe.title.ilike(like_pattern),
-                    Recipe.cuisine.ilike(like_pattern),
-                    Recipe.meal_type.ilike(like_pattern),
-                    Recipe.ingredients.ilike(like_pattern),
+        return self._db.scalars(_recipes().where(_search_condition(query))).all()
+
+    def filter(self, meal_type: Optional[str] = None, cuisine: Optional[str] = None):
+        return self._db.scalars(
+            _recipes().where(*_filter_conditions(meal_type, cuisine))
+        ).all()
+
+    def get_document(self, recipe_id: int) -> Optional[bytes]:
+        rows = self._db.execute(
+            lambda_stmt(lambda: _document_columns().where(Recipe.id == recipe_id))
+        ).all()
+        documents = documents_for(self._db, rows)
+        return documents[0] if documents else None
+
+    def list_documents(self, skip: int, limit: int) -> List[bytes]:
+        return self._documents(skip=skip, limit=limit)
+
+    def search_documents(self, query: str) -> List[bytes]:
+        return self._documents(_search_condition(query))
+
+    def filter_documents(
+        self, meal_type: Optional[str] = None, cuisine: Optional[str] = None
+    ) -> List[bytes]:
+        return self._documents(meal_type=meal_type, cuisine=cuisine)
+
+    def list_documents_for_owner(
+        self,
+        owner_id: int,
+        after_id: int = 0,
+        limit: int = 100,
+        meal_type: Optional[str] = None,
+        cuisine: Optional[str] = None,
+    ) -> Tuple[List[bytes], Optional[int]]:
+        """Keyset page of an owner's recipes plus the cursor for the next page."""
+        rows = self._document_rows(
+            Recipe.owner_id == owner_id,
+            Recipe.id > after_id,
+            limit=limit + 1,
+            meal_type=meal_type,
+            cuisine=cuisine,
+        )
+        more = len(rows) > limit
+        rows = rows[:limit]
+        next_after_id = rows[-1][0] if more and rows else None
+        return documents_for(self._db, rows), next_after_id
+
+    def refresh_documents_for_tag(self, tag_id: int) -> int:
+        return refresh_documents(self._db, recipe_ids_for_tag(self._db, tag_id))
+
+    def refresh_documents_for_owner(self, user_id: int) -> int:
+        return refresh_documents(self._db, recipe_ids_for_owner(self._db, user_id))
+
+    def read_stamp(self) -> int:
+        return read_stamp(self._db)
+
+    def count_facet(self, meal_type: Optional[str], cuisine: Optional[str]) -> int:
+        return exact_count(self._db, facet_key(meal_type=meal_type, cuisine=cuisine))
+
+    def count_search(self, query: str) -> int:
+        """Exact search count on a session of its own (runs off the request path)."""
+        with Session(bind=self._db.get_bind()) as db:
+            return db.scalar(
+                select(func.count()).select_from(Recipe).where(_search_condition(query))
+            )
+
+    def ingredients_for(self, recipe_ids: List[int]) -> list:
+        """``(id, ingredients)`` for every existing id, in one query."""
+        return self._db.execute(
+            lambda_stmt(
+                lambda: select(Recipe.id, Recipe.ingredients).where(
+                    Recipe.id.in_(recipe_ids)
                 )
             )
-            .all()
-        )
+        ).all()
 
-    def filter(self, meal_type: Optional[str] = None, cuisine: Optional[str] = None):
-        query = self._query()
-        if meal_type:
-            query = query.filter(Recipe.meal_type == meal_type)
-        if cuisine:
-            query = query.filter(Recipe.cuisine == cuisine)
-        return query.all()
+    def find_duplicates(
+        self, recipe: Recipe, threshold: float = DEFAULT_THRESHOLD, limit: int = 10
+    ):
+        return find_duplicates(self._db, recipe, threshold=threshold, limit=limit)
 
     def list_unique(self, column):
-        return self._db.query(column).distinct().all()
+        return self._db.execute(select(column).distinct()).all()
 
 
 class RecipeService:
     """Business logic orchestration for recipe operations."""
 
-    def __init__(self, repository: RecipeRepository) -> None:
+    def __init__(
+        self,
+        repository: RecipeRepository,
+        coalescer: Optional[SingleFlight] = None,
+    ) -> None:
         self._repository = repository
+        self._coalescer = coalescer or SingleFlight("recipes")
 
     def get(self, recipe_id: int):
         return self._repository.get(recipe_id)
 
     def list(self, skip: int = 0, limit: Optional[int] = None):
-        resolved_limit = limit if limit is not None else settings.recipes_page_size
+        resolved_limit = self._capped(limit, settings.recipes_page_size)
         return self._repository.list(skip=skip, limit=resolved_limit)
 
+    def _written(self) -> None:
+        self._coalescer.invalidate()
+        if catalog_reader is not None:
+            catalog_reader.mark_dirty()
+
+    def _catalog(self):
+        """The mapped catalog when it is current, otherwise ``None``."""
+        if catalog_reader is None:
+            return None
+        return catalog_reader.current(self._repository.read_stamp)
+
     def create(self, recipe: RecipeCreate):
-        return self._repository.create(recipe.model_dump())
+        created = self._repository.create(recipe.model_dump())
+        self._written()
+        return created
 
     def update(self, recipe_id: int, recipe: RecipeCreate):
         existing = self._repository.get(recipe_id)
         if existing is None:
             return None
-        return self._repository.update(existing, recipe.model_dump())
+        updated = self._repository.update(existing, recipe.model_dump())
+        self._written()
+        return updated
 
     def delete(self, recipe_id: int):
         existing = self._repository.get(recipe_id)
         if existing is None:
             return None
-        return self._repository.delete(existing)
+        deleted = self._repository.delete(existing)
+        self._written()
+        return deleted
 
     def search(self, query: str):
         return self._repository.search(query)
@@ -140,15 +604,240 @@ class RecipeService:
     def filter(self, meal_type: Optional[str] = None, cuisine: Optional[str] = None):
         return self._repository.filter(meal_type=meal_type, cuisine=cuisine)
 
+    def find_duplicates(
+        self, recipe_id: int, threshold: float = DEFAULT_THRESHOLD, limit: int = 10
+    ):
+        recipe = self._repository.get(recipe_id)
+        if recipe is None:
+            return None
+        return self._repository.find_duplicates(
+            recipe, threshold=threshold, limit=limit
+        )
+
+    def total(
+        self,
+        query: Optional[str] = None,
+        meal_type: Optional[str] = None,
+        cuisine: Optional[str] = None,
+    ) -> Optional[Tuple[int, float]]:
+        """``(total, age_seconds)`` for a list, filter or search, if known.
+
+        Unfiltered lists and facet filters read maintained counters (exact,
+        age 0). Searches go through ``search_counts``.
+        """
+        if query is None:
+            return self._repository.count_facet(meal_type, cuisine), 0.0
+        return search_counts.lookup(
+            query,
+            lambda: self._repository.count_search(query),
+            wait=settings.count_wait_ms / 1000.0,
+        )
+
+    def shopping_list(self, recipe_ids: List[int], servings: Optional[dict] = None):
+        """Merged ingredients for ``recipe_ids`` plus the ids that do not exist.
+
+        An id listed more than once counts that many times, on top of its
+        ``servings`` multiplier; its row is still read only once.
+        """
+        repeats = Counter(recipe_ids)
+        requested = list(repeats)
+        rows = self._repository.ingredients_for(requested)
+        found = {recipe_id for recipe_id, _ in rows}
+        # Follow the caller's order so recipe_ids in the result read naturally.
+        position = {recipe_id: index for index, recipe_id in enumerate(requested)}
+        rows.sort(key=lambda row: position[row[0]])
+        missing = [recipe_id for recipe_id in requested if recipe_id not in found]
+        servings = servings or {}
+        multipliers = {
+            recipe_id: servings.get(recipe_id, 1.0) * count
+            for recipe_id, count in repeats.items()
+        }
+        return aggregate(rows, multipliers), missing
+
     def get_unique_meal_types(self):
         return self._repository.list_unique(Recipe.meal_type)
 
     def get_unique_cuisines(self):
         return self._repository.list_unique(Recipe.cuisine)
 
+    # Serialized read paths: stored read-model documents are joined as bytes,
+    # and identical concurrent calls share one query through the single-flight
+    # group.
+    def get_payload(self, recipe_id: int) -> Optional[bytes]:
+        catalog = self._catalog()
+        if catalog is not None:
+            return catalog.get(recipe_id)
+        return self._coalescer.do(
+            ("get", recipe_id), lambda: self._repository.get_document(recipe_id)
+        )
+
+    def _capped(self, limit: Optional[int], default: int) -> int:
+        resolved = limit if limit is not None else default
+        return min(resolved, settings.recipes_max_page_size)
+
+    def _page_payload(
+        self, key: tuple, conditions: tuple, skip: int, limit: int, **facets
+    ) -> Tuple[Union[bytes, Iterator[bytes]], bool]:
+        """One coalesced payload for small pages, a chunked stream for large ones.
+
+        The first ``RECIPES_STREAM_THRESHOLD`` documents are fetched through
+        the single-flight group either way. If the page is longer, the rest
+        follows as a stream. ``facets`` (``meal_type``, ``cuisine``) filter
+        like ``conditions`` but keep unconditioned pages on a lambda statement.
+        Also returns whether more rows follow the page.
+        """
+        started = time.perf_counter()
+        head_size = min(limit, settings.recipes_stream_threshold)
+        documents, after_id = self._coalescer.do(
+            key + (skip, head_size),
+            lambda: self._repository.document_head(
+                *conditions, skip=skip, size=head_size, **facets
+            ),
+        )
+        if after_id is None or limit <= head_size:
+            payload = join_documents(documents)
+            observe_first_byte("buffered", started)
+            return payload, after_id is not None
+        # Headers go out before the stream, so look past its end up front.
+        more = self._repository.has_row(
+            *conditions, Recipe.id > after_id, skip=limit - head_size, **facets
+        )
+        chunks = self._repository.iter_document_chunks(
+            *conditions,
+            after_id=after_id,
+            limit=limit - head_size,
+            chunk_size=settings.recipes_stream_chunk_size,
+            **facets,
+        )
+        return json_array_stream(documents, chunks, started), more
+
+    def _popular_payload(
+        self, key: tuple, conditions: tuple, skip: int, limit: int
+    ) -> Tuple[Union[bytes, Iterator[bytes]], bool]:
+        """A page ordered by popularity (see popularity).
+
+        Buffered or streamed like :meth:`_page_payload`; the streamed tail
+        continues on the ``(score, recipe_id)`` keyset of the head's last row.
+        """
+        started = time.perf_counter()
+        head_size = min(limit, settings.recipes_stream_threshold)
+        documents, after = self._coalescer.do(
+            key + ("popular", skip, head_size),
+            lambda: self._repository.popular_head(
+                *conditions, skip=skip, size=head_size
+            ),
+        )
+        if after is None or limit <= head_size:
+            payload = join_documents(documents)
+            observe_first_byte("buffered", started)
+            return payload, after is not None
+        more = self._repository.has_popular_row(
+            *conditions, after=after, skip=limit - head_size
+        )
+        chunks = self._repository.iter_popular_chunks(
+            *conditions,
+            after=after,
+            limit=limit - head_size,
+            chunk_size=settings.recipes_stream_chunk_size,
+        )
+        return json_array_stream(documents, chunks, started), more
+
+    @staticmethod
+    def _next_skip(page: tuple, skip: int, limit: int):
+        """``(payload, skip of the next page)``; the skip is ``None`` at the end."""
+        payload, more = page
+        return payload, skip + limit if more else None
+
+    def list_payload(
+        self, skip: int = 0, limit: Optional[int] = None, sort: str = "id"
+    ) -> Union[bytes, Iterator[bytes]]:
+        resolved_limit = self._capped(limit, settings.recipes_page_size)
+        if sort == "popular":
+            return self._popular_payload(("list",), (), skip, resolved_limit)[0]
+        catalog = self._catalog()
+        if catalog is not None:
+            return catalog.page(skip, resolved_limit)
+        return self._page_payload(("list",), (), skip, resolved_limit)[0]
+
+    def search_payload(
+        self, query: str, skip: int = 0, limit: Optional[int] = None, sort: str = "id"
+    ) -> Tuple[Union[bytes, Iterator[bytes]], Optional[int]]:
+        """One page of matches plus the ``skip`` of the next page, if any."""
+        resolved_limit = self._capped(limit, settings.recipes_page_size)
+        page = self._popular_payload if sort == "popular" else self._page_payload
+        return self._next_skip(
+            page(("search", query), (_search_condition(query),), skip, resolved_limit),
+            skip,
+            resolved_limit,
+        )
+
+    def filter_payload(
+        self,
+        meal_type: Optional[str] = None,
+        cuisine: Optional[str] = None,
+        skip: int = 0,
+        limit: Optional[int] = None,
+        sort: str = "id",
+    ) -> Tuple[Union[bytes, Iterator[bytes]], Optional[int]]:
+        """One page of matches plus the ``skip`` of the next page, if any."""
+        resolved_limit = self._capped(limit, settings.recipes_page_size)
+        key = ("filter", meal_type, cuisine)
+        catalog = self._catalog() if sort != "popular" else None
+        if sort == "popular":
+            conditions = tuple(_filter_conditions(meal_type, cuisine))
+            page = self._popular_payload(key, conditions, skip, resolved_limit)
+        elif catalog is not None:
+            page = catalog.filter_page(meal_type, cuisine, skip, resolved_limit)
+        else:
+            page = self._page_payload(
+                key, (), skip, resolved_limit, meal_type=meal_type, cuisine=cuisine
+            )
+        return self._next_skip(page, skip, resolved_limit)
+
+    def tag_payload(
+        self, tag_id: int, skip: int = 0, limit: Optional[int] = None
+    ) -> Union[bytes, Iterator[bytes]]:
+        payload, _ = self._page_payload(
+            ("tag", tag_id),
+            (
+                Recipe.id.in_(
+                    select(recipe_tags.c.recipe_id).where(
+                        recipe_tags.c.tag_id == tag_id
+                    )
+                ),
+            ),
+            skip,
+            self._capped(limit, settings.recipes_max_page_size),
+        )
+        return payload
+
+    def owner_payload(
+        self,
+        owner_id: int,
+        after_id: int = 0,
+        limit: Optional[int] = None,
+        meal_type: Optional[str] = None,
+        cuisine: Optional[str] = None,
+    ) -> Tuple[bytes, Optional[int]]:
+        resolved_limit = self._capped(limit, settings.recipes_page_size)
+
+        def load():
+            documents, next_after_id = self._repository.list_documents_for_owner(
+                owner_id,
+                after_id=after_id,
+                limit=resolved_limit,
+                meal_type=meal_type,
+                cuisine=cuisine,
+            )
+            return join_documents(documents), next_after_id
+
+        return self._coalescer.do(
+            ("owner", owner_id, after_id, resolved_limit, meal_type, cuisine), load
+        )
+
 
 def _service(db: Session) -> RecipeService:
-    return RecipeService(RecipeRepository(db))
+    return RecipeService(RecipeRepository(db), read_coalescer)
 
 
 class UserRepository:
@@ -156,7 +845,18 @@ class UserRepository:
         self._db = db
 
     def list(self):
-        return self._db.query(User).all()
+        return self._db.scalars(select(User)).all()
+
+    def list_with_recipe_counts(self):
+        """Users with their recipe counts, aggregated over the owner_id index."""
+        recipe_count = func.count(Recipe.id).label("recipe_count")
+        rows = self._db.execute(
+            select(User, recipe_count)
+            .outerjoin(Recipe, Recipe.owner_id == User.id)
+            .group_by(User.id)
+            .order_by(User.id)
+        ).all()
+        return [(user, count) for user, count in rows]
 
     def create(self, payload: dict):
         user = User(**payload)
@@ -165,16 +865,56 @@ class UserRepository:
         self._db.refresh(user)
         return user
 
+    def upsert_many(self, payloads: List[dict]) -> List[User]:
+        """Create or update users by email in one statement; input order kept.
+
+        A repeated email takes its last payload. A missing ``name`` keeps the
+        stored one. Users whose name changed get their recipe documents
+        refreshed through the outbox, as with :meth:`update`. Returns
+        ``(id, email, name)`` rows, which the commit does not expire.
+        """
+        by_email = {payload["email"]: payload for payload in payloads}
+        if not by_email:
+            return []
+        previous = dict(
+            self._db.execute(
+                select(User.email, User.name).where(User.email.in_(list(by_email)))
+            ).all()
+        )
+        statement = insert(User).values(list(by_email.values()))
+        statement = statement.on_conflict_do_update(
+            index_elements=[User.email],
+            set_={"name": func.coalesce(statement.excluded.name, User.name)},
+        ).returning(User.id, User.email, User.name)
+        users = {user.email: user for user in self._db.execute(statement)}
+        for email, user in users.items():
+            if email in previous and previous[email] != user.name:
+                enqueue(self._db, "user.updated", {"user_id": user.id})
+        self._db.commit()
+        notify_workers()
+        return [users[email] for email in by_email]
+
     def get(self, user_id: int):
         return self._db.get(User, user_id)
 
+    def update(self, user: User, payload: dict):
+        for field, value in payload.items():
+            setattr(user, field, value)
+        # Owned recipes embed the owner; their documents are refreshed by the
+        # outbox worker instead of fanning out inside this request.
+        enqueue(self._db, "user.updated", {"user_id": user.id})
+        self._db.commit()
+        notify_workers()
+        self._db.refresh(user)
+        return user
+
 
 class TagRepository:
     def __init__(self, db: Session) -> None:
         self._db = db
 
     def list(self):
-        return self._db.query(Tag).order_by(Tag.name).all()
+        return self._db.scalars(select(Tag).order_by(Tag.name)).all()
 
     def create(self, payload: dict):
         tag = Tag(**payload)
@@ -183,6 +923,75 @@ class TagRepository:
         self._db.refresh(tag)
         return tag
 
+    def get(self, tag_id: int):
+        return self._db.get(Tag, tag_id)
+
+    def upsert_many(self, names: List[str]) -> List[Tag]:
+        """Tags for ``names``, created where missing, in first-seen order.
+
+        Returns ``(name, id)`` rows: unlike ORM objects they are not expired
+        by the commit, so serializing them issues no further queries.
+        """
+        tags = list(_upsert_tags(self._db, names, rows=True).values())
+        self._db.commit()
+        return tags
+
+    def by_name(self, name: str) -> Optional[Tag]:
+        return self._db.scalars(select(Tag).where(Tag.name == name)).first()
+
+    def rename(self, tag: Tag, name: str):
+        """Rename ``tag``; renaming onto another tag's name merges into it."""
+        name = name.strip()
+        existing = self.by_name(name)
+        if existing is not None and existing.id != tag.id:
+            return self.merge(tag, existing)
+        tag.name = name
+        enqueue(self._db, "tag.renamed", {"tag_id": tag.id})
+        self._db.commit()
+        notify_workers()
+        self._db.refresh(tag)
+        return tag
+
+    def merge(self, source: Tag, target: Tag) -> Tag:
+        """Move every recipe tagged ``source`` onto ``target``; drop ``source``.
+
+        ``recipe_tags`` is rewritten with two set-based statements, however
+        many recipes carry the tag. Recipes that already had both keep one.
+        """
+        if source.id == target.id:
+            return target
+        moved = select(recipe_tags.c.recipe_id, literal(target.id)).where(
+            recipe_tags.c.tag_id == source.id
+        )
+        self._db.execute(
+            insert(recipe_tags)
+            .from_select(["recipe_id", "tag_id"], moved)
+            .on_conflict_do_nothing()
+        )
+        self._db.execute(delete(recipe_tags).where(recipe_tags.c.tag_id == source.id))
+        self._db.execute(delete(Tag).where(Tag.id == source.id))
+        self._db.expunge(source)
+        # The surviving tag's documents now cover every moved recipe.
+        enqueue(self._db, "tag.renamed", {"tag_id": target.id, "merged_id": source.id})
+        self._db.commit()
+        notify_workers()
+        self._db.refresh(target)
+        return target
+
+
+@register_handler("tag.renamed")
+def _refresh_tag_documents(db: Session, payload: dict) -> None:
+    RecipeRepository(db).refresh_documents_for_tag(payload["tag_id"])
+    bump_stamp(db)
+    read_coalescer.invalidate()
+
+
+@register_handler("user.updated")
+def _refresh_owner_documents(db: Session, payload: dict) -> None:
+    RecipeRepository(db).refresh_documents_for_owner(payload["user_id"])
+    bump_stamp(db)
+    read_coalescer.invalidate()
+
 
 def get_recipe(db: Session, recipe_id: int):
     return _service(db).get(recipe_id)
@@ -214,6 +1023,60 @@ def filter_recipes(
     return _service(db).filter(meal_type=meal_type, cuisine=cuisine)
 
 
+def get_recipe_payload(db: Session, recipe_id: int):
+    return _service(db).get_payload(recipe_id)
+
+
+def get_recipes_payload(
+    db: Session, skip: int = 0, limit: Optional[int] = None, sort: str = "id"
+):
+    return _service(db).list_payload(skip=skip, limit=limit, sort=sort)
+
+
+def search_recipes_payload(
+    db: Session,
+    query: str,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    sort: str = "id",
+):
+    return _service(db).search_payload(query, skip=skip, limit=limit, sort=sort)
+
+
+def filter_recipes_payload(
+    db: Session,
+    meal_type: Optional[str] = None,
+    cuisine: Optional[str] = None,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    sort: str = "id",
+):
+    return _service(db).filter_payload(
+        meal_type=meal_type, cuisine=cuisine, skip=skip, limit=limit, sort=sort
+    )
+
+
+def find_duplicate_recipes(
+    db: Session, recipe_id: int, threshold: float = DEFAULT_THRESHOLD, limit: int = 10
+):
+    return _service(db).find_duplicates(recipe_id, threshold=threshold, limit=limit)
+
+
+def recipe_total(
+    db: Session,
+    query: Optional[str] = None,
+    meal_type: Optional[str] = None,
+    cuisine: Optional[str] = None,
+) -> Optional[Tuple[int, float]]:
+    return _service(db).total(query=query, meal_type=meal_type, cuisine=cuisine)
+
+
+def build_shopping_list(
+    db: Session, recipe_ids: List[int], servings: Optional[dict] = None
+):
+    return _service(db).shopping_list(recipe_ids, servings)
+
+
 def get_unique_meal_types(db: Session):
     return _service(db).get_unique_meal_types()
 
@@ -226,15 +1089,75 @@ def list_users(db: Session):
     return UserRepository(db).list()
 
 
+def list_users_with_recipe_counts(db: Session):
+    return UserRepository(db).list_with_recipe_counts()
+
+
+def get_user(db: Session, user_id: int):
+    return UserRepository(db).get(user_id)
+
+
+def get_user_recipes_payload(
+    db: Session,
+    user_id: int,
+    after_id: int = 0,
+    limit: Optional[int] = None,
+    meal_type: Optional[str] = None,
+    cuisine: Optional[str] = None,
+):
+    return _service(db).owner_payload(
+        user_id, after_id=after_id, limit=limit, meal_type=meal_type, cuisine=cuisine
+    )
+
+
 def create_user(db: Session, user: UserCreate):
     repo = UserRepository(db)
     return repo.create(user.model_dump())
 
 
+def update_user(db: Session, user_id: int, user: UserCreate):
+    repo = UserRepository(db)
+    existing = repo.get(user_id)
+    return repo.update(existing, user.model_dump()) if existing is not None else None
+
+
+def upsert_users(db: Session, users: List[UserCreate]):
+    return UserRepository(db).upsert_many([user.model_dump() for user in users])
+
+
 def list_tags(db: Session):
     return TagRepository(db).list()
 
 
+def get_tag(db: Session, tag_id: int):
+    return TagRepository(db).get(tag_id)
+
+
+def get_tag_recipes_payload(
+    db: Session, tag_id: int, skip: int = 0, limit: Optional[int] = None
+):
+    return _service(db).tag_payload(tag_id, skip=skip, limit=limit)
+
+
 def create_tag(db: Session, tag: TagCreate):
     repo = TagRepository(db)
     return repo.create(tag.model_dump())
+
+
+def upsert_tags(db: Session, names: List[str]):
+    return TagRepository(db).upsert_many(names)
+
+
+def rename_tag(db: Session, tag_id: int, name: str):
+    repo = TagRepository(db)
+    tag = repo.get(tag_id)
+    return repo.rename(tag, name) if tag is not None else None
+
+
+def merge_tags(db: Session, source_id: int, target_id: int):
+    """The surviving tag, or ``None`` if either tag does not exist."""
+    repo = TagRepository(db)
+    source, target = repo.get(source_id), repo.get(target_id)
+    if source is None or target is None:
+        return None
+    return repo.merge(source, target)
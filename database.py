@@ -1,13 +1,75 @@
-from sqlalchemy import create_engine
+from typing import Callable, List
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+import slow_query_log
+from coherence import notify_subscribers
 from config import get_settings
+from health import TimedQueuePool
 
 settings = get_settings()
 
-connect_args = (
-    {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
-)
-engine = create_engine(settings.database_url, connect_args=connect_args)
+
+def _configure_sqlite_connection(dbapi_connection, connection_record) -> None:
+    # WAL lets readers in other worker processes proceed during a write, and
+    # the busy timeout makes concurrent writers wait instead of failing.
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {int(settings.sqlite_busy_timeout_ms)}")
+    if settings.sqlite_wal:
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.close()
+
+
+def create_database_engine(database_url: str):
+    """An engine for ``database_url`` with the application's pool and hooks."""
+    is_sqlite = database_url.startswith("sqlite")
+    connect_args = {"check_same_thread": False} if is_sqlite else {}
+    # In-memory SQLite needs its single-connection pool; everything else gets a
+    # sized QueuePool that reports checkout waits (see health).
+    pool_args = (
+        {}
+        if is_sqlite and ":memory:" in database_url
+        else {
+            "poolclass": TimedQueuePool,
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+        }
+    )
+    new_engine = create_engine(database_url, connect_args=connect_args, **pool_args)
+    if is_sqlite:
+        event.listen(new_engine, "connect", _configure_sqlite_connection)
+    slow_query_log.install(new_engine, settings)
+    return new_engine
+
+
+engine = create_database_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+_swap_callbacks: List[Callable] = []
+
+
+def on_engine_swap(callback: Callable) -> Callable:
+    """Call ``callback(new_engine)`` whenever :func:`swap_engine` runs."""
+    _swap_callbacks.append(callback)
+    return callback
+
+
+def swap_engine(database_url: str):
+    """Serve every new session from ``database_url`` (see backup.restore).
+
+    Sessions already open finish on the old engine, whose idle connections
+    are closed. In-process caches are invalidated as after a foreign commit.
+    """
+    global engine
+    new_engine = create_database_engine(database_url)
+    old_engine, engine = engine, new_engine
+    SessionLocal.configure(bind=new_engine)
+    for callback in list(_swap_callbacks):
+        callback(new_engine)
+    notify_subscribers()
+    old_engine.dispose()
+    return new_engine
@@ -0,0 +1,418 @@
+"""Exact and near-duplicate recipe detection.
+
+Exact duplicates share a :func:`content_fingerprint`: a hash of the
+normalized title, ingredient list (order-insensitive) and instructions. It is
+stored on ``recipes.content_fingerprint`` under a unique index, so creating a
+second copy fails with :class:`DuplicateRecipeError`.
+
+Near duplicates are found with MinHash over word shingles and an LSH band
+index (``recipe_lsh_bands``). Recipes sharing any band bucket are candidates,
+and their signatures estimate the Jaccard similarity. The outbox keeps
+signatures current after every write, and a lookup reads only the buckets of
+one recipe rather than the whole catalog. With 16 bands of 4 rows, pairs
+around 0.5 similarity have even odds of becoming candidates, and pairs above
+0.8 almost always do.
+
+A batch job recomputes every signature in chunks on a process pool. It can
+also backfill the index for recipes written before it existed::
+
+    python -m dedupe report [--workers 4] [--chunk-size 1000] [--store]
+"""
+
+import argparse
+import hashlib
+import random
+import re
+import sys
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from models import Recipe, RecipeSignature, recipe_lsh_bands
+from outbox import register_handler
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.5
+# Buckets this crowded are boilerplate, not evidence of duplication.
+MAX_BUCKET_SIZE = 500
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+Signature = Tuple[int, ...]
+
+
+class DuplicateRecipeError(ValueError):
+    """Raised when a write would store a recipe whose content already exists."""
+
+    def __init__(self, existing_id: Optional[int]) -> None:
+        super().__init__(f"Recipe duplicates existing recipe {existing_id}")
+        self.existing_id = existing_id
+
+
+def normalize_text(value: Optional[str]) -> str:
+    value = _NON_WORD.sub(" ", (value or "").lower())
+    return _SPACES.sub(" ", value).strip()
+
+
+def normalize_ingredients(value: Optional[str]) -> str:
+    items = (normalize_text(item) for item in re.split(r"[,\n;]", value or ""))
+    return ", ".join(sorted(item for item in items if item))
+
+
+def content_fingerprint(
+    title: Optional[str], ingredients: Optional[str], instructions: Optional[str]
+) -> str:
+    canonical = "\x1f".join(
+        (
+            normalize_text(title),
+            normalize_ingredients(ingredients),
+            normalize_text(instructions),
+        )
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def shingles(
+    title: Optional[str], ingredients: Optional[str], instructions: Optional[str]
+) -> set:
+    words = " ".join(
+        (
+            normalize_text(title),
+            normalize_text(normalize_ingredients(ingredients)),
+            normalize_text(instructions),
+        )
+    ).split()
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {
+        " ".join(words[index : index + SHINGLE_SIZE])
+        for index in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+def minhash(shingle_set: Iterable[str]) -> Signature:
+    hashes = [_hash64(shingle) for shingle in shingle_set]
+    if not hashes:
+        return (_PRIME,) * NUM_PERMUTATIONS
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def signature_for(title, ingredients, instructions) -> Signature:
+    return minhash(shingles(title, ingredients, instructions))
+
+
+def band_buckets(signature: Signature) -> List[Tuple[int, int]]:
+    """``(band, bucket)`` pairs; buckets are signed 64-bit for SQLite."""
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(array("Q", rows).tobytes(), digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, "big", signed=True)))
+    return buckets
+
+
+def similarity(first: Signature, second: Signature) -> float:
+    """Estimated Jaccard similarity of the two signatures' shingle sets."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERMUTATIONS
+
+
+def pack_signature(signature: Signature) -> bytes:
+    return array("Q", signature).tobytes()
+
+
+def unpack_signature(data: bytes) -> Signature:
+    values = array("Q")
+    values.frombytes(data)
+    return tuple(values)
+
+
+# Incremental index ----------------------------------------------------------
+def store_signature(db: Session, recipe: Recipe) -> Signature:
+    """(Re)index one recipe in the caller's transaction."""
+    signature = signature_for(recipe.title, recipe.ingredients, recipe.instructions)
+    db.merge(RecipeSignature(recipe_id=recipe.id, signature=pack_signature(signature)))
+    db.execute(
+        delete(recipe_lsh_bands).where(recipe_lsh_bands.c.recipe_id == recipe.id)
+    )
+    db.execute(
+        insert(recipe_lsh_bands),
+        [
+            {"band": band, "bucket": bucket, "recipe_id": recipe.id}
+            for band, bucket in band_buckets(signature)
+        ],
+    )
+    return signature
+
+
+def delete_signature(db: Session, recipe_id: int) -> None:
+    db.execute(
+        delete(recipe_lsh_bands).where(recipe_lsh_bands.c.recipe_id == recipe_id)
+    )
+    db.execute(delete(RecipeSignature).where(RecipeSignature.recipe_id == recipe_id))
+
+
+@register_handler("recipe.created")
+@register_handler("recipe.updated")
+def _index_recipe(db: Session, payload: dict) -> None:
+    recipe = db.get(Recipe, payload["recipe_id"])
+    if recipe is not None:
+        store_signature(db, recipe)
+
+
+@register_handler("recipe.deleted")
+def _unindex_recipe(db: Session, payload: dict) -> None:
+    delete_signature(db, payload["recipe_id"])
+
+
+@dataclass
+class DuplicateMatch:
+    recipe_id: int
+    title: Optional[str]
+    similarity: float
+    exact: bool
+
+
+def find_duplicates(
+    db: Session,
+    recipe: Recipe,
+    threshold: float = DEFAULT_THRESHOLD,
+    limit: int = 10,
+) -> List[DuplicateMatch]:
+    """Likely duplicates of ``recipe``, most similar first.
+
+    Only rows sharing an LSH bucket with the recipe are read, so the cost
+    follows the number of candidates rather than the catalog size.
+    """
+    stored = db.get(RecipeSignature, recipe.id)
+    signature = (
+        unpack_signature(stored.signature)
+        if stored is not None
+        else signature_for(recipe.title, recipe.ingredients, recipe.instructions)
+    )
+    candidate_ids = select(recipe_lsh_bands.c.recipe_id).where(
+        tuple_(recipe_lsh_bands.c.band, recipe_lsh_bands.c.bucket).in_(
+            band_buckets(signature)
+        ),
+        recipe_lsh_bands.c.recipe_id != recipe.id,
+    )
+    rows = db.execute(
+        select(
+            Recipe.id,
+            Recipe.title,
+            Recipe.ingredients,
+            Recipe.instructions,
+            RecipeSignature.signature,
+        )
+        .join(RecipeSignature, RecipeSignature.recipe_id == Recipe.id)
+        .where(Recipe.id.in_(candidate_ids))
+    ).all()
+
+    fingerprint = content_fingerprint(
+        recipe.title, recipe.ingredients, recipe.instructions
+    )
+    matches = []
+    for recipe_id, title, ingredients, instructions, packed in rows:
+        score = similarity(signature, unpack_signature(packed))
+        if score < threshold:
+            continue
+        exact = content_fingerprint(title, ingredients, instructions) == fingerprint
+        matches.append(DuplicateMatch(recipe_id, title, round(score, 4), exact))
+    matches.sort(
+        key=lambda match: (not match.exact, -match.similarity, match.recipe_id)
+    )
+    return matches[:limit]
+
+
+# Batch report ---------------------------------------------------------------
+@dataclass
+class DedupeReport:
+    scanned: int = 0
+    exact_groups: List[List[int]] = field(default_factory=list)
+    near_pairs: List[Tuple[int, int, float]] = field(default_factory=list)
+    clusters: List[List[int]] = field(default_factory=list)
+
+
+def _signature_chunk(rows: Sequence[tuple]) -> List[Tuple[int, str, Signature]]:
+    """Worker-process entry point: fingerprints and signatures for a chunk."""
+    return [
+        (
+            recipe_id,
+            content_fingerprint(title, ingredients, instructions),
+            signature_for(title, ingredients, instructions),
+        )
+        for recipe_id, title, ingredients, instructions in rows
+    ]
+
+
+def _chunks(db: Session, chunk_size: int) -> Iterator[List[tuple]]:
+    after_id = 0
+    while True:
+        rows = db.execute(
+            select(Recipe.id, Recipe.title, Recipe.ingredients, Recipe.instructions)
+            .where(Recipe.id > after_id)
+            .order_by(Recipe.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        after_id = rows[-1][0]
+        yield [tuple(row) for row in rows]
+
+
+def _computed_chunks(db: Session, chunk_size: int, workers: int):
+    if workers <= 1:
+        for chunk in _chunks(db, chunk_size):
+            yield _signature_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for chunk in _chunks(db, chunk_size):
+            pending.append(pool.submit(_signature_chunk, chunk))
+            # Keep a bounded number of chunks in flight to cap memory.
+            if len(pending) >= workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def _clusters(pairs: Iterable[Tuple[int, int]]) -> List[List[int]]:
+    parent: Dict[int, int] = {}
+
+    def find(node: int) -> int:
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for first, second in pairs:
+        parent[find(first)] = find(second)
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for node in parent:
+        groups[find(node)].append(node)
+    return sorted(sorted(group) for group in groups.values())
+
+
+def batch_report(
+    db: Session,
+    threshold: float = DEFAULT_THRESHOLD,
+    workers: int = 1,
+    chunk_size: int = 1000,
+    store: bool = False,
+) -> DedupeReport:
+    """Scan the whole catalog; optionally rewrite the signature index."""
+    report = DedupeReport()
+    by_fingerprint: Dict[str, List[int]] = defaultdict(list)
+    signatures: Dict[int, Signature] = {}
+    buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+
+    for computed in _computed_chunks(db, chunk_size, workers):
+        for recipe_id, fingerprint, signature in computed:
+            report.scanned += 1
+            by_fingerprint[fingerprint].append(recipe_id)
+            signatures[recipe_id] = signature
+            for key in band_buckets(signature):
+                buckets[key].append(recipe_id)
+        if store:
+            ids = [recipe_id for recipe_id, _, _ in computed]
+            db.execute(
+                delete(recipe_lsh_bands).where(recipe_lsh_bands.c.recipe_id.in_(ids))
+            )
+            db.execute(
+                delete(RecipeSignature).where(RecipeSignature.recipe_id.in_(ids))
+            )
+            db.execute(
+                insert(RecipeSignature),
+                [
+                    {"recipe_id": recipe_id, "signature": pack_signature(signature)}
+                    for recipe_id, _, signature in computed
+                ],
+            )
+            db.execute(
+                insert(recipe_lsh_bands),
+                [
+                    {"band": band, "bucket": bucket, "recipe_id": recipe_id}
+                    for recipe_id, _, signature in computed
+                    for band, bucket in band_buckets(signature)
+                ],
+            )
+            db.commit()
+
+    report.exact_groups = sorted(
+        sorted(ids) for ids in by_fingerprint.values() if len(ids) > 1
+    )
+    exact_pairs = {
+        (group[0], other) for group in report.exact_groups for other in group[1:]
+    }
+    candidates = set()
+    for members in buckets.values():
+        if 1 < len(members) <= MAX_BUCKET_SIZE:
+            for index, first in enumerate(members):
+                for second in members[index + 1 :]:
+                    candidates.add((min(first, second), max(first, second)))
+    for first, second in sorted(candidates):
+        score = similarity(signatures[first], signatures[second])
+        if score >= threshold and (first, second) not in exact_pairs:
+            report.near_pairs.append((first, second, round(score, 4)))
+    report.clusters = _clusters(
+        list(exact_pairs) + [(first, second) for first, second, _ in report.near_pairs]
+    )
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m dedupe")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument(
+        "--store", action="store_true", help="also rewrite the signature index"
+    )
+    args = parser.parse_args(argv)
+
+    from database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        report = batch_report(
+            db,
+            threshold=args.threshold,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            store=args.store,
+        )
+    print(
+        f"scanned={report.scanned} exact_groups={len(report.exact_groups)} "
+        f"near_pairs={len(report.near_pairs)} clusters={len(report.clusters)}"
+    )
+    for group in report.exact_groups:
+        print("exact " + " ".join(map(str, group)))
+    for first, second, score in report.near_pairs:
+        print(f"near  {first} {second} {score:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,20 @@ const api = axios.create({
   },
 });
 
+// Fetch every page of a paged endpoint, following X-Next-Skip until the
+// server stops sending it; resolves like a single response with all rows
+const getAllPages = async (url, params = {}) => {
+  let response = await api.get(url, { params });
+  let data = response.data;
+  let nextSkip = response.headers['x-next-skip'];
+  while (nextSkip !== undefined) {
+    response = await api.get(url, { params: { ...params, skip: nextSkip } });
+    data = data.concat(response.data);
+    nextSkip = response.headers['x-next-skip'];
+  }
+  return { ...response, data };
+};
+
 export const recipeAPI = {
   // Get all recipes
   getRecipes: () => api.get('/recipes/'),
@@ -26,14 +40,15 @@ export const recipeAPI = {
   deleteRecipe: (id) => api.delete(`/recipes/${id}`),
   
   // Search recipes
-  searchRecipes: (query) => api.get(`/recipes/search/${query}`),
+  searchRecipes: (query) =>
+    getAllPages(`/recipes/search/${encodeURIComponent(query)}`),
   
   // Filter recipes by meal type and/or cuisine
   filterRecipes: (params) => {
-    const searchParams = new URLSearchParams();
-    if (params.meal_type) searchParams.append('meal_type', params.meal_type);
-    if (params.cuisine) searchParams.append('cuisine', params.cuisine);
-    return api.get(`/recipes/filter/?${searchParams.toString()}`);
+    const searchParams = {};
+    if (params.meal_type) searchParams.meal_type = params.meal_type;
+    if (params.cuisine) searchParams.cuisine = params.cuisine;
+    return getAllPages('/recipes/filter/', searchParams);
   },
   
   // Get unique meal types for filter dropdown
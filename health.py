@@ -0,0 +1,245 @@
+"""Liveness and readiness signals that never wait on the request path.
+
+* ``GET /health/live`` only proves the event loop answers.
+* ``GET /health/ready`` answers 503 when this worker should stop receiving
+  traffic. That happens when the database probe failed or went stale, or
+  when the connection pool, the event loop or the sync-endpoint threadpool
+  crosses its saturation threshold.
+
+Nothing here opens a session per request. :class:`HealthMonitor` probes the
+database from a background thread on a dedicated connection outside the
+pool. A busy pool therefore cannot delay the probe, and the probe cannot
+take a connection from requests. An asyncio task samples event-loop lag
+(sleep overshoot) and threadpool lag (the time a no-op waits for a worker
+thread). :class:`TimedQueuePool` records how long each checkout waited for
+a pooled connection.
+
+The samples are exported to ``/metrics`` as well:
+
+* ``db_pool_checkout_wait_seconds``
+* ``db_probe_up``
+* ``db_probe_latency_seconds``
+* ``event_loop_lag_seconds``
+* ``threadpool_lag_seconds``
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import anyio
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import NullPool, QueuePool
+
+from config import Settings
+
+logger = logging.getLogger(__name__)
+
+LAG_PROBE_INTERVAL = 0.5
+# Pool waits older than this no longer count against readiness.
+WAIT_WINDOW_SECONDS = 30.0
+
+POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_UP = Gauge("db_probe_up", "1 if the last background database probe succeeded.")
+DB_LATENCY = Gauge(
+    "db_probe_latency_seconds", "Latency of the last background database probe."
+)
+LOOP_LAG = Gauge("event_loop_lag_seconds", "How late the event loop woke a timer.")
+THREADPOOL_LAG = Gauge(
+    "threadpool_lag_seconds", "How long a no-op waited for a worker thread."
+)
+
+
+class WaitTracker:
+    """Recent pool checkout waits, for the readiness threshold."""
+
+    def __init__(self, window: float = WAIT_WINDOW_SECONDS) -> None:
+        self.window = window
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=4096)
+        self._lock = threading.Lock()
+
+    def add(self, wait: float) -> None:
+        with self._lock:
+            self._samples.append((time.monotonic(), wait))
+
+    def recent_max(self) -> float:
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            return max(
+                (wait for at, wait in self._samples if at >= cutoff), default=0.0
+            )
+
+
+pool_waits = WaitTracker()
+
+
+class TimedQueuePool(QueuePool):
+    """``QueuePool`` that records how long each checkout waited."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - started
+            POOL_WAIT.observe(wait)
+            pool_waits.add(wait)
+
+
+def pool_stats(engine) -> Dict[str, object]:
+    """In-use, overflow and capacity figures for ``engine``'s pool."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"kind": type(pool).__name__}
+    # QueuePool does not expose max_overflow; the engine was built with it.
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    capacity = pool.size() + max(max_overflow, 0)
+    in_use = pool.checkedout()
+    return {
+        "kind": type(pool).__name__,
+        "size": pool.size(),
+        "max_overflow": max_overflow,
+        "in_use": in_use,
+        "overflow": max(pool.overflow(), 0),
+        "utilization": round(in_use / capacity, 3) if capacity > 0 else None,
+        "recent_max_wait_ms": round(pool_waits.recent_max() * 1000, 2),
+    }
+
+
+class HealthMonitor:
+    """Background database probe plus event-loop and threadpool lag samples."""
+
+    def __init__(self, engine, settings: Settings) -> None:
+        self.settings = settings
+        self.interval = settings.health_probe_interval
+        self._probe_engine = None
+        self.use_engine(engine)
+        self.database: Dict[str, object] = {"status": "unknown", "checked_at": None}
+        self.loop_lag = 0.0
+        self.threadpool_lag = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def use_engine(self, engine) -> None:
+        """Watch ``engine`` from now on (also after a restore swapped it)."""
+        previous = self._probe_engine
+        self.engine = engine
+        # NullPool: every probe gets a fresh connection that is not a pool slot.
+        self._probe_engine = create_engine(
+            engine.url,
+            poolclass=NullPool,
+            connect_args=(
+                {"check_same_thread": False} if engine.dialect.name == "sqlite" else {}
+            ),
+        )
+        if previous is not None:
+            previous.dispose()
+
+    def probe_database(self) -> Dict[str, object]:
+        started = time.perf_counter()
+        try:
+            with self._probe_engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            status, error = "ok", None
+        except SQLAlchemyError as exc:
+            status, error = "error", type(exc).__name__
+        latency = time.perf_counter() - started
+        DB_UP.set(1 if status == "ok" else 0)
+        DB_LATENCY.set(latency)
+        self.database = {
+            "status": status,
+            "latency_ms": round(latency * 1000, 2),
+            "checked_at": time.time(),
+            "error": error,
+        }
+        return self.database
+
+    def database_status(self) -> Dict[str, object]:
+        """The cached probe, marked ``stale`` if the prober stopped reporting."""
+        result = dict(self.database)
+        checked_at = result.get("checked_at")
+        if checked_at is not None:
+            result["age_s"] = round(time.time() - checked_at, 2)
+            if result["age_s"] > 3 * self.interval:
+                result["status"] = "stale"
+        return result
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.probe_database()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="health-probe", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._probe_engine.dispose()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.probe_database()
+            except Exception:  # pragma: no cover - keep probing regardless
+                logger.exception("database health probe failed")
+
+    async def sample_lag(self, interval: float = LAG_PROBE_INTERVAL) -> None:
+        """Run on the event loop until cancelled."""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.loop_lag = max(time.perf_counter() - started - interval, 0.0)
+            LOOP_LAG.set(self.loop_lag)
+            submitted = time.perf_counter()
+            running = await anyio.to_thread.run_sync(time.perf_counter)
+            self.threadpool_lag = max(running - submitted, 0.0)
+            THREADPOOL_LAG.set(self.threadpool_lag)
+
+    def readiness(self) -> Tuple[bool, Dict[str, object]]:
+        """``(ready, report)``; ``report["failing"]`` names crossed thresholds."""
+        settings = self.settings
+        database = self.database_status()
+        pool = pool_stats(self.engine)
+        failing: List[str] = []
+        if database["status"] != "ok":
+            failing.append(f"database {database['status']}")
+        utilization = pool.get("utilization")
+        if (
+            utilization is not None
+            and utilization >= settings.ready_max_pool_utilization
+        ):
+            failing.append(f"pool utilization {utilization:.0%}")
+        wait_ms = pool.get("recent_max_wait_ms", 0.0)
+        if wait_ms > settings.ready_max_pool_wait_ms:
+            failing.append(f"pool wait {wait_ms:.0f} ms")
+        loop_lag_ms = self.loop_lag * 1000
+        if loop_lag_ms > settings.ready_max_loop_lag_ms:
+            failing.append(f"event loop lag {loop_lag_ms:.0f} ms")
+        threadpool_lag_ms = self.threadpool_lag * 1000
+        if threadpool_lag_ms > settings.ready_max_threadpool_lag_ms:
+            failing.append(f"threadpool lag {threadpool_lag_ms:.0f} ms")
+        report = {
+            "status": "ready" if not failing else "unready",
+            "failing": failing,
+            "checks": {
+                "database": database,
+                "pool": pool,
+                "event_loop_lag_ms": round(loop_lag_ms, 2),
+                "threadpool_lag_ms": round(threadpool_lag_ms, 2),
+            },
+        }
+        return not failing, report
@@ -0,0 +1,237 @@
+"""Replay a captured query workload and report which indexes paid off.
+
+Capture a workload by running the API with ``SLOW_QUERY_THRESHOLD_MS=0`` and
+``SLOW_QUERY_LOG_PATH=workload.jsonl``, then::
+
+    python -m index_advisor workload.jsonl [--database recipes.db] [--repeat 5]
+
+The database is copied twice with SQLite's online backup API, so the live
+file is never modified. The candidate indexes (by default those managed by
+:mod:`migrations`) are dropped from the baseline copy. Every captured
+``SELECT`` is replayed against both copies. For each candidate the report
+shows how many statements used it and how much time it saved, and it lists
+indexes that no replayed statement touched.
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import migrations
+
+_PLAN_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+
+
+@dataclass
+class Statement:
+    sql: str
+    parameters: Tuple
+    fingerprint: str = ""
+
+
+@dataclass
+class IndexUsage:
+    name: str
+    statements: int = 0
+    executions: int = 0
+    baseline_seconds: float = 0.0
+    indexed_seconds: float = 0.0
+
+    @property
+    def saved_seconds(self) -> float:
+        return self.baseline_seconds - self.indexed_seconds
+
+
+@dataclass
+class AdvisorReport:
+    replayed: int = 0
+    skipped: int = 0
+    candidates: Dict[str, IndexUsage] = field(default_factory=dict)
+    unused: List[str] = field(default_factory=list)
+
+
+def load_workload(lines: Iterable[str]) -> Tuple[List[Statement], int]:
+    """Parse slow-log JSON lines into replayable ``SELECT`` statements."""
+    statements, skipped = [], 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            skipped += 1
+            continue
+        sql = record.get("statement") or ""
+        parameters = record.get("parameters") or []
+        if isinstance(parameters, dict) or not sql.lstrip().upper().startswith(
+            ("SELECT", "WITH")
+        ):
+            skipped += 1
+            continue
+        if record.get("parameters_truncated") or any(
+            isinstance(value, (dict, list)) for value in parameters
+        ):
+            # Long strings were cut short, binary or nested values summarized,
+            # when logged; replaying them would time a different query.
+            skipped += 1
+            continue
+        statements.append(
+            Statement(sql, tuple(parameters), record.get("fingerprint", ""))
+        )
+    return statements, skipped
+
+
+def copy_database(source: str, target: str) -> None:
+    """Consistent copy of a (possibly live) SQLite database."""
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+def _indexes(conn: sqlite3.Connection) -> List[str]:
+    return [
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' "
+            "AND name NOT LIKE 'sqlite_autoindex_%'"
+        )
+    ]
+
+
+def _plan_indexes(conn: sqlite3.Connection, statement: Statement) -> List[str]:
+    rows = conn.execute(
+        "EXPLAIN QUERY PLAN " + statement.sql, statement.parameters
+    ).fetchall()
+    return sorted({name for row in rows for name in _PLAN_INDEX.findall(row[-1])})
+
+
+def _time(conn: sqlite3.Connection, statement: Statement, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(statement.sql, statement.parameters).fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def advise(
+    database: str,
+    statements: Sequence[Statement],
+    candidates: Optional[Sequence[str]] = None,
+    repeat: int = 3,
+) -> AdvisorReport:
+    """Replay ``statements`` with and without ``candidates`` and compare."""
+    report = AdvisorReport()
+    with tempfile.TemporaryDirectory() as workdir:
+        indexed_path = os.path.join(workdir, "indexed.db")
+        baseline_path = os.path.join(workdir, "baseline.db")
+        copy_database(database, indexed_path)
+        copy_database(database, baseline_path)
+
+        indexed = sqlite3.connect(indexed_path)
+        baseline = sqlite3.connect(baseline_path)
+        try:
+            present = _indexes(indexed)
+            names = list(
+                migrations.MANAGED_INDEXES if candidates is None else candidates
+            )
+            names = [name for name in names if name in present]
+            for name in names:
+                baseline.execute(f"DROP INDEX IF EXISTS {name}")
+                report.candidates[name] = IndexUsage(name)
+            for conn in (indexed, baseline):
+                conn.execute("ANALYZE")
+                conn.commit()
+
+            used = set()
+            for statement in statements:
+                try:
+                    plan = _plan_indexes(indexed, statement)
+                    indexed_seconds = _time(indexed, statement, repeat)
+                    baseline_seconds = _time(baseline, statement, repeat)
+                except sqlite3.Error:
+                    report.skipped += 1
+                    continue
+                report.replayed += 1
+                used.update(plan)
+                credited = [name for name in plan if name in report.candidates]
+                for name in credited:
+                    usage = report.candidates[name]
+                    usage.statements += 1
+                    usage.executions += repeat
+                    # Statements using several candidates split the credit.
+                    usage.baseline_seconds += baseline_seconds / len(credited)
+                    usage.indexed_seconds += indexed_seconds / len(credited)
+            report.unused = sorted(name for name in present if name not in used)
+        finally:
+            indexed.close()
+            baseline.close()
+    return report
+
+
+def format_report(report: AdvisorReport) -> str:
+    lines = [
+        f"replayed {report.replayed} statement(s), skipped {report.skipped}",
+        f"{'index':<40} {'stmts':>6} {'baseline ms':>12} {'indexed ms':>11} "
+        f"{'saved ms':>9}",
+    ]
+    for usage in sorted(
+        report.candidates.values(), key=lambda item: item.saved_seconds, reverse=True
+    ):
+        lines.append(
+            f"{usage.name:<40} {usage.statements:>6} "
+            f"{usage.baseline_seconds * 1000:>12.3f} "
+            f"{usage.indexed_seconds * 1000:>11.3f} "
+            f"{usage.saved_seconds * 1000:>9.3f}"
+        )
+    if report.unused:
+        lines.append("unused by this workload: " + ", ".join(report.unused))
+    return "\n".join(lines)
+
+
+def _default_database() -> Optional[str]:
+    from config import get_settings
+
+    url = get_settings().database_url
+    prefix = "sqlite:///"
+    return url[len(prefix) :] if url.startswith(prefix) else None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m index_advisor")
+    parser.add_argument("workload", help="slow query log (JSON lines)")
+    parser.add_argument("--database", default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--candidate",
+        action="append",
+        dest="candidates",
+        help="index to evaluate (repeatable); defaults to migration-managed ones",
+    )
+    args = parser.parse_args(argv)
+
+    database = args.database or _default_database()
+    if not database or not os.path.exists(database):
+        print("index_advisor needs an existing SQLite database", file=sys.stderr)
+        return 2
+    with open(args.workload) as handle:
+        statements, skipped = load_workload(handle)
+    report = advise(database, statements, args.candidates, max(1, args.repeat))
+    report.skipped += skipped
+    print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
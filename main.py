@@ -1,65 +1,175 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
+from typing import Literal, Optional
 
 
-from fastapi import Depends, FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import os
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator, metrics
-from sqlalchemy import text
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+import backup
+from admission import AdmissionControlMiddleware, AdmissionController
+from auth import require_admin
+from coherence import CoherenceMiddleware, CoherenceMonitor
 from config import get_settings
 from crud import (
+    build_shopping_list,
     create_recipe,
     create_tag,
     create_user,
     delete_recipe,
-    filter_recipes,
-    get_recipe,
-    get_recipes,
+    filter_recipes_payload,
+    find_duplicate_recipes,
+    get_recipe_payload,
+    get_recipes_payload,
+    get_tag,
+    get_tag_recipes_payload,
     get_unique_cuisines,
     get_unique_meal_types,
+    get_user,
+    get_user_recipes_payload,
     list_tags,
-    list_users,
-    search_recipes,
+    list_users_with_recipe_counts,
+    merge_tags,
+    recipe_total,
+    rename_tag,
+    search_recipes_payload,
     update_recipe,
+    update_user,
+    upsert_tags,
+    upsert_users,
 )
-from database import Base, SessionLocal, engine
-from schemas import Recipe, RecipeCreate, Tag, TagCreate, User, UserCreate
+from database import Base, SessionLocal, engine, on_engine_swap, swap_engine
+from dedupe import DuplicateRecipeError
+from health import HealthMonitor
+import migrations
+import popularity
+from outbox import OutboxWorker
+from profiling import ProfileStore, ProfilingMiddleware
+from schemas import (
+    DuplicateCandidate,
+    Recipe,
+    RecipeCreate,
+    ShoppingList,
+    ShoppingListItem,
+    ShoppingListRequest,
+    Tag,
+    TagBulkUpsert,
+    TagCreate,
+    TagMerge,
+    TagRename,
+    User,
+    UserBulkUpsert,
+    UserCreate,
+    UserWithRecipeCount,
+)
+from slow_query_log import QueryContextMiddleware
+from snapshots import SnapshotMiddleware
+from static_assets import mount_frontend
 
-# Create database tables
+# Create database tables, then bring existing databases up to date
 Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 DEFAULT_PAGE_LIMIT = settings.recipes_page_size
 
+# Other worker processes' commits invalidate this process's caches.
+coherence_monitor = CoherenceMonitor.for_engine(
+    engine, poll_interval=settings.coherence_poll_interval
+)
+
+# Cached database probe and saturation signals for /health and /health/ready.
+health_monitor = HealthMonitor(engine, settings)
+
+# Recipe views are counted in memory and written in batches (see popularity).
+popularity_flusher = popularity.PopularityFlusher(
+    SessionLocal,
+    popularity.views,
+    interval=settings.popularity_flush_interval,
+    half_life_hours=settings.popularity_half_life_hours,
+)
+
+# Recipe list sort orders; "popular" ranks by decayed view counts.
+RecipeSort = Literal["id", "popular"]
+
+
+@on_engine_swap
+def _follow_engine_swap(new_engine) -> None:
+    health_monitor.use_engine(new_engine)
+    if coherence_monitor is not None:
+        coherence_monitor.use_database(new_engine.url.database)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the outbox worker, coherence poller, health probes and view flusher."""
+    health_monitor.start()
+    popularity_flusher.start()
+    lag_sampler = asyncio.create_task(health_monitor.sample_lag())
+    if coherence_monitor is not None:
+        coherence_monitor.start()
+    worker = None
+    if settings.outbox_worker_enabled:
+        worker = OutboxWorker(
+            SessionLocal,
+            max_workers=settings.outbox_workers,
+            batch_size=settings.outbox_batch_size,
+            poll_interval=settings.outbox_poll_interval,
+            max_attempts=settings.outbox_max_attempts,
+        )
+        worker.start()
+    else:
+        # Tag, owner and snapshot refreshes only ever run as outbox events.
+        logger.warning(
+            "OUTBOX_WORKER_ENABLED=0: recipe documents%s stay stale after tag "
+            "and user edits until a process with the outbox worker runs",
+            " and catalog snapshots" if settings.snapshot_dir else "",
+        )
+    try:
+        yield
+    finally:
+        if worker is not None:
+            worker.stop()
+        if coherence_monitor is not None:
+            coherence_monitor.stop()
+        lag_sampler.cancel()
+        popularity_flusher.stop()
+        health_monitor.stop()
+
+
 app = FastAPI(
     title="Recipe Manager API",
     description="A simple API for managing recipes",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+profile_store = ProfileStore(settings.profile_dir, settings.profile_keep)
+# Innermost, so captures cover the handler rather than time spent queued.
+if settings.profile_sample_rate > 0 or settings.admin_token:
+    app.add_middleware(ProfilingMiddleware, settings=settings, store=profile_store)
 
-frontend_build_dir = os.path.join(os.path.dirname(__file__), "frontend", "build")
-if os.path.isdir(frontend_build_dir):
-    app.mount(
-        "/static",
-        StaticFiles(directory=os.path.join(frontend_build_dir, "static")),
-        name="static",
-    )
+app.add_middleware(QueryContextMiddleware)
 
-    @app.get("/{full_path:path}")
-    async def serve_react_app(full_path: str):
-        # If the path starts with 'api' or matches an API route, return 404 so FastAPI handles it
-        api_prefixes = ["recipes", "users", "tags", "meal-types", "cuisines", "health"]
-        if any(full_path.startswith(prefix) for prefix in api_prefixes):
-            return HTTPException(status_code=404)
-        index_path = os.path.join(frontend_build_dir, "index.html")
-        return FileResponse(index_path)
+if coherence_monitor is not None:
+    app.add_middleware(CoherenceMiddleware, monitor=coherence_monitor)
+
+# Admission control sits inside CORS so shed responses stay readable by browsers
+if settings.admission_enabled:
+    app.add_middleware(
+        AdmissionControlMiddleware, controller=AdmissionController(settings)
+    )
 
+# Published catalog snapshots skip admission and the database entirely
+app.add_middleware(SnapshotMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -68,6 +178,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Total-Count",
+        "X-Total-Count-Age",
+        "X-Next-After-Id",
+        "X-Next-Skip",
+    ],
 )
 
 
@@ -80,6 +196,32 @@ def get_db():
         db.close()
 
 
+def _json_response(payload) -> Response:
+    """Send an already-serialized JSON payload without re-encoding it.
+
+    Large pages arrive as an iterator of JSON fragments and are streamed.
+    """
+    if isinstance(payload, bytes):
+        return Response(content=payload, media_type="application/json")
+    return StreamingResponse(payload, media_type="application/json")
+
+
+def _with_next_skip(response: Response, next_skip: Optional[int]) -> Response:
+    """Point at the next page with ``X-Next-Skip``; absent on the last page."""
+    if next_skip is not None:
+        response.headers["X-Next-Skip"] = str(next_skip)
+    return response
+
+
+def _with_total(response: Response, total) -> Response:
+    """Attach ``X-Total-Count`` (and its age in seconds) when it is known."""
+    if total is not None:
+        count, age = total
+        response.headers["X-Total-Count"] = str(count)
+        response.headers["X-Total-Count-Age"] = str(int(age))
+    return response
+
+
 @app.get("/")
 def root():
     return {
@@ -88,15 +230,14 @@ def root():
 
 
 @app.get("/health", tags=["Monitoring"])
-def health_check(db: Session = Depends(get_db)):
-    """Lightweight application and database health indicator."""
-
-    db_status = "ok"
-    try:
-        db.execute(text("SELECT 1"))
-    except SQLAlchemyError:
-        db_status = "error"
-
+async def health_check():
+    """Lightweight application and database health indicator.
+
+    Reads the background probe instead of querying, so it never competes
+    with requests for a pooled connection.
+    """
+    database = health_monitor.database_status()
+    db_status = "ok" if database["status"] == "ok" else "error"
     overall_status = "ok" if db_status == "ok" else "degraded"
     return {
         "status": overall_status,
@@ -107,27 +248,68 @@ def health_check(db: Session = Depends(get_db)):
     }
 
 
+@app.get("/health/live", tags=["Monitoring"])
+async def liveness():
+    """The process is up and its event loop is answering."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", tags=["Monitoring"])
+async def readiness():
+    """503 once the pool, event loop or threadpool is saturated or the DB is down."""
+    ready, report = health_monitor.readiness()
+    report["timestamp"] = datetime.now(timezone.utc).isoformat()
+    return JSONResponse(report, status_code=200 if ready else 503)
+
+
+def _duplicate_conflict(error: DuplicateRecipeError) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail={
+            "message": "A recipe with the same content already exists",
+            "duplicate_of": error.existing_id,
+        },
+    )
+
+
 @app.post("/recipes/", response_model=Recipe)
 def create_recipe_endpoint(recipe: RecipeCreate, db: Session = Depends(get_db)):
     """Create a new recipe"""
-    return create_recipe(db, recipe)
+    try:
+        return create_recipe(db, recipe)
+    except DuplicateRecipeError as error:
+        raise _duplicate_conflict(error) from None
 
 
 @app.get("/recipes/", response_model=list[Recipe])
 def read_recipes(
-    skip: int = 0, limit: int = DEFAULT_PAGE_LIMIT, db: Session = Depends(get_db)
+    skip: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1),
+    total: bool = False,
+    sort: RecipeSort = "id",
+    db: Session = Depends(get_db),
 ):
-    """Get all recipes with pagination"""
-    return get_recipes(db, skip=skip, limit=limit)
+    """Get all recipes with pagination (limit capped at RECIPES_MAX_PAGE_SIZE)
+
+    With ``total=true`` the ``X-Total-Count`` header carries the number of
+    recipes across all pages. ``sort=popular`` orders by recent views.
+    """
+    response = _json_response(
+        get_recipes_payload(db, skip=skip, limit=limit, sort=sort)
+    )
+    if total:
+        response = _with_total(response, recipe_total(db))
+    return response
 
 
 @app.get("/recipes/{recipe_id}", response_model=Recipe)
 def read_recipe(recipe_id: int, db: Session = Depends(get_db)):
     """Get a specific recipe by ID"""
-    recipe = get_recipe(db, recipe_id=recipe_id)
-    if recipe is None:
+    payload = get_recipe_payload(db, recipe_id=recipe_id)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
-    return recipe
+    popularity.views.record(recipe_id)
+    return _json_response(payload)
 
 
 @app.put("/recipes/{recipe_id}", response_model=Recipe)
@@ -135,7 +317,10 @@ def update_recipe_endpoint(
     recipe_id: int, recipe: RecipeCreate, db: Session = Depends(get_db)
 ):
     """Update an existing recipe"""
-    updated_recipe = update_recipe(db, recipe_id=recipe_id, recipe=recipe)
+    try:
+        updated_recipe = update_recipe(db, recipe_id=recipe_id, recipe=recipe)
+    except DuplicateRecipeError as error:
+        raise _duplicate_conflict(error) from None
     if updated_recipe is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
     return updated_recipe
@@ -150,20 +335,79 @@ def delete_recipe_endpoint(recipe_id: int, db: Session = Depends(get_db)):
     return {"message": "Recipe deleted successfully"}
 
 
-@app.get("/recipes/search/{query}")
-def search_recipes_endpoint(query: str, db: Session = Depends(get_db)):
-    """Search recipes by title, cuisine, or meal type"""
-    recipes = search_recipes(db, query=query)
-    return recipes
+@app.get("/recipes/{recipe_id:int}/duplicates", response_model=list[DuplicateCandidate])
+def recipe_duplicates_endpoint(
+    recipe_id: int,
+    threshold: float = Query(0.5, ge=0.0, le=1.0),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """Likely duplicates of a recipe: exact copies first, then by similarity."""
+    matches = find_duplicate_recipes(db, recipe_id, threshold=threshold, limit=limit)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return matches
+
+
+@app.get("/recipes/search/{query}", response_model=list[Recipe])
+def search_recipes_endpoint(
+    query: str,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    total: bool = False,
+    sort: RecipeSort = "id",
+    db: Session = Depends(get_db),
+):
+    """Search recipes by title, cuisine, or meal type
+
+    Pages default to ``RECIPES_PAGE_SIZE``; while more matches follow,
+    ``X-Next-Skip`` holds the ``skip`` of the next page. With ``total=true``,
+    ``X-Total-Count`` is sent once the count is known (it is computed in the
+    background and may be up to ``X-Total-Count-Age`` seconds old). ``sort``
+    as for the list.
+    """
+    payload, next_skip = search_recipes_payload(
+        db, query=query, skip=skip, limit=limit, sort=sort
+    )
+    response = _with_next_skip(_json_response(payload), next_skip)
+    if total:
+        response = _with_total(response, recipe_total(db, query=query))
+    return response
 
 
 @app.get("/recipes/filter/", response_model=list[Recipe])
 def filter_recipes_endpoint(
-    meal_type: str = None, cuisine: str = None, db: Session = Depends(get_db)
+    meal_type: str = None,
+    cuisine: str = None,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    total: bool = False,
+    sort: RecipeSort = "id",
+    db: Session = Depends(get_db),
 ):
-    """Filter recipes by meal type and/or cuisine"""
-    recipes = filter_recipes(db, meal_type=meal_type, cuisine=cuisine)
-    return recipes
+    """Filter recipes by meal type and/or cuisine
+
+    Paged like search (``X-Next-Skip``); ``total`` and ``sort`` as for list.
+    """
+    payload, next_skip = filter_recipes_payload(
+        db, meal_type=meal_type, cuisine=cuisine, skip=skip, limit=limit, sort=sort
+    )
+    response = _with_next_skip(_json_response(payload), next_skip)
+    if total:
+        response = _with_total(
+            response, recipe_total(db, meal_type=meal_type, cuisine=cuisine)
+        )
+    return response
+
+
+@app.post("/shopping-list", response_model=ShoppingList)
+def shopping_list_endpoint(request: ShoppingListRequest, db: Session = Depends(get_db)):
+    """Merged, quantity-summed ingredient list for many recipes at once."""
+    items, missing = build_shopping_list(db, request.recipe_ids, request.servings)
+    return ShoppingList(
+        items=[ShoppingListItem.model_validate(item) for item in items],
+        missing_recipe_ids=missing,
+    )
 
 
 @app.get("/meal-types/")
@@ -185,9 +429,69 @@ def create_user_endpoint(user: UserCreate, db: Session = Depends(get_db)):
     return create_user(db, user)
 
 
-@app.get("/users/", response_model=list[User], tags=["Users"])
+@app.post("/users/bulk", response_model=list[User], tags=["Users"])
+def upsert_users_endpoint(request: UserBulkUpsert, db: Session = Depends(get_db)):
+    """Create or update many users by email in one statement.
+
+    Returns the users in request order with their ids. A repeated email takes
+    its last entry; an omitted ``name`` keeps the stored one.
+    """
+    return upsert_users(db, request.users)
+
+
+@app.put("/users/{user_id}", response_model=User, tags=["Users"])
+def update_user_endpoint(user_id: int, user: UserCreate, db: Session = Depends(get_db)):
+    """Update a user; their recipes' embedded owner follows through the outbox"""
+    try:
+        updated = update_user(db, user_id, user)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409, detail="Email already registered"
+        ) from None
+    if updated is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return updated
+
+
+@app.get("/users/", response_model=list[UserWithRecipeCount], tags=["Users"])
 def list_users_endpoint(db: Session = Depends(get_db)):
-    return list_users(db)
+    return [
+        UserWithRecipeCount(
+            id=user.id, email=user.email, name=user.name, recipe_count=count
+        )
+        for user, count in list_users_with_recipe_counts(db)
+    ]
+
+
+@app.get("/users/{user_id}/recipes", response_model=list[Recipe], tags=["Users"])
+def list_user_recipes_endpoint(
+    user_id: int,
+    after_id: int = 0,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1),
+    meal_type: str = None,
+    cuisine: str = None,
+    db: Session = Depends(get_db),
+):
+    """Keyset-paged recipes owned by one user.
+
+    Pass the ``X-Next-After-Id`` response header as ``after_id`` to fetch the
+    next page; the header is absent on the last page.
+    """
+    if get_user(db, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    payload, next_after_id = get_user_recipes_payload(
+        db,
+        user_id,
+        after_id=after_id,
+        limit=limit,
+        meal_type=meal_type,
+        cuisine=cuisine,
+    )
+    response = _json_response(payload)
+    if next_after_id is not None:
+        response.headers["X-Next-After-Id"] = str(next_after_id)
+    return response
 
 
 @app.post("/tags/", response_model=Tag, tags=["Tags"])
@@ -195,11 +499,106 @@ def create_tag_endpoint(tag: TagCreate, db: Session = Depends(get_db)):
     return create_tag(db, tag)
 
 
+@app.post("/tags/bulk", response_model=list[Tag], tags=["Tags"])
+def upsert_tags_endpoint(request: TagBulkUpsert, db: Session = Depends(get_db)):
+    """Ids for many tag names, creating the missing tags, in one statement"""
+    return upsert_tags(db, request.names)
+
+
+@app.put("/tags/{tag_id}", response_model=Tag, tags=["Tags"])
+def rename_tag_endpoint(tag_id: int, tag: TagRename, db: Session = Depends(get_db)):
+    """Rename a tag; renaming onto an existing tag's name merges the two"""
+    try:
+        renamed = rename_tag(db, tag_id, tag.name)
+    except IntegrityError:
+        # Another request took the name between the lookup and the commit.
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Tag name already exists") from None
+    if renamed is None:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    return renamed
+
+
+@app.post("/tags/{tag_id}/merge", response_model=Tag, tags=["Tags"])
+def merge_tags_endpoint(tag_id: int, merge: TagMerge, db: Session = Depends(get_db)):
+    """Move every recipe of this tag onto ``target_id`` and delete this tag"""
+    merged = merge_tags(db, tag_id, merge.target_id)
+    if merged is None:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    return merged
+
+
 @app.get("/tags/", response_model=list[Tag], tags=["Tags"])
 def list_tags_endpoint(db: Session = Depends(get_db)):
     return list_tags(db)
 
 
+@app.get("/tags/{tag_id}/recipes", response_model=list[Recipe], tags=["Tags"])
+def list_tag_recipes_endpoint(
+    tag_id: int,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+):
+    """Recipes carrying a tag, in id order"""
+    if get_tag(db, tag_id) is None:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    return _json_response(get_tag_recipes_payload(db, tag_id, skip=skip, limit=limit))
+
+
+@app.get("/debug/profiles", tags=["Monitoring"], include_in_schema=False)
+def list_profiles(limit: int = 20, _: None = Depends(require_admin)):
+    """Summaries of the latest profiling captures (requires ``X-Admin-Token``)."""
+    return {"captures": profile_store.latest(limit)}
+
+
+@app.get("/admin/backups", tags=["Monitoring"], include_in_schema=False)
+def list_backups_endpoint(_: None = Depends(require_admin)):
+    """Manifests of the kept database backups, newest first."""
+    return {"backups": backup.list_backups()}
+
+
+@app.post("/admin/backups", tags=["Monitoring"], include_in_schema=False)
+def create_backup_endpoint(_: None = Depends(require_admin)):
+    """Take an online, throttled backup of the live database."""
+    try:
+        return backup.create_backup()
+    except backup.BackupError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@app.post("/admin/backups/{name}/verify", tags=["Monitoring"], include_in_schema=False)
+def verify_backup_endpoint(name: str, _: None = Depends(require_admin)):
+    """Re-hash a backup against its manifest and run ``PRAGMA quick_check``."""
+    try:
+        return backup.verify(name)
+    except backup.BackupNotFoundError:
+        raise HTTPException(status_code=404, detail="Backup not found")
+
+
+@app.post("/admin/backups/{name}/restore", tags=["Monitoring"], include_in_schema=False)
+def restore_backup_endpoint(name: str, _: None = Depends(require_admin)):
+    """Restore a verified backup into a new file and serve from it."""
+    if settings.web_concurrency > 1:
+        # Other workers would keep serving the old file.
+        raise HTTPException(
+            status_code=409,
+            detail=(
+                f"WEB_CONCURRENCY={settings.web_concurrency}: run "
+                f"'python -m backup restore {name}', then restart every worker "
+                "with the DATABASE_URL it prints"
+            ),
+        )
+    try:
+        result = backup.restore(name)
+    except backup.BackupNotFoundError:
+        raise HTTPException(status_code=404, detail="Backup not found")
+    except backup.BackupError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    swap_engine(result["database_url"])
+    return result
+
+
 instrumentator = (
     Instrumentator()
     .add(metrics.requests())
@@ -214,3 +613,10 @@ instrumentator.instrument(app).expose(
     should_gzip=True,
     tags=["Monitoring"],
 )
+
+
+# The SPA fallback matches every GET path, so it is registered after all API
+# routes (including /metrics) to keep them reachable.
+frontend_build_dir = os.path.join(os.path.dirname(__file__), "frontend", "build")
+if os.path.isdir(frontend_build_dir):
+    mount_frontend(app, frontend_build_dir)
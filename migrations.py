@@ -0,0 +1,279 @@
+"""Versioned, idempotent schema migrations.
+
+``Base.metadata.create_all`` creates missing tables but never touches tables
+that already exist, so an existing ``recipes.db`` would not pick up new
+indexes or columns. Each :class:`Migration` here runs once, in its own short
+transaction, and is recorded in ``schema_migrations``. Steps are written to be
+safe to re-run (``CREATE INDEX IF NOT EXISTS`` and friends), so two processes
+racing at startup both end up on the same schema::
+
+    python -m migrations            # apply pending migrations
+    python -m migrations status     # list applied / pending versions
+"""
+
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+VERSION_TABLE = "schema_migrations"
+
+# Names of every index created through ``_create_index``, for index_advisor.
+MANAGED_INDEXES: List[str] = []
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def _create_index(name: str, table: str, columns: Sequence[str]):
+    MANAGED_INDEXES.append(name)
+
+    def apply(conn: Connection) -> None:
+        conn.execute(
+            text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+        )
+
+    return apply
+
+
+def _add_column(table: str, column: str, ddl_type: str):
+    def apply(conn: Connection) -> None:
+        existing = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+        if column not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+    return apply
+
+
+def _backfill_content_fingerprints(conn: Connection, chunk_size: int = 1000) -> None:
+    """Fingerprint existing recipes; later copies of a recipe keep NULL.
+
+    NULL is exempt from the unique index, so the oldest copy claims the
+    fingerprint and existing duplicates stay readable (``python -m dedupe
+    report`` lists them) instead of blocking the migration.
+    """
+    from compression import decode
+    from dedupe import content_fingerprint
+
+    seen = set(
+        conn.scalars(
+            text(
+                "SELECT content_fingerprint FROM recipes "
+                "WHERE content_fingerprint IS NOT NULL"
+            )
+        )
+    )
+    after_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, title, ingredients, instructions FROM recipes "
+                "WHERE id > :after_id AND content_fingerprint IS NULL "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"after_id": after_id, "limit": chunk_size},
+        ).all()
+        if not rows:
+            return
+        after_id = rows[-1][0]
+        updates = []
+        for recipe_id, title, ingredients, instructions in rows:
+            fingerprint = content_fingerprint(
+                title, decode(ingredients), decode(instructions)
+            )
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                updates.append({"id": recipe_id, "fingerprint": fingerprint})
+        if updates:
+            conn.execute(
+                text(
+                    "UPDATE recipes SET content_fingerprint = :fingerprint WHERE id = :id"
+                ),
+                updates,
+            )
+
+
+def _backfill_facet_counts(conn: Connection) -> None:
+    """Create the counter table if needed and fill it from ``recipes``."""
+    import counts
+    from models import RecipeFacetCount
+
+    RecipeFacetCount.__table__.create(conn, checkfirst=True)
+    counts.rebuild(conn)
+
+
+def _backfill_popularity(conn: Connection) -> None:
+    """Create the popularity table if needed and give every recipe a row."""
+    import popularity
+    from models import RecipePopularity
+
+    RecipePopularity.__table__.create(conn, checkfirst=True)
+    popularity.backfill(conn)
+
+
+def _create_unique_index(name: str, table: str, columns: Sequence[str]):
+    MANAGED_INDEXES.append(name)
+
+    def apply(conn: Connection) -> None:
+        conn.execute(
+            text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {name} "
+                f"ON {table} ({', '.join(columns)})"
+            )
+        )
+
+    return apply
+
+
+def _steps(*steps: Callable[[Connection], None]):
+    def apply(conn: Connection) -> None:
+        for step in steps:
+            step(conn)
+
+    return apply
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "owner keyset and owner + facet indexes on recipes",
+        _steps(
+            _create_index("ix_recipes_owner_id_id", "recipes", ["owner_id", "id"]),
+            _create_index(
+                "ix_recipes_owner_cuisine_meal_type",
+                "recipes",
+                ["owner_id", "cuisine", "meal_type"],
+            ),
+        ),
+    ),
+    Migration(
+        2,
+        "composite meal_type + cuisine index for filters",
+        _create_index(
+            "ix_recipes_meal_type_cuisine", "recipes", ["meal_type", "cuisine"]
+        ),
+    ),
+    Migration(
+        3,
+        "reverse tag_id index on recipe_tags",
+        _create_index(
+            "ix_recipe_tags_tag_id_recipe_id", "recipe_tags", ["tag_id", "recipe_id"]
+        ),
+    ),
+    Migration(
+        4,
+        "unique content fingerprint on recipes",
+        _steps(
+            _add_column("recipes", "content_fingerprint", "VARCHAR"),
+            _backfill_content_fingerprints,
+            _create_unique_index(
+                "ix_recipes_content_fingerprint", "recipes", ["content_fingerprint"]
+            ),
+        ),
+    ),
+    Migration(5, "backfill recipe facet counters", _backfill_facet_counts),
+    Migration(6, "popularity rows for existing recipes", _backfill_popularity),
+]
+
+
+def _ensure_version_table(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+                "version INTEGER PRIMARY KEY, "
+                "description VARCHAR NOT NULL, "
+                "applied_at FLOAT NOT NULL)"
+            )
+        )
+
+
+def applied_versions(engine: Engine) -> List[int]:
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return list(
+            conn.scalars(text(f"SELECT version FROM {VERSION_TABLE} ORDER BY version"))
+        )
+
+
+def upgrade(
+    engine: Engine,
+    migrations: Optional[Sequence[Migration]] = None,
+    analyze: bool = True,
+) -> List[int]:
+    """Apply pending migrations in order; returns the versions applied.
+
+    ``ANALYZE`` runs afterwards (SQLite only) so the planner has statistics
+    for the new indexes.
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    done = set(applied_versions(engine))
+    applied = []
+    for migration in sorted(migrations, key=lambda item: item.version):
+        if migration.version in done:
+            continue
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                migration.apply(conn)
+                conn.execute(
+                    text(
+                        f"INSERT INTO {VERSION_TABLE} (version, description, applied_at) "
+                        "VALUES (:version, :description, :applied_at)"
+                    ),
+                    {
+                        "version": migration.version,
+                        "description": migration.description,
+                        "applied_at": time.time(),
+                    },
+                )
+        except IntegrityError:
+            # Another process recorded this version first; its steps are ours.
+            continue
+        applied.append(migration.version)
+        logger.info(
+            "applied migration %s (%s) in %.3fs",
+            migration.version,
+            migration.description,
+            time.perf_counter() - started,
+        )
+    if applied and analyze and engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    return applied
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import models  # noqa: F401 - registers the tables on Base.metadata
+    from database import Base, engine
+
+    args = sys.argv[1:] if argv is None else argv
+    command = args[0] if args else "upgrade"
+    if command == "upgrade":
+        Base.metadata.create_all(bind=engine)
+        applied = upgrade(engine)
+        print(f"applied {len(applied)} migration(s): {applied}")
+        return 0
+    if command == "status":
+        done = set(applied_versions(engine))
+        for migration in MIGRATIONS:
+            state = "applied" if migration.version in done else "pending"
+            print(f"{migration.version:>4} {state:<8} {migration.description}")
+        return 0
+    print("usage: python -m migrations [upgrade|status]", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
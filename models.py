@@ -1,9 +1,21 @@
 # in this file we define the database models using SQLAlchemy ORM
 # we have recipes.db as our database file
 
-from sqlalchemy import Column, ForeignKey, Integer, String, Table
+from sqlalchemy import (
+    Column,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    PrimaryKeyConstraint,
+    String,
+    Table,
+    Text,
+)
 from sqlalchemy.orm import relationship
 
+from compression import CompressedText
 from database import Base
 
 
@@ -12,6 +24,8 @@ recipe_tags = Table(
     Base.metadata,
     Column("recipe_id", ForeignKey("recipes.id"), primary_key=True),
     Column("tag_id", ForeignKey("tags.id"), primary_key=True),
+    # Reverse lookup (recipes for a tag); the primary key only covers recipe_id.
+    Index("ix_recipe_tags_tag_id_recipe_id", "tag_id", "recipe_id"),
 )
 
 
@@ -31,20 +45,127 @@ class Tag(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, nullable=False, index=True)
 
-    recipes = relationship(
-        "Recipe", secondary=recipe_tags, back_populates="tags", lazy="joined"
-    )
+    # Loaded on access only: eager-joining every recipe of every tag turned
+    # tag listings and tag lookups on the write path into catalog scans.
+    recipes = relationship("Recipe", secondary=recipe_tags, back_populates="tags")
 
 
 class Recipe(Base):  # this Recipe class represents the recipes table in the db
     __tablename__ = "recipes"
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
-    ingredients = Column(String)
+    # Stored compressed when TEXT_COMPRESSION is on (see compression).
+    ingredients = Column(CompressedText)
     cuisine = Column(String, index=True)
     meal_type = Column(String, index=True)
-    instructions = Column(String)
+    instructions = Column(CompressedText)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # Hash of the normalized title, ingredients and instructions (see dedupe).
+    content_fingerprint = Column(String, nullable=True, unique=True, index=True)
 
     owner = relationship("User", back_populates="recipes")
     tags = relationship("Tag", secondary=recipe_tags, back_populates="recipes")
+
+    __table_args__ = (
+        # RecipeRepository.filter combines both facets.
+        Index("ix_recipes_meal_type_cuisine", "meal_type", "cuisine"),
+        # Owner-scoped keyset paging and owner + facet filters.
+        Index("ix_recipes_owner_id_id", "owner_id", "id"),
+        Index("ix_recipes_owner_cuisine_meal_type", "owner_id", "cuisine", "meal_type"),
+    )
+
+
+class RecipeDocument(Base):
+    """Precomputed JSON document for a recipe, served without ORM hydration."""
+
+    __tablename__ = "recipe_documents"
+
+    recipe_id = Column(Integer, ForeignKey("recipes.id"), primary_key=True)
+    document = Column(LargeBinary, nullable=False)
+
+
+class OutboxEvent(Base):
+    """Post-write job recorded in the same transaction as the write itself."""
+
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True)
+    topic = Column(String, nullable=False)
+    payload = Column(Text, nullable=False, default="{}")
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    # For pending events: earliest run time; for running ones: lease expiry.
+    available_at = Column(Float, nullable=False)
+    created_at = Column(Float, nullable=False)
+    claim_token = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_outbox_events_status_available_at", "status", "available_at"),
+    )
+
+
+class RecipeSignature(Base):
+    """MinHash signature of a recipe's content, for near-duplicate lookups."""
+
+    __tablename__ = "recipe_signatures"
+
+    recipe_id = Column(Integer, ForeignKey("recipes.id"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+
+
+# LSH index over the signatures: recipes sharing any (band, bucket) pair are
+# near-duplicate candidates.
+recipe_lsh_bands = Table(
+    "recipe_lsh_bands",
+    Base.metadata,
+    Column("band", Integer, nullable=False),
+    Column("bucket", Integer, nullable=False),
+    Column("recipe_id", ForeignKey("recipes.id"), nullable=False),
+    PrimaryKeyConstraint("band", "bucket", "recipe_id"),
+    Index("ix_recipe_lsh_bands_recipe_id", "recipe_id"),
+)
+
+
+class RecipeFacetCount(Base):
+    """Maintained recipe count per facet key (see counts.facet_key)."""
+
+    __tablename__ = "recipe_facet_counts"
+
+    key = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class DataStamp(Base):
+    """Version counters bumped by every write to a dataset (see catalog)."""
+
+    __tablename__ = "data_stamps"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class TextDictionary(Base):
+    """Trained compression dictionary, keyed by a hash of its content."""
+
+    __tablename__ = "text_dictionaries"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    codec = Column(String, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(Float, nullable=False)
+
+
+class RecipePopularity(Base):
+    """Aggregated views and decayed popularity score (see popularity)."""
+
+    __tablename__ = "recipe_popularity"
+
+    recipe_id = Column(Integer, ForeignKey("recipes.id"), primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+    score = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        # sort=popular walks this index in order and stops at the page end.
+        Index("ix_recipe_popularity_score_recipe_id", score.desc(), recipe_id),
+    )
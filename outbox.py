@@ -0,0 +1,296 @@
+"""Transactional outbox and a bounded worker pool for post-write work.
+
+Writes call :func:`enqueue` inside their own transaction, so an event exists
+if and only if the write committed. :class:`OutboxWorker` claims due events
+with a lease, runs the registered handler for each topic on a bounded thread
+pool, and commits the handler's database effects together with the event's
+``done`` status. Failed events are retried with exponential backoff until
+``max_attempts``; a crashed worker's lease simply expires and another worker
+picks the event up again, so handlers must be idempotent.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Session, dict], None]
+
+_handlers: Dict[str, List[Handler]] = {}
+_running_workers: "Set[OutboxWorker]" = set()
+
+LEASE_SECONDS = 60.0
+RETRY_BASE_SECONDS = 1.0
+DONE_RETENTION_SECONDS = 3600.0
+
+PROCESSED = Counter(
+    "outbox_events_processed_total",
+    "Outbox events handled by the worker, by topic and outcome.",
+    ["topic", "outcome"],
+)
+PENDING = Gauge("outbox_pending_events", "Outbox events waiting to be processed.")
+LAG = Gauge(
+    "outbox_lag_seconds", "Age of the oldest unprocessed outbox event in seconds."
+)
+IN_FLIGHT = Gauge("outbox_in_flight_events", "Outbox events currently executing.")
+
+
+def register_handler(topic: str) -> Callable[[Handler], Handler]:
+    """Register ``fn(db, payload)`` as a handler for ``topic``.
+
+    A topic may have several handlers; they run in registration order inside
+    the event's transaction, so a failure in any of them retries all of them.
+    """
+
+    def decorator(fn: Handler) -> Handler:
+        _handlers.setdefault(topic, []).append(fn)
+        return fn
+
+    return decorator
+
+
+def enqueue(db: Session, topic: str, payload: Optional[dict] = None) -> None:
+    """Record an event in the caller's transaction (no flush, no commit)."""
+    now = time.time()
+    db.add(
+        OutboxEvent(
+            topic=topic,
+            payload=json.dumps(payload or {}, sort_keys=True),
+            status="pending",
+            attempts=0,
+            available_at=now,
+            created_at=now,
+        )
+    )
+
+
+def notify_workers() -> None:
+    """Wake in-process workers after a commit instead of waiting for a poll."""
+    for worker in list(_running_workers):
+        worker.notify()
+
+
+def _retry_delay(attempts: int) -> float:
+    return RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+
+
+class OutboxWorker:
+    """Polls the outbox and dispatches events to a bounded thread pool."""
+
+    def __init__(
+        self,
+        session_factory,
+        max_workers: int = 2,
+        batch_size: int = 50,
+        poll_interval: float = 0.5,
+        max_attempts: int = 5,
+    ) -> None:
+        self._session_factory = session_factory
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        # Never hold more claimed events than the pool can start soon.
+        self._capacity = threading.BoundedSemaphore(max_workers * 2)
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._last_prune = 0.0
+
+    # Lifecycle -----------------------------------------------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="outbox"
+        )
+        self._thread = threading.Thread(
+            target=self._run, name="outbox-poller", daemon=True
+        )
+        self._thread.start()
+        _running_workers.add(self)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        _running_workers.discard(self)
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def notify(self) -> None:
+        """Wake the poller early, e.g. right after a write committed."""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                claimed = self._claim_and_submit()
+                self._record_lag()
+                self._prune()
+            except Exception:  # pragma: no cover - keep the poller alive
+                logger.exception("outbox poll failed")
+                claimed = 0
+            if not claimed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    # Claiming ------------------------------------------------------------
+    def _claim(self, db: Session, limit: int) -> list:
+        """Atomically lease up to ``limit`` due events; returns their ids."""
+        now = time.time()
+        token = uuid.uuid4().hex
+        due = (
+            select(OutboxEvent.id)
+            .where(
+                OutboxEvent.status.in_(("pending", "running")),
+                OutboxEvent.available_at <= now,
+            )
+            .order_by(OutboxEvent.id)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        db.execute(
+            update(OutboxEvent)
+            .where(
+                OutboxEvent.id.in_(due),
+                OutboxEvent.status.in_(("pending", "running")),
+            )
+            .values(
+                status="running",
+                claim_token=token,
+                available_at=now + LEASE_SECONDS,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        ids = list(
+            db.scalars(
+                select(OutboxEvent.id)
+                .where(OutboxEvent.claim_token == token)
+                .order_by(OutboxEvent.id)
+            )
+        )
+        return [(event_id, token) for event_id in ids]
+
+    def _claim_and_submit(self) -> int:
+        capacity = 0
+        while capacity < self.batch_size and self._capacity.acquire(blocking=False):
+            capacity += 1
+        if not capacity:
+            return 0
+        with self._session_factory() as db:
+            claimed = self._claim(db, capacity)
+        for _ in range(capacity - len(claimed)):
+            self._capacity.release()
+        for event_id, token in claimed:
+            IN_FLIGHT.inc()
+            self._executor.submit(self._process_and_release, event_id, token)
+        return len(claimed)
+
+    def _process_and_release(self, event_id: int, token: str) -> None:
+        try:
+            self.process(event_id, token)
+        finally:
+            IN_FLIGHT.dec()
+            self._capacity.release()
+            self._wake.set()
+
+    # Processing ----------------------------------------------------------
+    def process(self, event_id: int, token: str) -> bool:
+        """Run one claimed event; returns ``True`` if it completed."""
+        with self._session_factory() as db:
+            event = db.get(OutboxEvent, event_id)
+            if event is None or event.claim_token != token:
+                return False
+            topic, attempts = event.topic, event.attempts
+            handlers = _handlers.get(topic, [])
+            try:
+                payload = json.loads(event.payload)
+                for handler in handlers:
+                    handler(db, payload)
+                completed = db.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id == event_id, OutboxEvent.claim_token == token)
+                    .values(status="done", claim_token=None, last_error=None)
+                    .execution_options(synchronize_session=False)
+                )
+                if completed.rowcount != 1:
+                    # Our lease expired and someone else owns the event now.
+                    db.rollback()
+                    return False
+                db.commit()
+                PROCESSED.labels(topic, "done" if handlers else "skipped").inc()
+                return True
+            except Exception as exc:
+                db.rollback()
+                attempts += 1
+                failed = attempts >= self.max_attempts
+                db.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id == event_id, OutboxEvent.claim_token == token)
+                    .values(
+                        status="failed" if failed else "pending",
+                        attempts=attempts,
+                        claim_token=None,
+                        available_at=time.time() + _retry_delay(attempts),
+                        last_error=repr(exc)[:2000],
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+                PROCESSED.labels(topic, "failed" if failed else "retry").inc()
+                logger.warning("outbox event %s (%s) failed: %r", event_id, topic, exc)
+                return False
+
+    def run_once(self) -> int:
+        """Claim and process due events inline; used by tests and CLIs."""
+        processed = 0
+        while True:
+            with self._session_factory() as db:
+                claimed = self._claim(db, self.batch_size)
+            if not claimed:
+                return processed
+            for event_id, token in claimed:
+                processed += int(self.process(event_id, token))
+
+    # Housekeeping --------------------------------------------------------
+    def _record_lag(self) -> None:
+        with self._session_factory() as db:
+            count, oldest = db.execute(
+                select(
+                    func.count(OutboxEvent.id), func.min(OutboxEvent.created_at)
+                ).where(OutboxEvent.status.in_(("pending", "running")))
+            ).one()
+        PENDING.set(count)
+        LAG.set(time.time() - oldest if oldest is not None else 0.0)
+
+    def _prune(self) -> None:
+        now = time.time()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        with self._session_factory() as db:
+            db.execute(
+                delete(OutboxEvent).where(
+                    OutboxEvent.status == "done",
+                    OutboxEvent.created_at < now - DONE_RETENTION_SECONDS,
+                )
+            )
+            db.commit()
@@ -0,0 +1,257 @@
+"""Popularity ranking from recipe views, without a write per read.
+
+``GET /recipes/{id}`` calls ``views.record(recipe_id)``. That is one dict
+update under one of ``STRIPES`` locks, picked by recipe id, so concurrent
+requests rarely contend. A :class:`PopularityFlusher` thread drains the
+counts every ``POPULARITY_FLUSH_INTERVAL`` seconds and adds them to
+``recipe_popularity`` in one batched upsert. Each worker process flushes its
+own counts; the upsert adds, so the counts of all workers aggregate.
+
+Scores decay with a half-life of ``POPULARITY_HALF_LIFE_HOURS``. Rewriting
+every row as time passes would be a full-table write per flush. Instead, a
+view at time ``t`` adds ``2 ** ((t - epoch) / half_life)``: newer views
+weigh exponentially more. The ranking is then exactly the ranking of
+scores decayed to any common moment, and a flush only touches the recipes
+viewed since the last one. Once the weights grow large, the scores are
+scaled down together and the epoch (``data_stamps`` row
+``popularity_epoch``) moves forward.
+
+Every recipe gets a row when it is created, so ``sort=popular`` walks
+``ix_recipe_popularity_score_recipe_id`` in order and stops at the page end.
+Rows for existing recipes are created by migration 6, or with::
+
+    python -m popularity backfill
+"""
+
+import logging
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from prometheus_client import Counter
+from sqlalchemy import delete, literal, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from models import DataStamp, Recipe, RecipePopularity
+
+logger = logging.getLogger(__name__)
+
+STRIPES = 16
+EPOCH_NAME = "popularity_epoch"
+# Half-lives between rebases; 2 ** 256 leaves floats ample headroom.
+MAX_EXPONENT = 256
+
+FLUSHED_VIEWS = Counter(
+    "recipe_views_flushed_total", "Recipe views written to recipe_popularity."
+)
+FLUSH_FAILURES = Counter(
+    "recipe_views_flush_failures_total",
+    "Popularity flushes that failed; their views are retried on the next one.",
+)
+
+
+class ViewCounter:
+    """Per-process view counts, striped by recipe id to spread lock contention."""
+
+    def __init__(self, stripes: int = STRIPES) -> None:
+        self._stripes = [(threading.Lock(), {}) for _ in range(stripes)]
+
+    def record(self, recipe_id: int, views: int = 1) -> None:
+        lock, counts = self._stripes[recipe_id % len(self._stripes)]
+        with lock:
+            counts[recipe_id] = counts.get(recipe_id, 0) + views
+
+    def merge(self, views: Dict[int, int]) -> None:
+        """Add ``views`` back, e.g. after a failed flush."""
+        for recipe_id, count in views.items():
+            self.record(recipe_id, count)
+
+    def drain(self) -> Dict[int, int]:
+        """Take every pending count, leaving the counter empty."""
+        drained: Dict[int, int] = {}
+        for lock, counts in self._stripes:
+            with lock:
+                drained.update(counts)
+                counts.clear()
+        return drained
+
+
+views = ViewCounter()
+
+
+def track(db: Session, recipe_id: int) -> None:
+    """Give a new recipe its (empty) popularity row (no commit)."""
+    db.execute(
+        insert(RecipePopularity)
+        .values(recipe_id=recipe_id, views=0, score=0.0)
+        .on_conflict_do_nothing()
+    )
+
+
+def forget(db: Session, recipe_ids: List[int]) -> None:
+    """Drop the popularity rows of deleted recipes (no commit)."""
+    db.execute(
+        delete(RecipePopularity).where(RecipePopularity.recipe_id.in_(recipe_ids))
+    )
+
+
+def backfill(db) -> int:
+    """Create missing rows for existing recipes; returns how many were added."""
+    result = db.execute(
+        insert(RecipePopularity)
+        .from_select(
+            ["recipe_id", "views", "score"],
+            select(Recipe.id, literal(0), literal(0.0)).where(
+                ~select(RecipePopularity.recipe_id)
+                .where(RecipePopularity.recipe_id == Recipe.id)
+                .exists()
+            ),
+        )
+        .on_conflict_do_nothing()
+    )
+    return result.rowcount
+
+
+def _epoch(db: Session, now: float) -> int:
+    db.execute(
+        insert(DataStamp)
+        .values(name=EPOCH_NAME, version=int(now))
+        .on_conflict_do_nothing()
+    )
+    return db.scalar(select(DataStamp.version).where(DataStamp.name == EPOCH_NAME))
+
+
+def _rebase(db: Session, epoch: int, half_life: float, exponent: float) -> int:
+    """Scale every score down by whole half-lives and move the epoch with it."""
+    shift = int(exponent)
+    db.execute(
+        update(RecipePopularity).values(score=RecipePopularity.score * 2.0**-shift)
+    )
+    epoch += round(shift * half_life)
+    db.execute(
+        update(DataStamp).where(DataStamp.name == EPOCH_NAME).values(version=epoch)
+    )
+    return epoch
+
+
+def flush(
+    db: Session, views: Dict[int, int], half_life: float, now: Optional[float] = None
+) -> int:
+    """Add drained view counts to ``recipe_popularity`` (no commit).
+
+    Views of recipes deleted since they were counted are dropped. Returns the
+    number of recipes updated.
+    """
+    if not views:
+        return 0
+    now = time.time() if now is None else now
+    epoch = _epoch(db, now)
+    exponent = (now - epoch) / half_life
+    if exponent > MAX_EXPONENT:
+        epoch = _rebase(db, epoch, half_life, exponent)
+        exponent = (now - epoch) / half_life
+    weight = 2.0**exponent
+    existing = db.scalars(
+        select(Recipe.id).where(Recipe.id.in_(list(views))).order_by(Recipe.id)
+    ).all()
+    if not existing:
+        return 0
+    statement = insert(RecipePopularity)
+    # One executemany for every viewed recipe.
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[RecipePopularity.recipe_id],
+            set_={
+                "views": RecipePopularity.views + statement.excluded.views,
+                "score": RecipePopularity.score + statement.excluded.score,
+            },
+        ),
+        [
+            {
+                "recipe_id": recipe_id,
+                "views": views[recipe_id],
+                "score": views[recipe_id] * weight,
+            }
+            for recipe_id in existing
+        ],
+    )
+    return len(existing)
+
+
+class PopularityFlusher:
+    """Background thread that drains a :class:`ViewCounter` into the database."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        counter: ViewCounter,
+        interval: float,
+        half_life_hours: float,
+    ) -> None:
+        self.session_factory = session_factory
+        self.counter = counter
+        self.interval = interval
+        self.half_life = half_life_hours * 3600
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def flush_once(self) -> int:
+        pending = self.counter.drain()
+        if not pending:
+            return 0
+        try:
+            with self.session_factory() as db:
+                updated = flush(db, pending, self.half_life)
+                db.commit()
+        except SQLAlchemyError:
+            self.counter.merge(pending)
+            FLUSH_FAILURES.inc()
+            logger.exception("popularity flush failed; retrying next interval")
+            return 0
+        FLUSHED_VIEWS.inc(sum(pending.values()))
+        return updated
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="popularity-flush", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # Views counted since the last tick are not lost on shutdown.
+        self.flush_once()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush_once()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import models  # noqa: F401 - registers the tables on Base.metadata
+    from database import Base, SessionLocal, engine
+
+    args = sys.argv[1:] if argv is None else argv
+    command = args[0] if args else "backfill"
+    if command == "backfill":
+        Base.metadata.create_all(bind=engine)
+        with SessionLocal() as db:
+            added = backfill(db)
+            db.commit()
+        print(f"created {added} popularity rows")
+        return 0
+    print("usage: python -m popularity [backfill]", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""On-demand request profiling.
+
+``ProfilingMiddleware`` profiles a random ``PROFILE_SAMPLE_RATE`` fraction of
+requests, plus any request that sends ``X-Debug-Profile: 1`` together with a
+valid ``X-Admin-Token``. Two modes are available:
+
+* ``sample`` (default): a statistical sampler walks every busy thread's stack
+  while the request runs and writes collapsed stacks (``a;b;c 12``) that
+  flamegraph.pl or speedscope can render. It sees work done on the threadpool
+  by sync endpoints, but concurrent requests share the same samples.
+* ``cprofile``: deterministic ``cProfile`` stats written as ``.pstats``. It
+  only observes the event-loop thread, so it suits async code paths.
+
+Captures land in ``PROFILE_DIR`` as ``<time>_<METHOD>_<route>_<ms>ms.<ext>``;
+only the newest ``PROFILE_KEEP`` files are kept. When neither the sample rate
+nor an admin token is configured the middleware is not installed at all.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional
+
+import anyio
+
+from auth import admin_token_matches
+from config import Settings
+
+PROFILE_HEADER = b"x-debug-profile"
+ADMIN_HEADER = b"x-admin-token"
+
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+_SLUG = re.compile(r"[^A-Za-z0-9]+")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES
+
+
+class StackSampler:
+    """Samples all busy threads' stacks at a fixed interval."""
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64) -> None:
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or _is_idle(frame):
+                    continue
+                labels = []
+                while frame is not None and len(labels) < self.max_depth:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as handle:
+            for stack, count in self.stacks.most_common():
+                handle.write(f"{stack} {count}\n")
+
+    def top(self, limit: int = 10) -> List[Dict[str, object]]:
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [
+            {"frame": frame, "samples": count}
+            for frame, count in leaves.most_common(limit)
+        ]
+
+
+class _CProfileCapture:
+    def __init__(self) -> None:
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+
+    def write(self, path: str) -> None:
+        self.profile.dump_stats(path)
+
+    def top(self, limit: int = 10) -> List[Dict[str, object]]:
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [
+            {
+                "frame": f"{os.path.basename(filename)}:{line}:{name}",
+                "cumulative_seconds": round(cumulative, 6),
+                "calls": calls,
+            }
+            for (filename, line, name), (_, calls, _, cumulative, _) in rows[:limit]
+        ]
+
+
+class ProfileStore:
+    """Rotating capture directory plus an in-memory index of recent summaries."""
+
+    def __init__(self, directory: str, keep: int) -> None:
+        self.directory = directory
+        self.keep = keep
+        self.summaries: Deque[Dict[str, object]] = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def save(self, capture, method: str, route: str, status: int, duration: float):
+        os.makedirs(self.directory, exist_ok=True)
+        extension = "pstats" if isinstance(capture, _CProfileCapture) else "collapsed"
+        slug = _SLUG.sub("-", route).strip("-") or "root"
+        duration_ms = int(duration * 1000)
+        filename = (
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{int(time.time() * 1000) % 1000:03d}"
+            f"_{method}_{slug}_{duration_ms}ms.{extension}"
+        )
+        capture.write(os.path.join(self.directory, filename))
+        summary = {
+            "file": filename,
+            "method": method,
+            "route": route,
+            "status": status,
+            "duration_ms": duration_ms,
+            "top": capture.top(),
+        }
+        with self._lock:
+            self.summaries.appendleft(summary)
+            self._rotate()
+        return summary
+
+    def _rotate(self) -> None:
+        captures = sorted(
+            entry
+            for entry in os.listdir(self.directory)
+            if entry.endswith((".collapsed", ".pstats"))
+        )
+        for stale in captures[: -self.keep]:
+            try:
+                os.remove(os.path.join(self.directory, stale))
+            except FileNotFoundError:
+                pass
+
+    def latest(self, limit: Optional[int] = None) -> List[Dict[str, object]]:
+        with self._lock:
+            return list(self.summaries)[:limit]
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles sampled or explicitly requested calls."""
+
+    def __init__(self, app, settings: Settings, store: ProfileStore) -> None:
+        self.app = app
+        self.sample_rate = settings.profile_sample_rate
+        self.admin_token = settings.admin_token
+        self.mode = settings.profile_mode
+        self.store = store
+
+    def _requested(self, scope) -> bool:
+        if not self.admin_token:
+            return False
+        headers = dict(scope.get("headers", []))
+        if headers.get(PROFILE_HEADER) not in (b"1", b"true"):
+            return False
+        token = headers.get(ADMIN_HEADER, b"").decode("latin-1")
+        return admin_token_matches(token, self.admin_token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (
+            (self.sample_rate and random.random() < self.sample_rate)
+            or self._requested(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        capture = _CProfileCapture() if self.mode == "cprofile" else StackSampler()
+        started = time.perf_counter()
+        capture.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            capture.stop()
+            duration = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", scope["path"])
+            # Writing and summarizing the capture happens off the event loop.
+            await anyio.to_thread.run_sync(
+                self.store.save,
+                capture,
+                scope["method"],
+                route,
+                status["code"],
+                duration,
+            )
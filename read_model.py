@@ -0,0 +1,206 @@
+"""Materialized recipe read model.
+
+Each recipe has a precomputed JSON document in ``recipe_documents`` that the
+read endpoints stream as stored bytes. ``RecipeRepository`` keeps documents in
+sync on every write; this module holds the document builder plus a
+consistency checker and rebuild command::
+
+    python -m read_model check
+    python -m read_model rebuild
+"""
+
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from pydantic import TypeAdapter
+from sqlalchemy import delete, lambda_stmt, select
+from sqlalchemy.orm import Session, selectinload
+
+from models import Recipe, RecipeDocument, recipe_tags
+from schemas import Recipe as RecipeSchema
+
+_RECIPE_ADAPTER = TypeAdapter(RecipeSchema)
+_CHUNK_SIZE = 500
+
+
+def build_document(recipe: Recipe) -> bytes:
+    """Serialize a hydrated recipe exactly as the API returns it."""
+    return _RECIPE_ADAPTER.dump_json(
+        _RECIPE_ADAPTER.validate_python(recipe, from_attributes=True)
+    )
+
+
+def join_documents(documents: Iterable[bytes]) -> bytes:
+    """Concatenate stored documents into a JSON array."""
+    return b"[" + b",".join(documents) + b"]"
+
+
+def _load_recipes(db: Session, recipe_ids: Sequence[int]) -> List[Recipe]:
+    if not recipe_ids:
+        return []
+    # A lambda statement: built once, then reused with new ids (see crud).
+    return list(
+        db.scalars(
+            lambda_stmt(
+                lambda: select(Recipe)
+                .where(Recipe.id.in_(recipe_ids))
+                .options(selectinload(Recipe.tags), selectinload(Recipe.owner))
+                .order_by(Recipe.id)
+            )
+        )
+    )
+
+
+def store_documents(db: Session, recipes: Iterable[Recipe]) -> None:
+    """Upsert documents for already-hydrated recipes (no commit)."""
+    for recipe in recipes:
+        db.merge(RecipeDocument(recipe_id=recipe.id, document=build_document(recipe)))
+
+
+def refresh_documents(db: Session, recipe_ids: Iterable[int]) -> int:
+    """Rebuild documents for the given recipes from the primary tables."""
+    ids = sorted(set(recipe_ids))
+    refreshed = 0
+    for start in range(0, len(ids), _CHUNK_SIZE):
+        recipes = _load_recipes(db, ids[start : start + _CHUNK_SIZE])
+        store_documents(db, recipes)
+        refreshed += len(recipes)
+    return refreshed
+
+
+def recipe_ids_for_tag(db: Session, tag_id: int) -> List[int]:
+    return list(
+        db.scalars(
+            select(recipe_tags.c.recipe_id).where(recipe_tags.c.tag_id == tag_id)
+        )
+    )
+
+
+def recipe_ids_for_owner(db: Session, user_id: int) -> List[int]:
+    return list(db.scalars(select(Recipe.id).where(Recipe.owner_id == user_id)))
+
+
+def delete_documents(db: Session, recipe_ids: Iterable[int]) -> None:
+    ids = list(recipe_ids)
+    if ids:
+        db.execute(delete(RecipeDocument).where(RecipeDocument.recipe_id.in_(ids)))
+
+
+def documents_by_id(db: Session, rows) -> Dict[int, bytes]:
+    """Resolve ``(recipe_id, document)`` rows, building any missing documents.
+
+    Rows without a stored document (e.g. recipes inserted before the read model
+    existed) are built from the ORM in one batched query but not persisted, so
+    reads never take the write lock; ``rebuild`` backfills them.
+    """
+    documents = {
+        recipe_id: document for recipe_id, document in rows if document is not None
+    }
+    missing = [recipe_id for recipe_id, document in rows if document is None]
+    if missing:
+        documents.update(
+            (recipe.id, build_document(recipe)) for recipe in _load_recipes(db, missing)
+        )
+    return documents
+
+
+def documents_for(db: Session, rows) -> List[bytes]:
+    """Documents for ``(recipe_id, document)`` rows, in row order."""
+    rows = list(rows)
+    documents = documents_by_id(db, rows)
+    return [documents[recipe_id] for recipe_id, _ in rows if recipe_id in documents]
+
+
+@dataclass
+class ConsistencyReport:
+    checked: int = 0
+    missing: List[int] = field(default_factory=list)
+    stale: List[int] = field(default_factory=list)
+    orphaned: List[int] = field(default_factory=list)
+
+    @property
+    def consistent(self) -> bool:
+        return not (self.missing or self.stale or self.orphaned)
+
+
+def check_consistency(db: Session) -> ConsistencyReport:
+    """Compare every stored document against a freshly built one."""
+    report = ConsistencyReport()
+    last_id = 0
+    while True:
+        recipes = list(
+            db.scalars(
+                select(Recipe)
+                .where(Recipe.id > last_id)
+                .options(selectinload(Recipe.tags), selectinload(Recipe.owner))
+                .order_by(Recipe.id)
+                .limit(_CHUNK_SIZE)
+            )
+        )
+        if not recipes:
+            break
+        last_id = recipes[-1].id
+        stored = dict(
+            db.execute(
+                select(RecipeDocument.recipe_id, RecipeDocument.document).where(
+                    RecipeDocument.recipe_id.in_([recipe.id for recipe in recipes])
+                )
+            ).all()
+        )
+        for recipe in recipes:
+            report.checked += 1
+            document = stored.get(recipe.id)
+            if document is None:
+                report.missing.append(recipe.id)
+            elif document != build_document(recipe):
+                report.stale.append(recipe.id)
+        db.expunge_all()
+
+    report.orphaned = list(
+        db.scalars(
+            select(RecipeDocument.recipe_id).where(
+                RecipeDocument.recipe_id.not_in(select(Recipe.id))
+            )
+        )
+    )
+    return report
+
+
+def rebuild(db: Session, recipe_ids: Optional[Iterable[int]] = None) -> int:
+    """Rebuild documents (all of them by default) and drop orphans."""
+    if recipe_ids is None:
+        recipe_ids = list(db.scalars(select(Recipe.id)))
+        db.execute(
+            delete(RecipeDocument).where(
+                RecipeDocument.recipe_id.not_in(select(Recipe.id))
+            )
+        )
+    refreshed = refresh_documents(db, recipe_ids)
+    db.commit()
+    return refreshed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from database import Base, SessionLocal, engine
+
+    args = sys.argv[1:] if argv is None else argv
+    command = args[0] if args else "check"
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if command == "rebuild":
+            print(f"rebuilt {rebuild(db)} recipe documents")
+            return 0
+        if command == "check":
+            report = check_consistency(db)
+            print(
+                f"checked={report.checked} missing={len(report.missing)} "
+                f"stale={len(report.stale)} orphaned={len(report.orphaned)}"
+            )
+            return 0 if report.consistent else 1
+    print("usage: python -m read_model [check|rebuild]", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,7 @@
 # schemas.py - Fix Pydantic v2 config
-from typing import Optional
+from typing import Dict, Optional
 
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, PositiveFloat
 
 
 class TagBase(BaseModel):
@@ -18,6 +18,21 @@ class Tag(TagBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class TagBulkUpsert(BaseModel):
+    names: list[str] = Field(min_length=1, max_length=5000)
+
+
+class TagRename(BaseModel):
+    # Stripped before the length check, so a blank name is rejected.
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    name: str = Field(min_length=1)
+
+
+class TagMerge(BaseModel):
+    target_id: int
+
+
 class UserBase(BaseModel):
     email: EmailStr
     name: Optional[str] = None
@@ -33,6 +48,14 @@ class User(UserBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class UserBulkUpsert(BaseModel):
+    users: list[UserCreate] = Field(min_length=1, max_length=5000)
+
+
+class UserWithRecipeCount(User):
+    recipe_count: int = 0
+
+
 class RecipeBase(BaseModel):
     title: str
     ingredients: str
@@ -54,6 +77,35 @@ class Recipe(RecipeBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class DuplicateCandidate(BaseModel):
+    recipe_id: int
+    title: Optional[str] = None
+    similarity: float
+    exact: bool
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ShoppingListRequest(BaseModel):
+    recipe_ids: list[int] = Field(min_length=1, max_length=5000)
+    # Optional per-recipe multiplier, e.g. {"12": 2} to double recipe 12.
+    servings: Dict[int, PositiveFloat] = Field(default_factory=dict)
+
+
+class ShoppingListItem(BaseModel):
+    name: str
+    unit: Optional[str] = None
+    quantity: Optional[float] = None
+    recipe_ids: list[int] = Field(default_factory=list)
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ShoppingList(BaseModel):
+    items: list[ShoppingListItem]
+    missing_recipe_ids: list[int] = Field(default_factory=list)
+
+
 # # in this file i define the schemas (data validation)
 # from pydantic import BaseModel
 
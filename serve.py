@@ -0,0 +1,56 @@
+"""Production launcher: ``python -m serve``.
+
+Runs ``main:app`` under uvicorn with ``WEB_CONCURRENCY`` worker processes
+(default 1) on ``HOST``/``PORT`` (default ``0.0.0.0:8000``). Schema
+migrations run once in the parent before any worker starts, so workers never
+race on DDL. Each worker then keeps its own caches coherent with the others
+through :mod:`coherence`, and claims outbox events with leases, so any
+number of workers can share one SQLite file (WAL mode, see
+``SQLITE_WAL``). Catalog snapshots (``SNAPSHOT_DIR``) and the mapped
+catalog (``CATALOG_PATH``) are rebuilt in the parent as well when enabled.
+"""
+
+import os
+import sys
+
+import uvicorn
+
+from config import get_settings
+
+
+def prepare_database() -> None:
+    import models  # noqa: F401 - registers the tables on Base.metadata
+    from database import Base, SessionLocal, engine
+    from migrations import upgrade
+
+    Base.metadata.create_all(bind=engine)
+    upgrade(engine)
+    settings = get_settings()
+    if settings.snapshot_dir:
+        from snapshots import active_store, build
+
+        with SessionLocal() as db:
+            build(db, active_store())
+    if settings.catalog_path:
+        import catalog
+
+        with SessionLocal() as db:
+            catalog.build(db, settings.catalog_path)
+    engine.dispose()
+
+
+def main() -> int:
+    settings = get_settings()
+    prepare_database()
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=settings.web_concurrency,
+        proxy_headers=True,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Merged shopping lists across many recipes.
+
+Ingredient text is free-form (``"2 cups flour, 1/2 tsp salt, basil"``).
+:func:`parse_ingredient` splits a line into quantity, unit and name, and
+caches the result, because catalogs repeat the same lines constantly.
+:func:`aggregate` then merges quantities by ``(name, unit)`` in a single pass,
+scaled by each recipe's servings multiplier. Metric mass and volume units
+are folded into grams and millilitres so ``1 kg`` and ``250 g`` add up.
+"""
+
+import re
+from dataclasses import dataclass, field
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+_UNICODE_FRACTIONS = {
+    "½": "1/2",
+    "⅓": "1/3",
+    "⅔": "2/3",
+    "¼": "1/4",
+    "¾": "3/4",
+    "⅛": "1/8",
+}
+_QUANTITY = re.compile(
+    r"^(?P<quantity>\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)(?:\s*-\s*[\d./]+)?\s*"
+)
+_SPACES = re.compile(r"\s+")
+_NAME_NOISE = re.compile(r"^(?:of\s+)|[^\w\s'-]+")
+
+# alias -> (canonical unit, factor to the canonical unit)
+_UNITS: Dict[str, Tuple[str, float]] = {}
+for _canonical, _factor, _aliases in (
+    ("tsp", 1, ("tsp", "tsps", "teaspoon", "teaspoons", "t")),
+    ("tbsp", 1, ("tbsp", "tbsps", "tablespoon", "tablespoons", "tbs", "T")),
+    ("cup", 1, ("cup", "cups", "c")),
+    ("g", 1, ("g", "gram", "grams", "gr")),
+    ("g", 1000, ("kg", "kgs", "kilogram", "kilograms")),
+    ("ml", 1, ("ml", "millilitre", "millilitres", "milliliter", "milliliters")),
+    ("ml", 1000, ("l", "litre", "litres", "liter", "liters")),
+    ("oz", 1, ("oz", "ounce", "ounces")),
+    ("lb", 1, ("lb", "lbs", "pound", "pounds")),
+    ("clove", 1, ("clove", "cloves")),
+    ("can", 1, ("can", "cans", "tin", "tins")),
+    ("pinch", 1, ("pinch", "pinches")),
+    ("slice", 1, ("slice", "slices")),
+    ("bunch", 1, ("bunch", "bunches")),
+):
+    for _alias in _aliases:
+        _UNITS[_alias] = (_canonical, _factor)
+
+
+@dataclass(frozen=True)
+class ParsedIngredient:
+    name: str
+    quantity: Optional[float] = None
+    unit: Optional[str] = None
+
+
+@dataclass
+class ShoppingListEntry:
+    name: str
+    unit: Optional[str]
+    quantity: Optional[float]
+    recipe_ids: List[int] = field(default_factory=list)
+
+
+def split_ingredients(text: Optional[str]) -> List[str]:
+    """One entry per ingredient, whether stored one per line or comma-separated."""
+    if not text:
+        return []
+    separator = "\n" if "\n" in text else ","
+    return [part.strip() for part in text.split(separator) if part.strip()]
+
+
+def _parse_quantity(token: str) -> float:
+    if " " in token:
+        whole, fraction = token.split()
+        return float(int(whole) + Fraction(fraction))
+    return float(Fraction(token))
+
+
+@lru_cache(maxsize=8192)
+def parse_ingredient(line: str) -> ParsedIngredient:
+    text = line.strip()
+    for symbol, replacement in _UNICODE_FRACTIONS.items():
+        text = text.replace(symbol, f" {replacement}")
+    text = _SPACES.sub(" ", text).strip()
+
+    quantity = None
+    match = _QUANTITY.match(text)
+    if match:
+        try:
+            quantity = _parse_quantity(match.group("quantity"))
+            text = text[match.end() :]
+        except (ValueError, ZeroDivisionError):
+            quantity = None
+
+    unit = None
+    if quantity is not None:
+        first, _, rest = text.partition(" ")
+        # "T" (tablespoon) vs "t" (teaspoon) is case-sensitive; the rest is not.
+        alias = first.rstrip(".")
+        known = _UNITS.get(alias) or _UNITS.get(alias.lower())
+        if known is not None and rest:
+            unit, factor = known
+            quantity *= factor
+            text = rest
+
+    name = _NAME_NOISE.sub("", text.lower())
+    name = _SPACES.sub(" ", name).strip()
+    return ParsedIngredient(name=name, quantity=quantity, unit=unit)
+
+
+def aggregate(
+    rows: Iterable[Tuple[int, Optional[str]]],
+    servings: Optional[Mapping[int, float]] = None,
+) -> List[ShoppingListEntry]:
+    """Merge ``(recipe_id, ingredients)`` rows into one list, sorted by name."""
+    servings = servings or {}
+    merged: Dict[Tuple[str, Optional[str]], ShoppingListEntry] = {}
+    for recipe_id, ingredients in rows:
+        multiplier = servings.get(recipe_id, 1.0)
+        for line in split_ingredients(ingredients):
+            parsed = parse_ingredient(line)
+            if not parsed.name:
+                continue
+            key = (parsed.name, parsed.unit)
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = ShoppingListEntry(parsed.name, parsed.unit, None)
+            if parsed.quantity is not None:
+                entry.quantity = (entry.quantity or 0.0) + parsed.quantity * multiplier
+            if not entry.recipe_ids or entry.recipe_ids[-1] != recipe_id:
+                entry.recipe_ids.append(recipe_id)
+    entries = sorted(merged.values(), key=lambda entry: (entry.name, entry.unit or ""))
+    for entry in entries:
+        if entry.quantity is not None:
+            entry.quantity = round(entry.quantity, 3)
+    return entries
@@ -0,0 +1,122 @@
+"""Single-flight coalescing for identical concurrent calls.
+
+The first caller for a key (the leader) runs the work; callers that arrive
+while it is still running (followers) wait for and share its result. Sync
+callers block on a ``threading.Event`` and async callers await a future, so
+both the threadpool and event-loop paths can join the same flight.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+COALESCED_CALLS = Counter(
+    "singleflight_calls_total",
+    "Calls routed through a single-flight group, by role.",
+    ["group", "role"],
+)
+INFLIGHT_KEYS = Gauge(
+    "singleflight_inflight_keys",
+    "Distinct keys currently being computed by a leader.",
+    ["group"],
+)
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "followers", "async_waiters")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+        self.async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+def _resolve_future(future: asyncio.Future, call: _Call) -> None:
+    if future.done():
+        return
+    if call.error is not None:
+        future.set_exception(call.error)
+    else:
+        future.set_result(call.result)
+
+
+class SingleFlight:
+    """Coalesces identical in-flight calls keyed by a hashable value."""
+
+    def __init__(self, group: str) -> None:
+        self.group = group
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._generation = 0
+
+    def invalidate(self) -> None:
+        """Stop new callers from joining flights that started before a write."""
+        with self._lock:
+            self._generation += 1
+
+    def _join(self, key: Hashable) -> Tuple[Hashable, _Call, bool]:
+        with self._lock:
+            full_key = (self._generation, key)
+            call = self._calls.get(full_key)
+            if call is not None:
+                call.followers += 1
+                COALESCED_CALLS.labels(self.group, "follower").inc()
+                return full_key, call, False
+            call = _Call()
+            self._calls[full_key] = call
+            COALESCED_CALLS.labels(self.group, "leader").inc()
+            INFLIGHT_KEYS.labels(self.group).set(len(self._calls))
+            return full_key, call, True
+
+    def _finish(self, full_key: Hashable, call: _Call) -> None:
+        with self._lock:
+            self._calls.pop(full_key, None)
+            INFLIGHT_KEYS.labels(self.group).set(len(self._calls))
+            call.event.set()
+            waiters = list(call.async_waiters)
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve_future, future, call)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` once per in-flight ``key`` and share the result."""
+        full_key, call, leader = self._join(key)
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            self._finish(full_key, call)
+        return call.result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of :meth:`do`; joins flights started by sync callers too."""
+        full_key, call, leader = self._join(key)
+        if not leader:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            with self._lock:
+                if call.event.is_set():
+                    _resolve_future(future, call)
+                else:
+                    call.async_waiters.append((loop, future))
+            return await asyncio.shield(future)
+
+        try:
+            call.result = await fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            self._finish(full_key, call)
+        return call.result
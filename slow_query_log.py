@@ -0,0 +1,210 @@
+"""Slow query log with automatic ``EXPLAIN QUERY PLAN`` capture.
+
+Every statement that runs through an instrumented engine is timed. Statements
+slower than ``SLOW_QUERY_THRESHOLD_MS`` are written as one JSON object per
+line with their bound parameters, the route and ``*Repository`` method that
+issued them, and (on SQLite) the query plan, so full scans stand out. Each
+statement is fingerprinted (literals and ``IN`` lists collapsed) for the
+``slow_queries_total`` Prometheus counter.
+
+Setting the threshold to ``0`` logs every statement, which doubles as a
+workload capture for ``index_advisor``; a negative threshold disables the log.
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+import re
+import sys
+import time
+from typing import Any, List, Optional
+
+from prometheus_client import Counter
+from sqlalchemy import event
+
+from config import Settings
+
+logger = logging.getLogger("slow_query")
+
+SLOW_QUERIES = Counter(
+    "slow_queries_total",
+    "Statements slower than the slow query threshold, by fingerprint.",
+    ["fingerprint"],
+)
+SLOW_QUERY_SECONDS = Counter(
+    "slow_query_seconds_total",
+    "Time spent in slow statements, by fingerprint.",
+    ["fingerprint"],
+)
+
+_request_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "slow_query_request_scope", default=None
+)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_MAX_PARAM_LENGTH = 200
+
+
+def fingerprint(statement: str) -> str:
+    """Stable id for a statement shape, independent of literals and list sizes."""
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip().lower()
+    normalized = _PLACEHOLDER_LIST.sub("(?+)", normalized)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def _loggable(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"$bytes": len(value)}
+    if isinstance(value, str) and len(value) > _MAX_PARAM_LENGTH:
+        return value[:_MAX_PARAM_LENGTH] + "..."
+    if isinstance(value, (list, tuple)):
+        return [_loggable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _loggable(item) for key, item in value.items()}
+    if value is None or isinstance(value, (int, float, bool)):
+        return value
+    return str(value)
+
+
+def _truncated(value: Any) -> bool:
+    """Whether :func:`_loggable` cut any string inside ``value`` short."""
+    if isinstance(value, str):
+        return len(value) > _MAX_PARAM_LENGTH
+    if isinstance(value, (list, tuple)):
+        return any(_truncated(item) for item in value)
+    if isinstance(value, dict):
+        return any(_truncated(item) for item in value.values())
+    return False
+
+
+def _current_route() -> Optional[str]:
+    scope = _request_scope.get()
+    if scope is None:
+        return None
+    route = getattr(scope.get("route"), "path", scope.get("path"))
+    return f"{scope.get('method')} {route}"
+
+
+def _repository_method() -> Optional[str]:
+    """Walk the stack for the nearest ``*Repository`` method (slow path only)."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        owner = frame.f_locals.get("self")
+        if owner is not None and type(owner).__name__.endswith("Repository"):
+            return f"{type(owner).__name__}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _explain(cursor, statement: str, parameters) -> Optional[List[str]]:
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    try:
+        rows = cursor.connection.execute(
+            "EXPLAIN QUERY PLAN " + statement, parameters
+        ).fetchall()
+    except Exception as exc:  # noqa: BLE001 - the plan is best effort
+        return [f"explain failed: {exc}"]
+    return [row[-1] for row in rows]
+
+
+class SlowQueryLog:
+    """SQLAlchemy cursor-event listener that records slow statements."""
+
+    def __init__(self, threshold_ms: float, explain: bool = True) -> None:
+        self.threshold = threshold_ms / 1000.0
+        self.explain = explain
+
+    def install(self, engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold:
+            return
+        digest = fingerprint(statement)
+        SLOW_QUERIES.labels(digest).inc()
+        SLOW_QUERY_SECONDS.labels(digest).inc(elapsed)
+
+        plan = None
+        if (
+            self.explain
+            and not executemany
+            and conn.dialect.name == "sqlite"
+            and hasattr(cursor, "connection")
+        ):
+            plan = _explain(cursor, statement, parameters)
+        record = {
+            "ts": time.time(),
+            "duration_ms": round(elapsed * 1000, 3),
+            "fingerprint": digest,
+            "statement": statement,
+            "parameters": _loggable(parameters),
+            "parameters_truncated": _truncated(parameters),
+            "route": _current_route(),
+            "repository_method": _repository_method(),
+            "plan": plan,
+            "full_scan": bool(plan)
+            and any(detail.startswith("SCAN") for detail in plan),
+        }
+        logger.warning(json.dumps(record, default=str))
+
+
+def configure_logger(path: str) -> None:
+    """Send slow-query records, one JSON object per line, to ``path``."""
+    if not path:
+        return
+    if any(getattr(handler, "_slow_query_log", False) for handler in logger.handlers):
+        return
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler._slow_query_log = True
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+def install(engine, settings: Settings) -> Optional[SlowQueryLog]:
+    if settings.slow_query_threshold_ms < 0:
+        return None
+    configure_logger(settings.slow_query_log_path)
+    slow_log = SlowQueryLog(
+        settings.slow_query_threshold_ms, explain=settings.slow_query_explain
+    )
+    slow_log.install(engine)
+    return slow_log
+
+
+class QueryContextMiddleware:
+    """Makes the current request visible to the slow query log.
+
+    The ASGI scope is shared by reference, so the matched route template that
+    routing adds later is visible too; the context var is copied into the
+    threadpool that runs sync endpoints.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
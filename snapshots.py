@@ -0,0 +1,555 @@
+"""Precompressed catalog snapshots for anonymous read traffic.
+
+When ``SNAPSHOT_DIR`` is set, the catalog is rendered into static JSON
+shards, each stored plain and gzipped:
+
+* ``page/<n>``: ``GET /recipes/?skip=<n * RECIPES_PAGE_SIZE>`` (default limit);
+* ``cuisine/<name>`` and ``meal_type/<name>``: ``GET /recipes/filter/`` with
+  that one facet (its first page; ``X-Next-Skip`` is served with it when
+  more recipes follow);
+* ``tag/<id>``: ``GET /tags/<id>/recipes``.
+
+Shard bodies are content-addressed (``blobs/<etag>.json[.gz]``), and
+``manifest.json`` maps each shard to its current ETag. The manifest is
+replaced atomically, so a reader sees either the old or the new version of
+a shard, never a mix. :class:`SnapshotMiddleware` answers matching requests
+without credentials straight from those files. It handles
+``If-None-Match`` itself and never opens a database session. Anything it
+does not match, or whose shard is missing, falls through to the API.
+
+A full build renders every shard from a single ``SELECT``, so all shards
+come from one consistent read::
+
+    python -m snapshots build
+
+After that, the outbox worker re-renders only the shards a write touched:
+
+* a recipe write: its facets before and after, plus its page (or, for
+  inserts and deletes, every page from it onwards);
+* a tag rename or merge, or a user update: every page, facet and tag shard
+  holding one of the affected recipes, plus the tag's own shard.
+
+The write's own event only enqueues a ``snapshots.refresh`` event. That
+event renders once the write's documents are committed, in a transaction
+that writes nothing until it is marked done, so it never holds SQLite's
+write lock while rendering, and never publishes data that could still roll
+back. Snapshots therefore trail writes by about twice the outbox lag.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+from urllib.parse import parse_qsl
+
+from prometheus_client import Counter
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+import crud  # noqa: F401 - its read-model handlers must run before ours
+from config import get_settings
+from database import on_engine_swap
+from models import Recipe, RecipeDocument, Tag, recipe_tags
+from outbox import enqueue, register_handler
+from read_model import documents_by_id, documents_for, join_documents
+from static_assets import REVALIDATE_CACHE_CONTROL, accepted_encodings
+
+try:  # Not available on Windows; concurrent manifest writers then race.
+    import fcntl
+except ImportError:  # pragma: no cover - depends on the platform
+    fcntl = None
+
+settings = get_settings()
+
+MANIFEST = "manifest.json"
+REFRESH_TOPIC = "snapshots.refresh"
+# Unreferenced blobs are kept this long for readers holding an older manifest.
+BLOB_GRACE_SECONDS = 60.0
+
+REQUESTS = Counter(
+    "snapshot_requests_total",
+    "Requests answered from catalog snapshots, by outcome.",
+    ["outcome"],
+)
+SHARDS_WRITTEN = Counter(
+    "snapshot_shards_written_total", "Catalog snapshot shards rendered."
+)
+
+
+def page_shard(page: int) -> str:
+    return f"page/{page}"
+
+
+def facet_shards(db: Session, facets: Optional[dict]) -> Set[str]:
+    """Cuisine, meal type and tag shards a recipe with ``facets`` appears in."""
+    if facets is None:
+        return set()
+    shards = set()
+    if facets.get("cuisine"):
+        shards.add(f"cuisine/{facets['cuisine']}")
+    if facets.get("meal_type"):
+        shards.add(f"meal_type/{facets['meal_type']}")
+    names = facets.get("tags") or []
+    if names:
+        shards.update(
+            f"tag/{tag_id}"
+            for tag_id in db.scalars(select(Tag.id).where(Tag.name.in_(names)))
+        )
+    return shards
+
+
+def _is_facet(shard: str) -> bool:
+    return shard.startswith(("cuisine/", "meal_type/"))
+
+
+def _row_cap(shard: str, page_size: int, max_rows: int) -> int:
+    """Rows rendered for a shard; facets get one past the page to spot more."""
+    if shard.startswith("page/"):
+        return page_size
+    return page_size + 1 if _is_facet(shard) else max_rows
+
+
+def shard_for_request(path: str, query_string: str, page_size: int) -> Optional[str]:
+    """The shard that answers this GET exactly, if any."""
+    params = dict(parse_qsl(query_string, keep_blank_values=True))
+    if path == "/recipes/":
+        if not set(params) <= {"skip", "limit"}:
+            return None
+        try:
+            skip = int(params.get("skip", 0))
+            limit = int(params.get("limit", page_size))
+        except ValueError:
+            return None
+        if skip < 0 or limit != page_size or skip % page_size:
+            return None
+        return page_shard(skip // page_size)
+    if path == "/recipes/filter/":
+        if len(params) == 1:
+            ((facet, value),) = params.items()
+            if facet in ("cuisine", "meal_type") and value:
+                return f"{facet}/{value}"
+        return None
+    parts = path.strip("/").split("/")
+    if len(parts) == 3 and parts[0] == "tags" and parts[2] == "recipes":
+        if parts[1].isdigit() and not params:
+            return f"tag/{int(parts[1])}"
+    return None
+
+
+class SnapshotStore:
+    """Content-addressed shard files plus the manifest that names them."""
+
+    def __init__(self, directory: str, page_size: int, max_rows: int) -> None:
+        self.directory = directory
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self.blob_dir = os.path.join(directory, "blobs")
+        self._manifest_path = os.path.join(directory, MANIFEST)
+        self._cached: Optional[dict] = None
+        self._cached_stamp: Optional[tuple] = None
+        self._lock = threading.Lock()
+
+    # -- reading ---------------------------------------------------------
+
+    def manifest(self) -> dict:
+        """The current manifest; re-read only when the file changed."""
+        try:
+            stat_result = os.stat(self._manifest_path)
+        except FileNotFoundError:
+            return {"shards": {}}
+        # Every publish replaces the file, so the inode changes too.
+        stamp = (stat_result.st_ino, stat_result.st_mtime_ns)
+        with self._lock:
+            if stamp != self._cached_stamp:
+                self._cached = self._read_manifest()
+                self._cached_stamp = stamp
+            return self._cached
+
+    def lookup(self, shard: str) -> Optional[str]:
+        manifest = self.manifest()
+        if (shard.startswith("page/") or _is_facet(shard)) and manifest.get(
+            "page_size"
+        ) != self.page_size:
+            return None
+        return manifest["shards"].get(shard)
+
+    def next_skip(self, shard: str) -> Optional[int]:
+        """``skip`` of the page after a facet shard, if recipes follow it."""
+        return self.manifest().get("next_skip", {}).get(shard)
+
+    def blob_path(self, etag: str, compressed: bool = False) -> str:
+        return os.path.join(
+            self.blob_dir, etag + (".json.gz" if compressed else ".json")
+        )
+
+    def response(
+        self, etag: str, request_headers: Headers, next_skip: Optional[int] = None
+    ) -> Optional[Response]:
+        headers = {
+            "etag": f'"{etag}"',
+            "cache-control": REVALIDATE_CACHE_CONTROL,
+            "vary": "Accept-Encoding",
+        }
+        if next_skip is not None:
+            headers["x-next-skip"] = str(next_skip)
+        if_none_match = request_headers.get("if-none-match", "")
+        if headers["etag"] in [tag.strip(" W/") for tag in if_none_match.split(",")]:
+            REQUESTS.labels("not_modified").inc()
+            return Response(status_code=304, headers=headers)
+        compressed = "gzip" in accepted_encodings(request_headers)
+        path = self.blob_path(etag, compressed)
+        try:
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if compressed:
+            headers["content-encoding"] = "gzip"
+        REQUESTS.labels("hit").inc()
+        return FileResponse(
+            path,
+            stat_result=stat_result,
+            media_type="application/json",
+            headers=headers,
+        )
+
+    # -- writing ---------------------------------------------------------
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(descriptor, "wb") as handle:
+            handle.write(data)
+        os.replace(temporary, path)
+
+    def _write_blob(self, documents: List[bytes]) -> str:
+        body = join_documents(documents)
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        if not os.path.exists(self.blob_path(etag, compressed=True)):
+            self._write_atomic(self.blob_path(etag), body)
+            self._write_atomic(
+                self.blob_path(etag, compressed=True),
+                gzip.compress(body, compresslevel=9, mtime=0),
+            )
+        SHARDS_WRITTEN.inc()
+        return etag
+
+    def publish(self, shards: Dict[str, List[bytes]], replace: bool = False) -> None:
+        """Write shard bodies, then swap them into the manifest.
+
+        Empty shards are removed. A facet shard rendered past the page is cut
+        to the page and recorded as continuing. With ``replace`` the manifest
+        holds exactly ``shards`` afterwards (a full build).
+        """
+        os.makedirs(self.blob_dir, exist_ok=True)
+        continuing = {
+            shard: self.page_size
+            for shard, documents in shards.items()
+            if _is_facet(shard) and len(documents) > self.page_size
+        }
+        written = {
+            shard: self._write_blob(
+                documents[: self.page_size] if shard in continuing else documents
+            )
+            for shard, documents in shards.items()
+            if documents
+        }
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            previous = {} if replace else self._read_manifest()
+            current = dict(previous.get("shards", {}))
+            next_skip = dict(previous.get("next_skip", {}))
+            for shard in shards:
+                current.pop(shard, None)
+                next_skip.pop(shard, None)
+            current.update(written)
+            next_skip.update(continuing)
+            manifest = {
+                "page_size": self.page_size,
+                "max_rows": self.max_rows,
+                "built_at": time.time(),
+                "shards": current,
+                "next_skip": next_skip,
+            }
+            self._write_atomic(
+                self._manifest_path, json.dumps(manifest, sort_keys=True).encode()
+            )
+            self._collect_garbage(set(current.values()))
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self._manifest_path, "rb") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return {"shards": {}}
+
+    def _collect_garbage(self, referenced: Set[str]) -> None:
+        cutoff = time.time() - BLOB_GRACE_SECONDS
+        for name in os.listdir(self.blob_dir):
+            etag = name.split(".", 1)[0]
+            path = os.path.join(self.blob_dir, name)
+            if etag not in referenced and os.stat(path).st_mtime < cutoff:
+                os.remove(path)
+
+
+_stores: Dict[str, SnapshotStore] = {}
+
+
+def active_store() -> Optional[SnapshotStore]:
+    """The store for ``SNAPSHOT_DIR``, or ``None`` when snapshots are off."""
+    if not settings.snapshot_dir:
+        return None
+    store = _stores.get(settings.snapshot_dir)
+    if store is None:
+        store = _stores[settings.snapshot_dir] = SnapshotStore(
+            settings.snapshot_dir,
+            settings.recipes_page_size,
+            settings.recipes_max_page_size,
+        )
+    return store
+
+
+def render_all(db: Session, page_size: int, max_rows: int) -> Dict[str, List[bytes]]:
+    """Every shard, rendered from one ``SELECT`` (a consistent read)."""
+    rows = db.execute(
+        select(
+            Recipe.id,
+            RecipeDocument.document,
+            Recipe.cuisine,
+            Recipe.meal_type,
+            func.group_concat(recipe_tags.c.tag_id),
+        )
+        .outerjoin(RecipeDocument, RecipeDocument.recipe_id == Recipe.id)
+        .outerjoin(recipe_tags, recipe_tags.c.recipe_id == Recipe.id)
+        .group_by(Recipe.id)
+        .order_by(Recipe.id)
+    ).all()
+    documents = documents_by_id(db, [(row[0], row[1]) for row in rows])
+    shards: Dict[str, List[bytes]] = {}
+    for position, (recipe_id, _, cuisine, meal_type, tag_ids) in enumerate(rows):
+        document = documents.get(recipe_id)
+        if document is None:
+            continue
+        keys = [page_shard(position // page_size)]
+        keys.extend(
+            f"{facet}/{value}"
+            for facet, value in (("cuisine", cuisine), ("meal_type", meal_type))
+            if value
+        )
+        keys.extend(f"tag/{tag_id}" for tag_id in (tag_ids or "").split(",") if tag_id)
+        for key in keys:
+            shard = shards.setdefault(key, [])
+            if len(shard) < _row_cap(key, page_size, max_rows):
+                shard.append(document)
+    return shards
+
+
+def _shard_condition(shard: str):
+    kind, _, value = shard.partition("/")
+    if kind == "cuisine":
+        return Recipe.cuisine == value
+    if kind == "meal_type":
+        return Recipe.meal_type == value
+    return Recipe.id.in_(
+        select(recipe_tags.c.recipe_id).where(recipe_tags.c.tag_id == int(value))
+    )
+
+
+def render_shards(
+    db: Session, shards: Iterable[str], page_size: int, max_rows: int
+) -> Dict[str, List[bytes]]:
+    """Re-render specific shards; a shard with no rows renders empty."""
+    rendered = {}
+    for shard in sorted(set(shards)):
+        statement = (
+            select(Recipe.id, RecipeDocument.document)
+            .outerjoin(RecipeDocument, RecipeDocument.recipe_id == Recipe.id)
+            .order_by(Recipe.id)
+        )
+        if shard.startswith("page/"):
+            page = int(shard.partition("/")[2])
+            statement = statement.offset(page * page_size).limit(page_size)
+        else:
+            statement = statement.where(_shard_condition(shard)).limit(
+                _row_cap(shard, page_size, max_rows)
+            )
+        rendered[shard] = documents_for(db, db.execute(statement).all())
+    return rendered
+
+
+def build(db: Session, store: SnapshotStore) -> int:
+    """Render and publish the whole catalog; returns the shard count."""
+    shards = render_all(db, store.page_size, store.max_rows)
+    store.publish(shards, replace=True)
+    return len(shards)
+
+
+def _pages_from(db: Session, store: SnapshotStore, recipe_id: int) -> Set[str]:
+    """The page holding ``recipe_id``'s position and every page after it."""
+    position = db.scalar(select(func.count()).where(Recipe.id < recipe_id))
+    total = db.scalar(select(func.count()).select_from(Recipe))
+    last = max(total - 1, position) // store.page_size
+    pages = {page_shard(page) for page in range(position // store.page_size, last + 1)}
+    # Pages past the new end of the catalog render empty and are dropped.
+    pages.update(
+        shard
+        for shard in store.manifest()["shards"]
+        if shard.startswith("page/")
+        and int(shard.partition("/")[2]) >= position // store.page_size
+    )
+    return pages
+
+
+def _recipe_shards(db: Session, store: SnapshotStore, condition) -> Set[str]:
+    """Every page, facet and tag shard holding a recipe matching ``condition``."""
+    matching = select(Recipe.id).where(condition)
+    positions = select(
+        Recipe.id, (func.row_number().over(order_by=Recipe.id) - 1).label("position")
+    ).subquery()
+    shards = {
+        page_shard(position // store.page_size)
+        for position in db.scalars(
+            select(positions.c.position).where(positions.c.id.in_(matching))
+        )
+    }
+    for cuisine, meal_type in db.execute(
+        select(Recipe.cuisine, Recipe.meal_type).where(condition).distinct()
+    ):
+        shards |= facet_shards(db, {"cuisine": cuisine, "meal_type": meal_type})
+    shards.update(
+        f"tag/{tag_id}"
+        for tag_id in db.scalars(
+            select(recipe_tags.c.tag_id)
+            .where(recipe_tags.c.recipe_id.in_(matching))
+            .distinct()
+        )
+    )
+    return shards
+
+
+def affected_shards(db: Session, store: SnapshotStore, payload: dict) -> Set[str]:
+    """The shards a ``snapshots.refresh`` payload asks to re-render."""
+    if "tag_id" in payload:
+        tag_ids = [payload["tag_id"]]
+        if payload.get("merged_id") is not None:
+            tag_ids.append(payload["merged_id"])  # deleted; renders empty
+        shards = _recipe_shards(
+            db,
+            store,
+            Recipe.id.in_(
+                select(recipe_tags.c.recipe_id).where(
+                    recipe_tags.c.tag_id == payload["tag_id"]
+                )
+            ),
+        )
+        return shards | {f"tag/{tag_id}" for tag_id in tag_ids}
+    if "user_id" in payload:
+        return _recipe_shards(db, store, Recipe.owner_id == payload["user_id"])
+    shards = facet_shards(db, payload.get("before")) | facet_shards(
+        db, payload.get("after")
+    )
+    recipe_id = payload["recipe_id"]
+    if payload.get("shift"):
+        shards |= _pages_from(db, store, recipe_id)
+    else:
+        position = db.scalar(select(func.count()).where(Recipe.id < recipe_id))
+        shards.add(page_shard(position // store.page_size))
+    return shards
+
+
+def _schedule(db: Session, payload: dict) -> None:
+    """Re-render in a follow-up event, once this event's writes are committed."""
+    if active_store() is not None:
+        enqueue(db, REFRESH_TOPIC, payload)
+
+
+@register_handler("recipe.created")
+@register_handler("recipe.deleted")
+def _refresh_shifted_shards(db: Session, payload: dict) -> None:
+    _schedule(db, {**payload, "shift": True})
+
+
+@register_handler("recipe.updated")
+def _refresh_recipe_shards(db: Session, payload: dict) -> None:
+    _schedule(db, {**payload, "shift": False})
+
+
+@register_handler("tag.renamed")
+def _refresh_tag_shards(db: Session, payload: dict) -> None:
+    _schedule(db, {"tag_id": payload["tag_id"], "merged_id": payload.get("merged_id")})
+
+
+@register_handler("user.updated")
+def _refresh_owner_shards(db: Session, payload: dict) -> None:
+    _schedule(db, {"user_id": payload["user_id"]})
+
+
+@register_handler(REFRESH_TOPIC)
+def _refresh_shards(db: Session, payload: dict) -> None:
+    store = active_store()
+    if store is not None:
+        shards = affected_shards(db, store, payload)
+        store.publish(render_shards(db, shards, store.page_size, store.max_rows))
+
+
+@on_engine_swap
+def _rebuild_after_swap(engine) -> None:
+    """Snapshots of the replaced database must not outlive a restore."""
+    store = active_store()
+    if store is not None:
+        with Session(bind=engine) as db:
+            build(db, store)
+
+
+class SnapshotMiddleware:
+    """Serves anonymous GETs that match a published shard from disk."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        store = active_store() if scope["type"] == "http" else None
+        if store is not None and scope["method"] in ("GET", "HEAD"):
+            headers = Headers(scope=scope)
+            shard = None
+            if "authorization" not in headers:
+                shard = shard_for_request(
+                    scope["path"],
+                    scope.get("query_string", b"").decode("latin-1"),
+                    store.page_size,
+                )
+            etag = store.lookup(shard) if shard else None
+            response = (
+                store.response(etag, headers, store.next_skip(shard)) if etag else None
+            )
+            if response is not None:
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import models  # noqa: F401 - registers the tables on Base.metadata
+    from database import SessionLocal
+
+    args = sys.argv[1:] if argv is None else argv
+    if (args[0] if args else "build") != "build":
+        print("usage: python -m snapshots build", file=sys.stderr)
+        return 2
+    store = active_store()
+    if store is None:
+        print("SNAPSHOT_DIR is not set", file=sys.stderr)
+        return 2
+    with SessionLocal() as db:
+        print(f"published {build(db, store)} shards to {store.directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""Static frontend serving with precompressed assets and an in-memory index.
+
+Hashed build assets (``main.1a2b3c4d.js``) are served with a one-year
+immutable ``Cache-Control`` and, when the client accepts it, from a ``.br`` or
+``.gz`` sibling produced at build time::
+
+    python -m static_assets frontend/build
+
+``index.html`` is read once, kept in memory (plain and gzip) with an ETag, and
+revalidated by clients on every navigation.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+import sys
+from typing import Iterable, List, Optional, Tuple
+
+import anyio
+from fastapi import FastAPI, HTTPException, Request
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:  # Brotli is optional; gzip is always available.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# First path segments owned by the API; never answered with index.html.
+API_PREFIXES = frozenset(
+    {
+        "recipes",
+        "users",
+        "tags",
+        "meal-types",
+        "cuisines",
+        "health",
+        "metrics",
+        "debug",
+        "admin",
+        "shopping-list",
+    }
+)
+
+_HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.")
+_ENCODING_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+_COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".html", ".json", ".map", ".svg", ".txt"}
+
+
+def accepted_encodings(headers: Headers) -> List[str]:
+    """Return the encodings from ``Accept-Encoding`` that we can serve."""
+    accepted = set()
+    for part in headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in {"q=0", "q=0.0"}:
+            continue
+        accepted.add(coding.strip().lower())
+    return [encoding for encoding, _ in _ENCODING_SUFFIXES if encoding in accepted]
+
+
+def is_hashed_asset(path: str) -> bool:
+    return bool(_HASHED_NAME.search(os.path.basename(path)))
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """``StaticFiles`` that negotiates precompressed variants and cache headers."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        request_headers = Headers(scope=scope)
+        response = None
+        if scope["method"] in ("GET", "HEAD"):
+            response = await self._encoded_response(path, request_headers)
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers.setdefault("vary", "Accept-Encoding")
+        response.headers["cache-control"] = (
+            IMMUTABLE_CACHE_CONTROL
+            if is_hashed_asset(path)
+            else REVALIDATE_CACHE_CONTROL
+        )
+        return response
+
+    async def _encoded_response(
+        self, path: str, request_headers: Headers
+    ) -> Optional[Response]:
+        suffixes = dict(_ENCODING_SUFFIXES)
+        for encoding in accepted_encodings(request_headers):
+            full_path, stat_result = await anyio.to_thread.run_sync(
+                self.lookup_path, path + suffixes[encoding]
+            )
+            if not (stat_result and stat.S_ISREG(stat_result.st_mode)):
+                continue
+            media_type, _ = mimetypes.guess_type(path)
+            response = FileResponse(
+                full_path,
+                stat_result=stat_result,
+                media_type=media_type or "application/octet-stream",
+                headers={"content-encoding": encoding},
+            )
+            if self.is_not_modified(response.headers, request_headers):
+                return NotModifiedResponse(response.headers)
+            return response
+        return None
+
+
+class SpaIndex:
+    """``index.html`` held in memory with an ETag and a gzip variant."""
+
+    def __init__(self, index_path: str) -> None:
+        with open(index_path, "rb") as handle:
+            self.body = handle.read()
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+
+    def response(self, request_headers: Headers) -> Response:
+        headers = {
+            "etag": self.etag,
+            "cache-control": REVALIDATE_CACHE_CONTROL,
+            "vary": "Accept-Encoding",
+        }
+        if_none_match = request_headers.get("if-none-match", "")
+        if self.etag in [tag.strip(" W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        if "gzip" in accepted_encodings(request_headers):
+            headers["content-encoding"] = "gzip"
+            return Response(self.gzipped, media_type="text/html", headers=headers)
+        return Response(self.body, media_type="text/html", headers=headers)
+
+
+def mount_frontend(app: FastAPI, build_dir: str) -> None:
+    """Serve the React build: ``/static`` assets plus an SPA fallback route.
+
+    Must be called after every API route is registered, because the fallback
+    matches any GET path.
+    """
+    app.mount(
+        "/static",
+        PrecompressedStaticFiles(directory=os.path.join(build_dir, "static")),
+        name="static",
+    )
+    index = SpaIndex(os.path.join(build_dir, "index.html"))
+
+    @app.get("/{full_path:path}", include_in_schema=False)
+    async def serve_react_app(full_path: str, request: Request):
+        if full_path.split("/", 1)[0] in API_PREFIXES:
+            raise HTTPException(status_code=404)
+        return index.response(request.headers)
+
+
+def _iter_compressible(root: str) -> Iterable[str]:
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if os.path.splitext(filename)[1] in _COMPRESSIBLE_EXTENSIONS:
+                yield os.path.join(directory, filename)
+
+
+def precompress(root: str, min_size: int = 256) -> List[Tuple[str, int, int]]:
+    """Write ``.gz`` (and ``.br`` when available) siblings for build assets."""
+    written = []
+    for path in _iter_compressible(root):
+        with open(path, "rb") as handle:
+            data = handle.read()
+        if len(data) < min_size:
+            continue
+        variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(data, quality=11)))
+        for suffix, compressed in variants:
+            if len(compressed) >= len(data):
+                continue
+            with open(path + suffix, "wb") as handle:
+                handle.write(compressed)
+            written.append((path + suffix, len(data), len(compressed)))
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    if not args:
+        print("usage: python -m static_assets BUILD_DIR", file=sys.stderr)
+        return 2
+    for path, original, compressed in precompress(args[0]):
+        print(f"{path}: {original} -> {compressed} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
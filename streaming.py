@@ -0,0 +1,72 @@
+"""Streamed JSON arrays for large recipe pages, plus memory/latency metrics.
+
+Small pages are still built as one payload (and coalesced). Pages larger than
+``RECIPES_STREAM_THRESHOLD`` send the first chunk immediately and then fetch
+the rest in keyset-ordered chunks of ``RECIPES_STREAM_CHUNK_SIZE``. At most
+one chunk of documents is held in memory at a time, however large the page.
+
+``/metrics`` gains:
+
+* ``recipes_response_first_byte_seconds{mode}``: time from the start of the
+  query to the first byte being ready (``buffered`` or ``streamed``);
+* ``recipes_streamed_rows_total``: documents sent through streams;
+* ``process_peak_resident_memory_bytes``: the process's RSS high-water mark.
+  Under a large-page load test it should stay flat once the stream path takes
+  over.
+"""
+
+import sys
+import time
+from typing import Iterable, Iterator, List
+
+from prometheus_client import Counter, Gauge, Histogram
+
+try:  # Not available on Windows; the gauge then reports 0.
+    import resource
+except ImportError:  # pragma: no cover - depends on the platform
+    resource = None
+
+FIRST_BYTE = Histogram(
+    "recipes_response_first_byte_seconds",
+    "Time until the first byte of a recipe list response is ready.",
+    ["mode"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+STREAMED_ROWS = Counter(
+    "recipes_streamed_rows_total", "Recipe documents sent through streamed responses."
+)
+PEAK_RSS = Gauge(
+    "process_peak_resident_memory_bytes", "Peak resident set size of this process."
+)
+
+
+def peak_rss_bytes() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+PEAK_RSS.set_function(peak_rss_bytes)
+
+
+def observe_first_byte(mode: str, started: float) -> None:
+    FIRST_BYTE.labels(mode).observe(time.perf_counter() - started)
+
+
+def json_array_stream(
+    head: List[bytes], chunks: Iterable[List[bytes]], started: float
+) -> Iterator[bytes]:
+    """Yield ``[head..., chunk..., ...]`` as JSON array fragments."""
+    observe_first_byte("streamed", started)
+    yield b"[" + b",".join(head)
+    STREAMED_ROWS.inc(len(head))
+    empty = not head
+    for chunk in chunks:
+        if not chunk:
+            continue
+        yield (b"" if empty else b",") + b",".join(chunk)
+        STREAMED_ROWS.inc(len(chunk))
+        empty = False
+    yield b"]"
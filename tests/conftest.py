@@ -1,13 +1,34 @@
 import os
+import shutil
+import statistics
 import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List
+
+# Importing ``main`` creates and migrates the app database, and the lifespan
+# of every TestClient opens it; keep that file out of the working tree.
+os.environ["DATABASE_URL"] = (
+    f"sqlite:///{tempfile.mkdtemp(prefix='recipe-tests-')}/recipes.db"
+)
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
+import main
 from database import Base
 from main import app, get_db
+from outbox import OutboxWorker
+
+_APP_DATA_DIR = os.path.dirname(os.environ["DATABASE_URL"][len("sqlite:///") :])
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_APP_DATA_DIR, ignore_errors=True)
 
 
 @pytest.fixture(scope="function")
@@ -41,8 +62,23 @@ def db_session(test_engine):
 
 
 @pytest.fixture
-def client(db_session):
+def outbox_worker(test_engine):
+    """Outbox worker bound to the test database; call ``run_once()`` to drain."""
+    return OutboxWorker(
+        sessionmaker(autocommit=False, autoflush=False, bind=test_engine),
+        max_attempts=2,
+    )
+
+
+@pytest.fixture
+def client(db_session, monkeypatch):
     """Test client"""
+    # Views counted by these requests flush into the test database.
+    monkeypatch.setattr(
+        main.popularity_flusher,
+        "session_factory",
+        sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind()),
+    )
 
     def override_get_db():
         try:
@@ -67,3 +103,177 @@ def sample_recipe():
         "cuisine": "Italian",
         "meal_type": "dinner",
     }
+
+
+# -- Performance budgets ---------------------------------------------------
+#
+# ``api_budget`` runs one API call a few times against ``seeded_engine`` and
+# fails with a readable report when it issues more SQL statements, hydrates
+# more ORM objects, or takes longer (median) than the endpoint's budget.
+# Time budgets are multiplied by ``PERF_BUDGET_TIME_SCALE`` (default 1) for
+# slow CI machines.
+
+SEED_RECIPES = 2000
+SEED_TAGS = 60
+SEED_USERS = 150
+TAGS_PER_RECIPE = 3
+
+
+@dataclass(frozen=True)
+class Budget:
+    max_queries: int
+    max_ms: float
+    max_loaded: int = 0
+
+
+@dataclass
+class Measurement:
+    statements: List[str] = field(default_factory=list)
+    loaded: int = 0
+    timings_ms: List[float] = field(default_factory=list)
+
+    @property
+    def queries(self) -> int:
+        return len(self.statements)
+
+    @property
+    def median_ms(self) -> float:
+        return statistics.median(self.timings_ms)
+
+
+@contextmanager
+def record_queries(engine):
+    """Collect the statements and ORM loads issued inside the block."""
+    measurement = Measurement()
+
+    def on_execute(conn, cursor, statement, *args):
+        measurement.statements.append(statement)
+
+    def on_load(target, context):
+        measurement.loaded += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    event.listen(Base, "load", on_load, propagate=True)
+    try:
+        yield measurement
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+        event.remove(Base, "load", on_load)
+
+
+def budget_report(label: str, budget: Budget, measurement: Measurement) -> str:
+    normalized = Counter(
+        " ".join(statement.split())[:160] for statement in measurement.statements
+    )
+    lines = [
+        f"{label} exceeded its performance budget",
+        f"  queries:     {measurement.queries} (budget {budget.max_queries})",
+        f"  ORM loads:   {measurement.loaded} (budget {budget.max_loaded})",
+        f"  median time: {measurement.median_ms:.1f} ms over "
+        f"{len(measurement.timings_ms)} runs (budget {budget.max_ms:.0f} ms)",
+        "  statements by frequency:",
+    ]
+    lines.extend(
+        f"    {count:>5} x {statement}"
+        for statement, count in normalized.most_common(10)
+    )
+    return "\n".join(lines)
+
+
+@pytest.fixture(scope="session")
+def seeded_engine(tmp_path_factory):
+    """A database of realistic size, seeded once per test session."""
+    import counts
+    import popularity
+    import read_model
+    from models import Recipe, Tag, User
+
+    path = tmp_path_factory.mktemp("perf") / "seeded.db"
+    engine = create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    tags = [Tag(name=f"tag-{index}") for index in range(SEED_TAGS)]
+    users = [
+        User(email=f"cook{index}@example.com", name=f"Cook {index}")
+        for index in range(SEED_USERS)
+    ]
+    session.add_all(tags + users)
+    session.add_all(
+        Recipe(
+            title=f"Seeded recipe {index}",
+            ingredients=f"{index % 7 + 1} cups rice, {index % 5 + 1} onions, salt",
+            instructions="Chop, simmer and season. " * 8,
+            cuisine=f"Cuisine {index % 12}",
+            meal_type=("Breakfast", "Lunch", "Dinner", "Snack")[index % 4],
+            owner=users[index % SEED_USERS],
+            tags=[tags[(index + step) % SEED_TAGS] for step in range(TAGS_PER_RECIPE)],
+        )
+        for index in range(SEED_RECIPES)
+    )
+    session.commit()
+    read_model.rebuild(session)
+    counts.rebuild(session)
+    popularity.backfill(session)
+    session.commit()
+    session.close()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def perf_client(seeded_engine, monkeypatch):
+    """Test client whose requests use the seeded database."""
+    SeededSession = sessionmaker(autocommit=False, autoflush=False, bind=seeded_engine)
+    monkeypatch.setattr(main.popularity_flusher, "session_factory", SeededSession)
+
+    def override_get_db():
+        db = SeededSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def api_budget(perf_client, seeded_engine):
+    """``check(label, budget, method, path, runs=5, **request)`` -> response.
+
+    ``request`` may be a callable returning fresh keyword arguments per run
+    (e.g. unique titles for writes).
+    """
+    scale = float(os.getenv("PERF_BUDGET_TIME_SCALE", "1"))
+
+    def check(label, budget, method, path, runs=5, request=None):
+        perf_client.request(method, path, **_request_kwargs(request))  # warm-up
+        measurements, timings = [], []
+        for _ in range(runs):
+            with record_queries(seeded_engine) as measurement:
+                started = time.perf_counter()
+                response = perf_client.request(method, path, **_request_kwargs(request))
+                timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code < 400, response.text
+            measurements.append(measurement)
+        worst = max(measurements, key=lambda m: (m.queries, m.loaded))
+        worst.timings_ms = timings
+        if (
+            worst.queries > budget.max_queries
+            or worst.loaded > budget.max_loaded
+            or worst.median_ms > budget.max_ms * scale
+        ):
+            pytest.fail(budget_report(label, budget, worst), pytrace=False)
+        return response
+
+    return check
+
+
+def _request_kwargs(request):
+    if request is None:
+        return {}
+    return request() if callable(request) else dict(request)
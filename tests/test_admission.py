@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import pytest
+
+from admission import (
+    AdmissionController,
+    AdmissionLimiter,
+    AdmissionRejected,
+    classify_route,
+)
+from config import Settings
+
+
+def test_classify_route_by_path_and_method():
+    assert classify_route("GET", "/recipes/search/pasta") == "search"
+    assert classify_route("GET", "/recipes/export") == "export"
+    assert classify_route("POST", "/tags/bulk") == "bulk"
+    assert classify_route("GET", "/recipes/1") == "read"
+    assert classify_route("PUT", "/recipes/1") == "write"
+    assert classify_route("GET", "/health") is None
+    assert classify_route("GET", "/metrics") is None
+
+
+def test_limiter_queues_then_sheds_when_queue_full():
+    async def scenario():
+        limiter = AdmissionLimiter("search", 1, 1, queue_timeout=1.0)
+        deadline = time.monotonic() + 1.0
+        await limiter.acquire(deadline)
+
+        waiter = asyncio.ensure_future(limiter.acquire(deadline))
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 1
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await limiter.acquire(deadline)
+        assert rejected.value.status_code == 429
+        assert rejected.value.retry_after >= 1
+
+        limiter.release()
+        await waiter
+        assert limiter.in_flight == 1
+        assert limiter.queue_depth == 0
+        limiter.release()
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_limiter_rejects_when_deadline_expires():
+    async def scenario():
+        limiter = AdmissionLimiter("read", 1, 5, queue_timeout=0.05)
+        await limiter.acquire(time.monotonic() + 1.0)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await limiter.acquire(time.monotonic() + 0.05)
+        assert rejected.value.status_code == 503
+        assert limiter.queue_depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_controller_uses_configured_limits():
+    settings = Settings(
+        admission_concurrency={"search": 3},
+        admission_queue_sizes={"search": 7},
+    )
+    controller = AdmissionController(settings)
+
+    limiter = controller.limiter_for("GET", "/recipes/search/soup")
+    assert limiter.max_concurrency == 3
+    assert limiter.max_queue == 7
+    assert controller.limiter_for("GET", "/health") is None
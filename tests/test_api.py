@@ -53,6 +53,10 @@ class TestAPI:
         paginated = client.get("/recipes/?skip=0&limit=10")
         assert paginated.status_code == 200
 
+        # Empty or negative pages are rejected rather than clamped to one row
+        for limit in (0, -5):
+            assert client.get(f"/recipes/?limit={limit}").status_code == 422
+
     def test_search_functionality(self, client, sample_recipe):
         """Test search endpoint with various scenarios"""
         # Create recipe
@@ -142,6 +146,9 @@ class TestAPI:
         assert data["owner"]["email"] == user_payload["email"]
         assert {tag["name"] for tag in data["tags"]} == {"quick", "easy"}
 
+        fetched = client.get(f"/recipes/{data['id']}").json()
+        assert fetched == data
+
     def test_user_and_tag_endpoints(self, client):
         user_payload = {"email": "reader@example.com", "name": "Reader"}
         create_user_response = client.post("/users/", json=user_payload)
@@ -154,3 +161,73 @@ class TestAPI:
         assert create_tag_response.status_code == 200
         tags = client.get("/tags/").json()
         assert any(tag["name"] == tag_payload["name"] for tag in tags)
+
+    def test_update_user_refreshes_owned_recipes(
+        self, client, sample_recipe, outbox_worker
+    ):
+        user_id = client.post("/users/", json={"email": "a@example.com"}).json()["id"]
+        client.post("/users/", json={"email": "b@example.com"})
+        recipe_id = client.post(
+            "/recipes/", json={**sample_recipe, "owner_id": user_id}
+        ).json()["id"]
+
+        response = client.put(
+            f"/users/{user_id}", json={"email": "a@example.com", "name": "Ada"}
+        )
+
+        assert response.json() == {
+            "id": user_id,
+            "email": "a@example.com",
+            "name": "Ada",
+        }
+        outbox_worker.run_once()
+        owner = client.get(f"/recipes/{recipe_id}").json()["owner"]
+        assert owner["name"] == "Ada"
+        taken = client.put(f"/users/{user_id}", json={"email": "b@example.com"})
+        assert taken.status_code == 409
+        missing = client.put("/users/999", json={"email": "c@example.com"})
+        assert missing.status_code == 404
+
+    def test_user_recipes_keyset_paging_and_counts(self, client, sample_recipe):
+        owner_id = client.post("/users/", json={"email": "owner@example.com"}).json()[
+            "id"
+        ]
+        other_id = client.post("/users/", json={"email": "other@example.com"}).json()[
+            "id"
+        ]
+        for index in range(3):
+            client.post(
+                "/recipes/",
+                json={**sample_recipe, "title": f"Owned {index}", "owner_id": owner_id},
+            )
+        client.post(
+            "/recipes/",
+            json={**sample_recipe, "title": "Theirs", "owner_id": other_id},
+        )
+        client.post(
+            "/recipes/", json={**sample_recipe, "title": "Unowned", "cuisine": "Thai"}
+        )
+
+        first_page = client.get(f"/users/{owner_id}/recipes", params={"limit": 2})
+        assert first_page.status_code == 200
+        assert [r["title"] for r in first_page.json()] == ["Owned 0", "Owned 1"]
+        cursor = first_page.headers["X-Next-After-Id"]
+
+        second_page = client.get(
+            f"/users/{owner_id}/recipes", params={"limit": 2, "after_id": cursor}
+        )
+        assert [r["title"] for r in second_page.json()] == ["Owned 2"]
+        assert "X-Next-After-Id" not in second_page.headers
+        # A final page that happens to be full has no cursor either.
+        full_page = client.get(f"/users/{owner_id}/recipes", params={"limit": 3})
+        assert len(full_page.json()) == 3
+        assert "X-Next-After-Id" not in full_page.headers
+
+        filtered = client.get(
+            f"/users/{owner_id}/recipes", params={"cuisine": "Thai"}
+        ).json()
+        assert filtered == []
+        assert client.get("/users/999/recipes").status_code == 404
+
+        counts = {u["email"]: u["recipe_count"] for u in client.get("/users/").json()}
+        assert counts == {"owner@example.com": 3, "other@example.com": 1}
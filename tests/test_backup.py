@@ -0,0 +1,193 @@
+import os
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import auth
+import backup
+import database
+import main
+import migrations
+from config import Settings
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture
+def wal_engine(test_engine):
+    with test_engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode = WAL")
+        conn.execute(
+            text("INSERT INTO recipes (title) VALUES ('Soup'), ('Stew'), ('Pie')")
+        )
+        conn.execute(
+            text("INSERT INTO data_stamps (name, version) VALUES ('recipes', 4)")
+        )
+        conn.commit()
+    return test_engine
+
+
+def _count(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT count(*) FROM recipes").fetchone()[0]
+
+
+def test_backup_is_a_throttled_point_in_time_snapshot(
+    wal_engine, tmp_path, monkeypatch
+):
+    source = backup.database_path(wal_engine)
+    sleeps = []
+
+    def write_during_copy(seconds):
+        # Each pause between steps is a window for foreground writes.
+        if not sleeps:
+            with sqlite3.connect(source, timeout=1) as conn:
+                conn.execute("INSERT INTO recipes (title) VALUES ('Late')")
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(backup.time, "sleep", write_during_copy)
+    manifest = backup.create_backup(
+        wal_engine, directory=str(tmp_path), step_pages=1, step_sleep=0.001
+    )
+
+    assert manifest["point_in_time"] and manifest["steps"] > 1
+    assert sleeps and manifest["stamp"] == 4
+    assert _count(tmp_path / manifest["name"]) == 3
+    assert _count(source) == 4
+    assert backup.verify(manifest["name"], str(tmp_path))["ok"]
+    assert [m["name"] for m in backup.list_backups(str(tmp_path))] == [manifest["name"]]
+
+
+def test_verify_rejects_a_tampered_backup(wal_engine, tmp_path):
+    name = backup.create_backup(wal_engine, directory=str(tmp_path))["name"]
+    with open(tmp_path / name, "r+b") as handle:
+        handle.seek(-10, 2)
+        handle.write(b"corruption")
+
+    report = backup.verify(name, str(tmp_path))
+    assert not report["ok"] and not report["checksum_ok"]
+    with pytest.raises(backup.BackupError, match="failed verification"):
+        backup.restore(name, wal_engine, str(tmp_path))
+    with pytest.raises(backup.BackupNotFoundError):
+        backup.verify("../recipes.db", str(tmp_path))
+
+
+@pytest.fixture
+def old_schema_engine(tmp_path):
+    """A database as it stood before migrations 5 and 6."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    database.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE recipe_popularity"))
+        conn.execute(text("DROP TABLE recipe_facet_counts"))
+        conn.execute(
+            text("INSERT INTO recipes (title, cuisine) VALUES ('Soup', 'Thai')")
+        )
+    migrations.upgrade(engine, migrations.MIGRATIONS[:4])
+    yield engine
+    engine.dispose()
+
+
+def test_restore_migrates_an_older_schema(old_schema_engine, test_engine, tmp_path):
+    directory = str(tmp_path / "backups")
+    manifest = backup.create_backup(old_schema_engine, directory=directory)
+    assert manifest["schema_version"] == 4
+
+    result = backup.restore(manifest["name"], test_engine, directory)
+
+    assert result["migrations_applied"] == [5, 6]
+    restored = create_engine(result["database_url"])
+    try:
+        assert migrations.applied_versions(restored) == [1, 2, 3, 4, 5, 6]
+        with restored.connect() as conn:
+            assert conn.execute(
+                text("SELECT recipe_id, views FROM recipe_popularity")
+            ).all() == [(1, 0)]
+            assert (
+                conn.execute(
+                    text(
+                        "SELECT count FROM recipe_facet_counts WHERE key = 'cuisine:Thai'"
+                    )
+                ).scalar()
+                == 1
+            )
+    finally:
+        restored.dispose()
+        os.unlink(result["database"])
+
+
+def test_restore_refuses_a_backup_from_newer_code(
+    old_schema_engine, test_engine, tmp_path
+):
+    with old_schema_engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO schema_migrations (version, description, applied_at) "
+                "VALUES (99, 'from the future', 0)"
+            )
+        )
+    directory = str(tmp_path / "backups")
+    name = backup.create_backup(old_schema_engine, directory=directory)["name"]
+
+    with pytest.raises(backup.BackupError, match="schema version 99"):
+        backup.restore(name, test_engine, directory)
+    assert not [path for path in os.listdir(tmp_path) if ".restored-" in path]
+
+
+def test_only_the_newest_backups_are_kept(wal_engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "settings", Settings(backup_keep=2))
+    names = [
+        backup.create_backup(wal_engine, directory=str(tmp_path))["name"]
+        for _ in range(3)
+    ]
+
+    assert [m["name"] for m in backup.list_backups(str(tmp_path))] == names[:0:-1]
+
+
+def test_restore_endpoint_swaps_the_engine_to_a_new_file(
+    client, wal_engine, tmp_path, monkeypatch
+):
+    settings = Settings(backup_dir=str(tmp_path / "backups"), admin_token="secret")
+    monkeypatch.setattr(backup, "settings", settings)
+    monkeypatch.setattr(auth, "get_settings", lambda: settings)
+    # Swap this test's engine instead of the app's, and keep the app's
+    # health and coherence monitors on their own database.
+    monkeypatch.setattr(database, "engine", wal_engine)
+    monkeypatch.setitem(database.SessionLocal.kw, "bind", wal_engine)
+    followed = []
+    monkeypatch.setattr(database, "_swap_callbacks", [followed.append])
+
+    assert client.post("/admin/backups").status_code == 404  # no token
+    name = client.post("/admin/backups", headers=ADMIN).json()["name"]
+    with wal_engine.begin() as conn:
+        conn.execute(text("DELETE FROM recipes"))
+        conn.execute(text("UPDATE data_stamps SET version = 9"))
+
+    response = client.post(f"/admin/backups/{name}/restore", headers=ADMIN)
+
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["stamp"] == 10
+    assert database.engine.url.database == result["database"]
+    assert followed == [database.engine]
+    with database.SessionLocal() as db:
+        assert db.execute(text("SELECT count(*) FROM recipes")).scalar() == 3
+    assert _count(backup.database_path(wal_engine)) == 0  # live file untouched
+    database.engine.dispose()
+    os.unlink(result["database"])
+    missing = client.post("/admin/backups/recipes-nope.db/restore", headers=ADMIN)
+    assert missing.status_code == 404
+
+
+def test_restore_endpoint_points_multi_worker_deployments_at_the_cli(
+    client, monkeypatch
+):
+    settings = Settings(admin_token="secret", web_concurrency=2)
+    monkeypatch.setattr(main, "settings", settings)
+    monkeypatch.setattr(auth, "get_settings", lambda: settings)
+
+    response = client.post("/admin/backups/recipes-1.db/restore", headers=ADMIN)
+
+    assert response.status_code == 409
+    assert "python -m backup restore recipes-1.db" in response.json()["detail"]
@@ -0,0 +1,119 @@
+import json
+
+from sqlalchemy import event, select
+
+import crud
+from models import RecipeDocument, Tag, recipe_tags
+
+
+def _statements(engine):
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    return statements
+
+
+def test_bulk_tag_upsert_resolves_every_id_in_one_statement(client, test_engine):
+    existing = client.post("/tags/", json={"name": "vegan"}).json()
+    statements = _statements(test_engine)
+
+    response = client.post(
+        "/tags/bulk", json={"names": ["quick", " vegan ", "", "quick", "spicy"]}
+    )
+
+    assert response.status_code == 200, response.text
+    tags = response.json()
+    assert [tag["name"] for tag in tags] == ["quick", "vegan", "spicy"]
+    assert tags[1]["id"] == existing["id"]
+    assert sum(s.startswith("INSERT INTO tags") for s in statements) == 1
+    assert client.post("/tags/bulk", json={"names": []}).status_code == 422
+
+
+def test_bulk_user_upsert_updates_names_and_refreshes_documents(
+    client, db_session, sample_recipe, outbox_worker
+):
+    owner = client.post("/users/", json={"email": "a@example.com", "name": "A"})
+    recipe = {**sample_recipe, "owner_id": owner.json()["id"]}
+    recipe_id = client.post("/recipes/", json=recipe).json()["id"]
+    outbox_worker.run_once()
+
+    response = client.post(
+        "/users/bulk",
+        json={
+            "users": [
+                {"email": "b@example.com"},
+                {"email": "a@example.com", "name": "Old"},
+                {"email": "a@example.com", "name": "Ada"},
+                {"email": "c@example.com", "name": "C"},
+            ]
+        },
+    )
+
+    assert response.status_code == 200, response.text
+    users = response.json()
+    assert [(u["email"], u["name"]) for u in users] == [
+        ("b@example.com", None),
+        ("a@example.com", "Ada"),
+        ("c@example.com", "C"),
+    ]
+    assert users[1]["id"] == owner.json()["id"]
+    # An omitted name keeps the stored one.
+    again = client.post("/users/bulk", json={"users": [{"email": "c@example.com"}]})
+    assert again.json()[0]["name"] == "C"
+
+    outbox_worker.run_once()
+    db_session.expire_all()
+    document = json.loads(db_session.get(RecipeDocument, recipe_id).document)
+    assert document["owner"]["name"] == "Ada"
+
+
+def test_renaming_onto_an_existing_tag_merges_recipe_tags(
+    client, db_session, sample_recipe, outbox_worker
+):
+    both = client.post("/recipes/", json={**sample_recipe, "tags": ["veg", "vegan"]})
+    only = client.post(
+        "/recipes/", json={**sample_recipe, "title": "Salad", "tags": ["veg"]}
+    )
+    tags = {tag["name"]: tag["id"] for tag in client.get("/tags/").json()}
+
+    response = client.put(f"/tags/{tags['veg']}", json={"name": "vegan"})
+
+    assert response.json() == {"id": tags["vegan"], "name": "vegan"}
+    rows = db_session.execute(
+        select(recipe_tags.c.recipe_id, recipe_tags.c.tag_id).order_by(
+            recipe_tags.c.recipe_id
+        )
+    ).all()
+    assert rows == [
+        (both.json()["id"], tags["vegan"]),
+        (only.json()["id"], tags["vegan"]),
+    ]
+    assert db_session.get(Tag, tags["veg"]) is None
+    outbox_worker.run_once()
+    salad = client.get(f"/recipes/{only.json()['id']}").json()
+    assert [tag["name"] for tag in salad["tags"]] == ["vegan"]
+
+    assert client.put(f"/tags/{tags['vegan']}", json={"name": "plant"}).json() == {
+        "id": tags["vegan"],
+        "name": "plant",
+    }
+    missing = client.post(f"/tags/{tags['veg']}/merge", json={"target_id": 1})
+    assert missing.status_code == 404
+
+
+def test_renaming_a_tag_rejects_blank_names_and_reports_lost_races(client, monkeypatch):
+    tag = client.post("/tags/", json={"name": "veg"}).json()
+    client.post("/tags/", json={"name": "vegan"})
+
+    assert client.put(f"/tags/{tag['id']}", json={"name": "  "}).status_code == 422
+    renamed = client.put(f"/tags/{tag['id']}", json={"name": " greens "})
+    assert renamed.json() == {"id": tag["id"], "name": "greens"}
+
+    # A concurrent rename commits "vegan" after this request looked it up.
+    monkeypatch.setattr(crud.TagRepository, "by_name", lambda self, name: None)
+    response = client.put(f"/tags/{tag['id']}", json={"name": "vegan"})
+    assert response.status_code == 409
+    assert client.get("/tags/").json()[0]["name"] == "greens"
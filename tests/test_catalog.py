@@ -0,0 +1,115 @@
+import json
+
+import pytest
+from sqlalchemy import event
+
+import catalog
+import crud
+
+
+def _create(client, title, cuisine=None, meal_type=None):
+    response = client.post(
+        "/recipes/",
+        json={
+            "title": title,
+            "ingredients": f"{title} ingredients",
+            "instructions": "Cook.",
+            "cuisine": cuisine,
+            "meal_type": meal_type,
+        },
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.fixture
+def reader(tmp_path, monkeypatch):
+    reader = catalog.CatalogReader(str(tmp_path / "recipes.catalog"))
+    monkeypatch.setattr(crud, "catalog_reader", reader)
+    return reader
+
+
+def _statements(engine):
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    return statements
+
+
+def test_catalog_matches_the_database(client, db_session, tmp_path):
+    for index in range(7):
+        _create(
+            client,
+            f"Dish {index}",
+            cuisine="Thai" if index % 2 else "Greek",
+            meal_type="Dinner" if index % 3 else "Lunch",
+        )
+    path = str(tmp_path / "recipes.catalog")
+    assert catalog.build(db_session, path)["recipes"] == 7
+    mapped = catalog.Catalog(path)
+
+    first = client.get("/recipes/").json()[0]
+    assert json.loads(mapped.get(first["id"])) == first
+    assert mapped.get(10**6) is None
+    assert (
+        json.loads(mapped.page(2, 3))
+        == client.get("/recipes/", params={"skip": 2, "limit": 3}).json()
+    )
+    assert mapped.page(50, 3) == b"[]"
+    # A negative skip reads from the start, as OFFSET does in SQL.
+    assert mapped.page(-1, 3) == mapped.page(0, 3)
+    assert mapped.filter(cuisine="Thai", skip=-2) == mapped.filter(cuisine="Thai")
+    assert client.get("/recipes/", params={"skip": -1}).status_code == 422
+    # Thai holds three of the seven dishes.
+    assert mapped.filter_page(cuisine="Thai", limit=2)[1]
+    assert not mapped.filter_page(cuisine="Thai", skip=1, limit=2)[1]
+    assert mapped.filter_page(skip=5, limit=1)[1]
+    for params in (
+        {"cuisine": "Thai"},
+        {"meal_type": "Dinner", "skip": 1},
+        {"cuisine": "Thai", "meal_type": "Dinner"},
+        {"cuisine": "Nope"},
+    ):
+        expected = client.get("/recipes/filter/", params=params).json()
+        assert (
+            json.loads(
+                mapped.filter(
+                    params.get("meal_type"),
+                    params.get("cuisine"),
+                    params.get("skip", 0),
+                    100,
+                )
+            )
+            == expected
+        )
+
+
+def test_reads_skip_sqlite_until_a_write_then_fall_back(
+    client, db_session, test_engine, reader
+):
+    recipe = _create(client, "Ramen", cuisine="Japanese")
+    catalog.build(db_session, reader.path)
+    reader.mark_dirty()
+    client.get("/recipes/")  # re-reads the stamp once
+
+    statements = _statements(test_engine)
+    assert client.get(f"/recipes/{recipe['id']}").json()["title"] == "Ramen"
+    assert client.get("/recipes/filter/", params={"cuisine": "Japanese"}).json()
+    assert statements == []
+
+    _create(client, "Udon", cuisine="Japanese")
+    titles = [r["title"] for r in client.get("/recipes/").json()]
+    assert titles == ["Ramen", "Udon"]
+    assert statements  # stale catalog: served from the database
+
+    # Publishing a new version swaps the file; the reader maps it.
+    catalog.build(db_session, reader.path)
+    reader.mark_dirty()
+    client.get("/recipes/")
+    statements.clear()
+    titles = [r["title"] for r in client.get("/recipes/").json()]
+    assert titles == ["Ramen", "Udon"]
+    assert statements == []
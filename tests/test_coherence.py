@@ -0,0 +1,106 @@
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+import coherence
+from coherence import CoherenceMonitor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_monitor_sees_commits_from_other_connections(tmp_path, monkeypatch):
+    path = str(tmp_path / "coherence.db")
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("CREATE TABLE t (x INTEGER)")
+    calls = []
+    monkeypatch.setattr(coherence, "_subscribers", [lambda: calls.append(1)])
+
+    monitor = CoherenceMonitor(path, poll_interval=0)
+    try:
+        assert monitor.check() is False
+        writer.execute("INSERT INTO t VALUES (1)")
+        assert monitor.check() is True
+        assert calls == [1]
+        assert monitor.check() is False
+    finally:
+        monitor.close()
+        writer.close()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def multi_worker_server(tmp_path):
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'workers.db'}",
+        "WEB_CONCURRENCY": "3",
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "ADMISSION_CONTROL_ENABLED": "0",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "serve"],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    try:
+        while True:
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                pytest.fail("multi-worker server did not start")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def test_reads_after_writes_are_fresh_across_workers(multi_worker_server):
+    base_url = multi_worker_server
+    for round_number in range(10):
+        # A new connection per request lets the kernel spread them over workers.
+        created = httpx.post(
+            f"{base_url}/recipes/",
+            json={
+                "title": f"Worker recipe {round_number}",
+                "ingredients": "x",
+                "instructions": "y",
+            },
+        ).json()
+        recipe_id = created["id"]
+        for _ in range(3):
+            listing = httpx.get(f"{base_url}/recipes/", params={"limit": 1000})
+            assert recipe_id in [recipe["id"] for recipe in listing.json()]
+
+        updated = httpx.put(
+            f"{base_url}/recipes/{recipe_id}",
+            json={
+                "title": f"Renamed {round_number}",
+                "ingredients": "x",
+                "instructions": "y",
+            },
+        )
+        assert updated.status_code == 200
+        for _ in range(3):
+            fetched = httpx.get(f"{base_url}/recipes/{recipe_id}").json()
+            assert fetched["title"] == f"Renamed {round_number}"
@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import select, text
+
+import compression
+import crud
+from config import Settings
+from dedupe import content_fingerprint
+from models import Recipe
+
+INGREDIENTS = "\n".join(
+    f"{amount} cups flour, 1 tsp salt, 2 eggs, butter"
+    for amount in ("one", "two", "three", "four", "five", "six")
+)
+INSTRUCTIONS = "Whisk the eggs. Fold in the flour. Bake until golden. " * 8
+
+
+@pytest.fixture
+def compress(monkeypatch):
+    def use(**overrides):
+        overrides.setdefault("text_compression_min_bytes", 64)
+        monkeypatch.setattr(compression, "settings", Settings(**overrides))
+
+    use(text_compression="zlib")
+    return use
+
+
+def _storage(db_session):
+    return db_session.execute(
+        text("SELECT typeof(ingredients), typeof(instructions) FROM recipes")
+    ).all()
+
+
+def test_large_text_is_stored_compressed_and_read_back(
+    client, db_session, sample_recipe, compress
+):
+    payload = {**sample_recipe, "ingredients": INGREDIENTS}
+    payload["instructions"] = INSTRUCTIONS
+    recipe_id = client.post("/recipes/", json=payload).json()["id"]
+    client.post("/recipes/", json={**sample_recipe, "title": "Short"})
+
+    assert _storage(db_session) == [("blob", "blob"), ("text", "text")]
+    db_session.expire_all()
+    stored = db_session.get(Recipe, recipe_id)
+    assert (stored.ingredients, stored.instructions) == (INGREDIENTS, INSTRUCTIONS)
+    assert client.get(f"/recipes/{recipe_id}").json()["ingredients"] == INGREDIENTS
+    # Search sees through the compression.
+    results = client.get("/recipes/search/EGGS, butter").json()
+    assert [r["id"] for r in results] == [recipe_id]
+
+    # Only BLOB rows are handed to the Python decompression function.
+    inflated = []
+    db_session.connection().connection.driver_connection.create_function(
+        "decompress_text", 1, lambda value: inflated.append(value) or ""
+    )
+    condition = crud._search_condition("tomato")
+    assert db_session.scalars(select(Recipe.title).where(condition)).all() == ["Short"]
+    assert len(inflated) == 1
+
+
+def test_trained_dictionary_shrinks_values_and_survives_a_cold_registry(
+    db_session, compress, monkeypatch
+):
+    db_session.add_all(
+        Recipe(title=f"Bread {i}", ingredients=INGREDIENTS, instructions="Bake.")
+        for i in range(20)
+    )
+    db_session.commit()
+    plain_size = len(compression.encode(INGREDIENTS))
+
+    dictionary_id = compression.train(db_session)
+    db_session.commit()
+    compress(text_compression="zlib", text_compression_dictionary=dictionary_id)
+    stored = compression.encode(INGREDIENTS)
+
+    assert len(stored) < plain_size
+    # Another process trained it: this one only finds it in the database.
+    monkeypatch.setattr(compression.dictionaries, "_entries", {})
+    assert compression.decode(stored) == INGREDIENTS
+
+
+def test_migrate_rewrites_existing_rows_in_chunks_both_ways(db_session, compress):
+    compress(text_compression="off")
+    db_session.add_all(
+        Recipe(title=f"Cake {i}", ingredients=INGREDIENTS, instructions=INSTRUCTIONS)
+        for i in range(7)
+    )
+    db_session.commit()
+    before = compression.storage_stats(db_session)
+    assert before["compressed_values"] == 0
+
+    compress(text_compression="zlib")
+    assert compression.migrate(db_session, chunk_size=3) == 7
+    after = compression.storage_stats(db_session)
+    assert after["compressed_values"] == 14
+    assert after["stored_bytes"] < before["stored_bytes"] / 2
+    db_session.expire_all()
+    recipe = db_session.query(Recipe).first()
+    assert content_fingerprint(
+        recipe.title, recipe.ingredients, recipe.instructions
+    ) == content_fingerprint("Cake 0", INGREDIENTS, INSTRUCTIONS)
+
+    compress(text_compression="off")
+    compression.migrate(db_session)
+    assert compression.storage_stats(db_session) == before
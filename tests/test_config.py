@@ -40,3 +40,21 @@ def test_settings_respect_environment(monkeypatch):
 
     # Clean up cache for other tests
     _reset_settings_cache()
+
+
+def test_admission_settings_merge_environment_overrides(monkeypatch):
+    monkeypatch.setenv("ADMISSION_CONCURRENCY", "search=2, read=50")
+    monkeypatch.setenv("ADMISSION_QUEUE_SIZE", "search=3")
+    monkeypatch.setenv("ADMISSION_QUEUE_TIMEOUT", "0.5")
+    _reset_settings_cache()
+
+    settings = config.get_settings()
+
+    assert settings.admission_enabled is True
+    assert settings.admission_concurrency["search"] == 2
+    assert settings.admission_concurrency["read"] == 50
+    assert settings.admission_concurrency["write"] == 8
+    assert settings.admission_queue_sizes["search"] == 3
+    assert settings.admission_queue_timeout == 0.5
+
+    _reset_settings_cache()
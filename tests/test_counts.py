@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+
+import counts
+import crud
+from models import Recipe
+
+
+def _create(client, title, cuisine=None, meal_type=None):
+    response = client.post(
+        "/recipes/",
+        json={
+            "title": title,
+            "ingredients": f"{title} ingredients",
+            "instructions": "Cook.",
+            "cuisine": cuisine,
+            "meal_type": meal_type,
+        },
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_counters_follow_creates_updates_and_deletes(client, db_session):
+    tacos = _create(client, "Tacos", "Mexican", "Dinner")
+    _create(client, "Salsa", "Mexican")
+    _create(client, "Toast", meal_type="Breakfast")
+
+    assert counts.stored_counts(db_session) == counts.computed_counts(db_session)
+    assert counts.exact_count(db_session, counts.facet_key(cuisine="Mexican")) == 2
+
+    client.put(
+        f"/recipes/{tacos['id']}",
+        json={
+            "title": "Tacos",
+            "ingredients": "Tacos ingredients",
+            "instructions": "Cook.",
+            "cuisine": "Tex-Mex",
+            "meal_type": "Dinner",
+        },
+    )
+    client.delete(f"/recipes/{tacos['id']}")
+
+    stored = counts.stored_counts(db_session)
+    assert stored == counts.computed_counts(db_session)
+    assert stored["all"] == 2
+    assert "cuisine:Tex-Mex" not in stored
+
+
+def test_total_headers_for_list_and_filter(client):
+    for index in range(5):
+        _create(client, f"Dish {index}", "Thai" if index % 2 else "Greek", "Lunch")
+
+    listed = client.get("/recipes/", params={"limit": 2, "total": True})
+    filtered = client.get(
+        "/recipes/filter/",
+        params={"cuisine": "Thai", "meal_type": "Lunch", "total": True},
+    )
+    plain = client.get("/recipes/")
+
+    assert listed.headers["x-total-count"] == "5"
+    assert listed.headers["x-total-count-age"] == "0"
+    assert len(listed.json()) == 2
+    assert filtered.headers["x-total-count"] == "2"
+    assert "x-total-count" not in plain.headers
+
+
+def test_search_total_is_cached(client, db_session, monkeypatch):
+    monkeypatch.setattr(crud, "search_counts", counts.CountCache(ttl=60))
+    for title in ("Pad Thai", "Thai Curry", "Pizza"):
+        _create(client, title)
+
+    first = client.get("/recipes/search/Thai", params={"total": True})
+    db_session.add(Recipe(title="Thai Salad", ingredients="x", instructions="y"))
+    db_session.commit()
+    second = client.get("/recipes/search/Thai", params={"total": True})
+
+    assert first.headers["x-total-count"] == "2"
+    # Served from the cache until the TTL runs out.
+    assert second.headers["x-total-count"] == "2"
+    assert len(second.json()) == 3
+
+
+def test_cold_search_count_does_not_block_the_page():
+    cache = counts.CountCache(ttl=60)
+    release = threading.Event()
+
+    def slow_count():
+        release.wait(5)
+        return 42
+
+    assert cache.lookup("q", slow_count, wait=0.01) is None
+    release.set()
+    cache._pending["q"].result(timeout=5)
+    count, age = cache.lookup("q", slow_count, wait=0.01)
+    assert count == 42
+    assert age < 60
+
+
+def test_stale_entry_is_served_while_refreshing(monkeypatch):
+    cache = counts.CountCache(ttl=1, max_age=10)
+    assert cache.lookup("q", lambda: 1) == (1, 0.0)
+    entry_time = cache._entries["q"][1]
+    monkeypatch.setattr(counts.time, "monotonic", lambda: entry_time + 5)
+
+    count, age = cache.lookup("q", lambda: 2)
+
+    assert (count, age) == (1, pytest.approx(5))
+
+
+def test_rebuild_repairs_drift(client, db_session):
+    _create(client, "Ramen", "Japanese", "Dinner")
+    db_session.query(counts.RecipeFacetCount).delete()
+    db_session.commit()
+
+    assert counts.stored_counts(db_session) == {}
+    counts.rebuild(db_session)
+    db_session.commit()
+
+    assert counts.stored_counts(db_session) == counts.computed_counts(db_session)
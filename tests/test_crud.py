@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from sqlalchemy.orm import Session
 
@@ -147,3 +149,57 @@ class TestCRUD:
         update_payload = RecipeCreate(**sample_recipe, owner_id=user.id, tags=["quick"])
         updated = crud.update_recipe(db_session, recipe.id, update_payload)
         assert {tag.name for tag in updated.tags} == {"quick"}
+
+    def test_hot_paths_reuse_compiled_statements(self, db_session: Session):
+        for title, meal_type, cuisine in (
+            ("A", "Dinner", "Thai"),
+            ("B", "Lunch", "Thai"),
+            ("C", "Dinner", "Greek"),
+        ):
+            crud.create_recipe(
+                db_session,
+                RecipeCreate(
+                    title=title,
+                    ingredients="rice",
+                    instructions="cook",
+                    meal_type=meal_type,
+                    cuisine=cuisine,
+                    tags=["quick"],
+                ),
+            )
+        repository = crud.RecipeRepository(db_session)
+
+        def read_everything(meal_type, cuisine, recipe_id):
+            def titles(**facets):
+                return [
+                    json.loads(document)["title"]
+                    for document in repository.filter_documents(**facets)
+                ]
+
+            repository.get(recipe_id)
+            repository.get_document(recipe_id)
+            repository.ingredients_for([recipe_id])
+            repository._ensure_tags(["quick", f"tag-{recipe_id}"])
+            return (
+                titles(),
+                titles(meal_type=meal_type),
+                titles(cuisine=cuisine),
+                titles(meal_type=meal_type, cuisine=cuisine),
+            )
+
+        compiled = db_session.get_bind()._compiled_cache
+        assert read_everything("Dinner", "Thai", 1) == (
+            ["A", "B", "C"],
+            ["A", "C"],
+            ["A", "B"],
+            ["A"],
+        )
+        cached = len(compiled)
+        # New values reuse every statement compiled for the first ones.
+        assert read_everything("Lunch", "Greek", 2) == (
+            ["A", "B", "C"],
+            ["B"],
+            ["C"],
+            [],
+        )
+        assert len(compiled) == cached
@@ -0,0 +1,99 @@
+import dedupe
+from models import Recipe, RecipeSignature
+
+BASE_INSTRUCTIONS = (
+    "Heat the oil in a large pan. Fry the onion and garlic until soft, add the "
+    "tomatoes and simmer for twenty minutes. Season, stir through the basil and "
+    "serve over freshly cooked spaghetti with grated parmesan."
+)
+
+
+def _recipe(title="Tomato Spaghetti", instructions=BASE_INSTRUCTIONS, **extra):
+    return {
+        "title": title,
+        "ingredients": "spaghetti, tomatoes, onion, garlic, basil, parmesan",
+        "instructions": instructions,
+        **extra,
+    }
+
+
+def test_fingerprint_ignores_case_punctuation_and_ingredient_order():
+    first = dedupe.content_fingerprint("Tomato  Soup!", "salt, Tomato", "Boil.")
+    second = dedupe.content_fingerprint("tomato soup", "tomato;salt", "boil")
+    assert first == second
+    assert first != dedupe.content_fingerprint("Tomato Soup", "salt", "Boil.")
+
+
+def test_exact_duplicates_are_rejected(client):
+    created = client.post("/recipes/", json=_recipe()).json()
+
+    copy = client.post("/recipes/", json=_recipe(title="  TOMATO spaghetti "))
+    assert copy.status_code == 409
+    assert copy.json()["detail"]["duplicate_of"] == created["id"]
+
+    other = client.post("/recipes/", json=_recipe(title="Tomato Linguine")).json()
+    clash = client.put(f"/recipes/{other['id']}", json=_recipe())
+    assert clash.status_code == 409
+    assert client.get(f"/recipes/{other['id']}").json()["title"] == "Tomato Linguine"
+
+
+def test_near_duplicates_are_found_through_the_lsh_index(
+    client, db_session, outbox_worker
+):
+    original = client.post("/recipes/", json=_recipe()).json()
+    variant = client.post(
+        "/recipes/",
+        json=_recipe(
+            title="Tomato Spaghetti (quick)",
+            instructions=BASE_INSTRUCTIONS.replace("twenty", "fifteen"),
+        ),
+    ).json()
+    unrelated = client.post(
+        "/recipes/",
+        json={
+            "title": "Pancakes",
+            "ingredients": "flour, milk, eggs",
+            "instructions": "Whisk everything together and fry in a hot pan.",
+        },
+    ).json()
+    outbox_worker.run_once()
+    db_session.expire_all()
+    assert db_session.get(RecipeSignature, unrelated["id"]) is not None
+
+    response = client.get(f"/recipes/{original['id']}/duplicates")
+    assert response.status_code == 200
+    matches = response.json()
+    assert [match["recipe_id"] for match in matches] == [variant["id"]]
+    assert matches[0]["exact"] is False
+    assert 0.5 <= matches[0]["similarity"] < 1.0
+
+    assert client.get("/recipes/999/duplicates").status_code == 404
+
+
+def test_searching_for_the_word_duplicates_still_searches(client):
+    found = client.post(
+        "/recipes/", json=_recipe(title="Spotting duplicates", ingredients="eggs")
+    ).json()
+
+    response = client.get("/recipes/search/duplicates")
+
+    assert response.status_code == 200
+    assert [recipe["id"] for recipe in response.json()] == [found["id"]]
+
+
+def test_batch_report_groups_exact_and_near_duplicates(db_session):
+    # Rows written before fingerprints existed carry NULL and may repeat.
+    first = Recipe(**_recipe())
+    second = Recipe(**_recipe(title="tomato spaghetti!"))
+    near = Recipe(**_recipe(instructions=BASE_INSTRUCTIONS + " Enjoy."))
+    other = Recipe(title="Pancakes", ingredients="flour", instructions="Fry.")
+    db_session.add_all([first, second, near, other])
+    db_session.commit()
+
+    report = dedupe.batch_report(db_session, workers=2, chunk_size=2, store=True)
+
+    assert report.scanned == 4
+    assert report.exact_groups == [[first.id, second.id]]
+    assert {(a, b) for a, b, _ in report.near_pairs} >= {(first.id, near.id)}
+    assert [first.id, second.id, near.id] in report.clusters
+    assert db_session.query(RecipeSignature).count() == 4
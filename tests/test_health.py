@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import health
+import main
+from config import Settings
+
+
+@pytest.fixture
+def small_pool_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        connect_args={"check_same_thread": False},
+        poolclass=health.TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_liveness_and_readiness_endpoints(client):
+    assert client.get("/health/live").json() == {"status": "ok"}
+
+    response = client.get("/health/ready")
+
+    body = response.json()
+    assert response.status_code == 200, body
+    assert body["status"] == "ready"
+    assert body["checks"]["database"]["status"] == "ok"
+    assert {"in_use", "overflow", "utilization"} <= set(body["checks"]["pool"])
+    assert "threadpool_lag_ms" in body["checks"]
+
+
+def test_health_reads_the_cached_probe(client, monkeypatch):
+    monkeypatch.setattr(
+        main.health_monitor,
+        "database",
+        {"status": "error", "checked_at": time.time(), "error": "OperationalError"},
+    )
+
+    assert client.get("/health").json()["status"] == "degraded"
+    assert client.get("/health/ready").status_code == 503
+
+
+def test_readiness_fails_when_the_pool_is_saturated(small_pool_engine):
+    monitor = health.HealthMonitor(small_pool_engine, Settings())
+    monitor.probe_database()
+    assert monitor.readiness()[0]
+
+    with small_pool_engine.connect():
+        ready, report = monitor.readiness()
+
+    assert not ready
+    assert report["checks"]["pool"]["in_use"] == 1
+    assert report["failing"] == ["pool utilization 100%"]
+    # The probe has its own connection, so a full pool does not block it.
+    with small_pool_engine.connect():
+        assert monitor.probe_database()["status"] == "ok"
+
+
+def test_pool_waits_are_recorded(small_pool_engine, monkeypatch):
+    monkeypatch.setattr(health, "pool_waits", health.WaitTracker())
+    held = threading.Event()
+
+    def hold_connection():
+        with small_pool_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            held.set()
+            time.sleep(0.3)
+
+    holder = threading.Thread(target=hold_connection)
+    holder.start()
+    held.wait(5)
+    with small_pool_engine.connect():
+        pass
+    holder.join()
+
+    stats = health.pool_stats(small_pool_engine)
+    assert stats["recent_max_wait_ms"] >= 150
+    monitor = health.HealthMonitor(
+        small_pool_engine, Settings(ready_max_pool_wait_ms=100)
+    )
+    monitor.probe_database()
+    assert monitor.readiness()[1]["failing"][0].startswith("pool wait")
+
+
+def test_unreachable_database_and_stale_probe(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'missing' / 'x.db'}")
+    monitor = health.HealthMonitor(engine, Settings(health_probe_interval=1))
+
+    assert monitor.probe_database()["status"] == "error"
+    monitor.database = {"status": "ok", "checked_at": time.time() - 10}
+    assert monitor.database_status()["status"] == "stale"
+    assert monitor.readiness()[1]["failing"] == ["database stale"]
@@ -0,0 +1,181 @@
+import json
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+import counts
+import index_advisor
+import migrations
+from database import Base
+from models import Recipe
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL, "
+    "name VARCHAR)",
+    "CREATE TABLE tags (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL)",
+    "CREATE TABLE recipes (id INTEGER PRIMARY KEY, title VARCHAR, "
+    "ingredients VARCHAR, cuisine VARCHAR, meal_type VARCHAR, "
+    "instructions VARCHAR, owner_id INTEGER REFERENCES users (id))",
+    "CREATE INDEX ix_recipes_cuisine ON recipes (cuisine)",
+    "CREATE INDEX ix_recipes_meal_type ON recipes (meal_type)",
+    "CREATE TABLE recipe_tags (recipe_id INTEGER REFERENCES recipes (id), "
+    "tag_id INTEGER REFERENCES tags (id), PRIMARY KEY (recipe_id, tag_id))",
+]
+
+
+@pytest.fixture
+def legacy_engine():
+    """A database created before the composite indexes existed."""
+    db_fd, db_path = tempfile.mkstemp()
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+    yield engine
+    engine.dispose()
+    os.close(db_fd)
+    os.unlink(db_path)
+
+
+def _index_names(engine, table):
+    return {index["name"] for index in inspect(engine).get_indexes(table)}
+
+
+def test_upgrade_adds_indexes_to_existing_database(legacy_engine):
+    applied = migrations.upgrade(legacy_engine)
+
+    assert applied == [migration.version for migration in migrations.MIGRATIONS]
+    assert {
+        "ix_recipes_meal_type_cuisine",
+        "ix_recipes_owner_id_id",
+        "ix_recipes_owner_cuisine_meal_type",
+    } <= _index_names(legacy_engine, "recipes")
+    assert "ix_recipe_tags_tag_id_recipe_id" in _index_names(
+        legacy_engine, "recipe_tags"
+    )
+    with legacy_engine.connect() as conn:
+        # ANALYZE ran, so the planner has statistics for the new indexes.
+        assert conn.execute(text("SELECT count(*) FROM sqlite_stat1")).scalar() > 0
+
+
+def test_upgrade_is_recorded_and_idempotent(legacy_engine):
+    migrations.upgrade(legacy_engine)
+
+    assert migrations.upgrade(legacy_engine) == []
+    assert migrations.applied_versions(legacy_engine) == [
+        migration.version for migration in migrations.MIGRATIONS
+    ]
+
+
+def test_upgrade_matches_models_on_fresh_database(test_engine):
+    migrations.upgrade(test_engine)
+
+    declared = {index.name for index in Recipe.__table__.indexes}
+    assert declared <= _index_names(test_engine, "recipes")
+
+
+def test_version_recorded_by_another_process_is_not_reapplied(legacy_engine):
+    calls = []
+    migration = migrations.Migration(1, "first", lambda conn: calls.append(1))
+    migrations.applied_versions(legacy_engine)
+    with legacy_engine.begin() as conn:
+        conn.execute(text("INSERT INTO schema_migrations VALUES (1, 'elsewhere', 0)"))
+
+    assert migrations.upgrade(legacy_engine, [migration]) == []
+    assert calls == []
+
+
+def test_index_advisor_credits_the_filter_index(test_engine, tmp_path):
+    Base.metadata.create_all(bind=test_engine)
+    migrations.upgrade(test_engine)
+    with test_engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO recipes (title, cuisine, meal_type) "
+                "VALUES (:title, :cuisine, :meal_type)"
+            ),
+            [
+                {
+                    "title": f"Recipe {i}",
+                    "cuisine": f"cuisine-{i % 20}",
+                    "meal_type": f"meal-{i % 7}",
+                }
+                for i in range(2000)
+            ],
+        )
+
+    workload = tmp_path / "workload.jsonl"
+    records = [
+        {
+            "statement": "SELECT id FROM recipes WHERE meal_type = ? AND cuisine = ?",
+            "parameters": ["meal-3", "cuisine-5"],
+        },
+        {"statement": "UPDATE recipes SET title = ?", "parameters": ["x"]},
+        {"statement": "SELECT ?", "parameters": [{"$bytes": 3}]},
+        {
+            "statement": "SELECT id FROM recipes WHERE title = ?",
+            "parameters": ["x" * 200 + "..."],
+            "parameters_truncated": True,
+        },
+    ]
+    workload.write_text("\n".join(json.dumps(record) for record in records))
+    with open(workload) as handle:
+        statements, skipped = index_advisor.load_workload(handle)
+    assert len(statements) == 1
+    assert skipped == 3
+
+    database = test_engine.url.database
+    report = index_advisor.advise(database, statements, repeat=1)
+
+    assert report.replayed == 1
+    usage = report.candidates["ix_recipes_meal_type_cuisine"]
+    assert usage.statements == 1
+    assert "ix_recipes_meal_type_cuisine" not in report.unused
+    assert "ix_recipe_tags_tag_id_recipe_id" in report.unused
+    # The live database keeps every index.
+    assert "ix_recipes_meal_type_cuisine" in _index_names(test_engine, "recipes")
+    assert "ix_recipes_meal_type_cuisine" in index_advisor.format_report(report)
+
+
+def test_fingerprint_backfill_keeps_the_oldest_copy(legacy_engine):
+    with legacy_engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO recipes (title, ingredients, instructions) "
+                "VALUES ('Soup', 'water, salt', 'Boil'), "
+                "('soup!', 'salt, water', 'boil.'), ('Bread', 'flour', 'Bake')"
+            )
+        )
+
+    migrations.upgrade(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT title, content_fingerprint FROM recipes ORDER BY id")
+        ).all()
+    assert rows[0][1] is not None
+    assert rows[1][1] is None
+    assert rows[2][1] is not None
+    assert "ix_recipes_content_fingerprint" in _index_names(legacy_engine, "recipes")
+
+
+def test_facet_counter_backfill(legacy_engine):
+    with legacy_engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO recipes (title, cuisine, meal_type) VALUES "
+                "('Tacos', 'Mexican', 'Dinner'), ('Salsa', 'Mexican', NULL), "
+                "('Toast', NULL, 'Breakfast')"
+            )
+        )
+
+    migrations.upgrade(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        stored = counts.stored_counts(conn)
+    assert stored["all"] == 3
+    assert stored["cuisine:Mexican"] == 2
+    assert stored["meal_type:Dinner"] == 1
+    assert stored["cuisine+meal_type:Mexican\x1fDinner"] == 1
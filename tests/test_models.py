@@ -1,3 +1,4 @@
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from models import Recipe, Tag, User
@@ -57,3 +58,18 @@ class TestModels:
 
         assert recipe.owner.id == user.id
         assert {tag.name for tag in recipe.tags} == {"vegan", "quick"}
+
+    def test_owner_lookups_use_composite_indexes(self, db_session: Session):
+        indexes = {index.name for index in Recipe.__table__.indexes}
+        assert {
+            "ix_recipes_owner_id_id",
+            "ix_recipes_owner_cuisine_meal_type",
+        }.issubset(indexes)
+
+        plan = db_session.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT id FROM recipes "
+                "WHERE owner_id = 1 AND id > 0 ORDER BY id"
+            )
+        ).all()
+        assert any("ix_recipes_owner" in row[-1] for row in plan)
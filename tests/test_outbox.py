@@ -0,0 +1,114 @@
+import json
+import logging
+import time
+
+from fastapi.testclient import TestClient
+
+import crud
+import main
+import outbox
+from config import Settings
+from models import OutboxEvent
+from schemas import RecipeCreate
+
+
+def _events(db_session):
+    db_session.expire_all()
+    return db_session.query(OutboxEvent).order_by(OutboxEvent.id).all()
+
+
+def test_recipe_writes_enqueue_events_in_the_same_transaction(
+    db_session, sample_recipe
+):
+    recipe = crud.create_recipe(db_session, RecipeCreate(**sample_recipe))
+    crud.update_recipe(
+        db_session, recipe.id, RecipeCreate(**{**sample_recipe, "cuisine": "Thai"})
+    )
+    crud.delete_recipe(db_session, recipe.id)
+
+    events = _events(db_session)
+    assert [event.topic for event in events] == [
+        "recipe.created",
+        "recipe.updated",
+        "recipe.deleted",
+    ]
+    updated = json.loads(events[1].payload)
+    assert updated["before"]["cuisine"] == "Italian"
+    assert updated["after"]["cuisine"] == "Thai"
+    assert all(event.status == "pending" for event in events)
+
+
+def test_worker_runs_handlers_and_retries_failures(
+    db_session, outbox_worker, monkeypatch
+):
+    seen = []
+    attempts = {"count": 0}
+
+    def flaky(db, payload):
+        attempts["count"] += 1
+        if attempts["count"] == 1:
+            raise RuntimeError("transient")
+        seen.append(payload["value"])
+
+    monkeypatch.setitem(outbox._handlers, "test.flaky", [flaky])
+    monkeypatch.setattr(outbox, "RETRY_BASE_SECONDS", 0.0)
+    outbox.enqueue(db_session, "test.flaky", {"value": 42})
+    outbox.enqueue(db_session, "test.unhandled")
+    db_session.commit()
+
+    # First pass: the flaky event fails once and is rescheduled immediately.
+    assert outbox_worker.run_once() == 2
+    assert seen == [42]
+
+    events = _events(db_session)
+    assert [event.status for event in events] == ["done", "done"]
+    assert events[0].attempts == 1
+
+
+def test_worker_marks_event_failed_after_max_attempts(
+    db_session, outbox_worker, monkeypatch
+):
+    def broken(db, payload):
+        raise ValueError("always")
+
+    monkeypatch.setitem(outbox._handlers, "test.broken", [broken])
+    monkeypatch.setattr(outbox, "RETRY_BASE_SECONDS", 0.0)
+    outbox.enqueue(db_session, "test.broken")
+    db_session.commit()
+
+    assert outbox_worker.run_once() == 0
+    (event,) = _events(db_session)
+    assert event.status == "failed"
+    assert event.attempts == 2
+
+
+def test_background_worker_drains_queue(db_session, outbox_worker, monkeypatch):
+    handled = []
+    monkeypatch.setitem(
+        outbox._handlers, "test.async", [lambda db, payload: handled.append(payload)]
+    )
+    outbox_worker.poll_interval = 0.01
+    outbox.enqueue(db_session, "test.async", {"n": 1})
+    db_session.commit()
+
+    outbox_worker.start()
+    try:
+        for _ in range(200):
+            if handled:
+                break
+            outbox.notify_workers()
+            time.sleep(0.01)
+    finally:
+        outbox_worker.stop()
+    assert handled == [{"n": 1}]
+
+
+def test_disabled_worker_warns_that_fan_out_reads_go_stale(monkeypatch, caplog):
+    monkeypatch.setattr(
+        main, "settings", Settings(outbox_worker_enabled=False, snapshot_dir="snaps")
+    )
+    with caplog.at_level(logging.WARNING, logger="main"):
+        with TestClient(main.app):
+            pass
+    assert "OUTBOX_WORKER_ENABLED=0" in caplog.text
+    assert "catalog snapshots" in caplog.text
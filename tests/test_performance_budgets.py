@@ -0,0 +1,162 @@
+import itertools
+
+import pytest
+
+from .conftest import (
+    SEED_TAGS,
+    SEED_USERS,
+    Budget,
+    Measurement,
+    budget_report,
+)
+
+_unique = itertools.count()
+
+
+def _recipe_body(tags):
+    return lambda: {
+        "json": {
+            "title": f"Budget recipe {next(_unique)}",
+            "ingredients": "2 cups rice, 1 onion",
+            "instructions": "Simmer.",
+            "cuisine": "Cuisine 1",
+            "meal_type": "Dinner",
+            "tags": tags,
+        }
+    }
+
+
+# (label, method, path, request, budget). Query counts are exact ceilings;
+# a new statement per row (N+1) or an eager loader fanning out across the
+# seeded catalog blows them by orders of magnitude.
+BUDGETS = [
+    ("list", "GET", "/recipes/", None, Budget(max_queries=1, max_ms=100)),
+    (
+        "list with total",
+        "GET",
+        "/recipes/?total=true",
+        None,
+        Budget(max_queries=2, max_ms=100),
+    ),
+    ("get", "GET", "/recipes/5", None, Budget(max_queries=1, max_ms=50)),
+    (
+        "search (streamed)",
+        "GET",
+        "/recipes/search/recipe 1",
+        None,
+        Budget(max_queries=5, max_ms=250),
+    ),
+    (
+        "filter",
+        "GET",
+        "/recipes/filter/?cuisine=Cuisine 3&meal_type=Dinner",
+        None,
+        Budget(max_queries=1, max_ms=100),
+    ),
+    (
+        "list popular",
+        "GET",
+        "/recipes/?sort=popular",
+        None,
+        Budget(max_queries=1, max_ms=100),
+    ),
+    (
+        "filter popular",
+        "GET",
+        "/recipes/filter/?cuisine=Cuisine 3&sort=popular",
+        None,
+        Budget(max_queries=1, max_ms=100),
+    ),
+    (
+        "users with counts",
+        "GET",
+        "/users/",
+        None,
+        Budget(max_queries=1, max_ms=200, max_loaded=SEED_USERS),
+    ),
+    (
+        "owner page",
+        "GET",
+        "/users/3/recipes",
+        None,
+        Budget(max_queries=2, max_ms=100, max_loaded=1),
+    ),
+    (
+        "tags",
+        "GET",
+        "/tags/",
+        None,
+        Budget(max_queries=1, max_ms=100, max_loaded=SEED_TAGS),
+    ),
+    (
+        "tag page",
+        "GET",
+        "/tags/3/recipes",
+        None,
+        Budget(max_queries=2, max_ms=100, max_loaded=1),
+    ),
+    ("cuisines", "GET", "/cuisines/", None, Budget(max_queries=1, max_ms=50)),
+    (
+        "bulk tag upsert",
+        "POST",
+        "/tags/bulk",
+        {"json": {"names": [f"tag-{index}" for index in range(SEED_TAGS)] + ["new"]}},
+        Budget(max_queries=1, max_ms=100),
+    ),
+    (
+        "shopping list",
+        "POST",
+        "/shopping-list",
+        {"json": {"recipe_ids": list(range(1, 201))}},
+        Budget(max_queries=1, max_ms=150),
+    ),
+    (
+        "create with tags",
+        "POST",
+        "/recipes/",
+        _recipe_body(["tag-1", "tag-2", "fresh"]),
+        Budget(max_queries=12, max_ms=250, max_loaded=10),
+    ),
+    (
+        "update with tags",
+        "PUT",
+        "/recipes/7",
+        _recipe_body(["tag-1", "tag-5"]),
+        Budget(max_queries=14, max_ms=250, max_loaded=10),
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "label, method, path, request_kwargs, budget",
+    BUDGETS,
+    ids=[entry[0] for entry in BUDGETS],
+)
+def test_endpoint_stays_within_budget(
+    api_budget, label, method, path, request_kwargs, budget
+):
+    api_budget(f"{method} {path}", budget, method, path, request=request_kwargs)
+
+
+def test_exceeded_budget_reports_repeated_statements(api_budget):
+    with pytest.raises(pytest.fail.Exception) as failure:
+        api_budget("GET /tags/", Budget(max_queries=0, max_ms=1000), "GET", "/tags/")
+
+    report = str(failure.value)
+    assert "GET /tags/ exceeded its performance budget" in report
+    assert "queries:     1 (budget 0)" in report
+
+
+def test_report_groups_an_n_plus_one():
+    measurement = Measurement(
+        statements=["SELECT * FROM tags\n WHERE recipe_id = ?"] * 40
+        + ["SELECT * FROM recipes"],
+        loaded=40,
+        timings_ms=[3.0, 5.0, 4.0],
+    )
+
+    report = budget_report("GET /x", Budget(max_queries=2, max_ms=10), measurement)
+
+    assert "queries:     41 (budget 2)" in report
+    assert "median time: 4.0 ms over 3 runs" in report
+    assert "   40 x SELECT * FROM tags WHERE recipe_id = ?" in report
@@ -0,0 +1,128 @@
+import threading
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+import crud
+import main
+import popularity
+from config import Settings
+from models import RecipePopularity
+
+HOUR = 3600.0
+
+
+@pytest.fixture
+def recipes(client, sample_recipe):
+    return [
+        client.post("/recipes/", json={**sample_recipe, "title": title}).json()["id"]
+        for title in ("Soup", "Stew", "Pie")
+    ]
+
+
+def _ids(response):
+    return [recipe["id"] for recipe in response.json()]
+
+
+def test_views_are_flushed_in_batches_and_rank_popular_pages(client, recipes):
+    soup, stew, pie = recipes
+    for recipe_id in (pie, pie, stew, pie, stew):
+        assert client.get(f"/recipes/{recipe_id}").status_code == 200
+    client.get("/recipes/999")  # missing recipes are not counted
+
+    assert main.popularity_flusher.flush_once() == 2
+    assert main.popularity_flusher.flush_once() == 0  # nothing pending
+
+    assert _ids(client.get("/recipes/?sort=popular")) == [pie, stew, soup]
+    assert _ids(client.get("/recipes/")) == [soup, stew, pie]
+    filtered = client.get("/recipes/filter/?cuisine=Italian&sort=popular&limit=2")
+    assert _ids(filtered) == [pie, stew]
+    assert _ids(client.get("/recipes/search/pasta?sort=popular")) == [pie, stew, soup]
+    assert client.get("/recipes/?sort=newest").status_code == 422
+
+    client.delete(f"/recipes/{pie}")
+    assert _ids(client.get("/recipes/?sort=popular")) == [stew, soup]
+
+
+def test_large_popular_pages_stream_on_the_score_keyset(
+    client, sample_recipe, monkeypatch
+):
+    ids = [
+        client.post("/recipes/", json={**sample_recipe, "title": f"Dish {n}"}).json()[
+            "id"
+        ]
+        for n in range(6)
+    ]
+    # Views 0, 1, 1, 2, 2, 3: ties are broken by id.
+    for recipe_id, count in zip(ids, (0, 1, 1, 2, 2, 3)):
+        for _ in range(count):
+            client.get(f"/recipes/{recipe_id}")
+    main.popularity_flusher.flush_once()
+    expected = [ids[5], ids[3], ids[4], ids[1], ids[2], ids[0]]
+    monkeypatch.setattr(
+        crud,
+        "settings",
+        Settings(recipes_stream_threshold=2, recipes_stream_chunk_size=1),
+    )
+
+    streamed = client.get("/recipes/?sort=popular&limit=6")
+    assert "content-length" not in streamed.headers
+    assert _ids(streamed) == expected
+
+    searched = client.get("/recipes/search/Dish?sort=popular&skip=1&limit=4")
+    assert _ids(searched) == expected[1:5]
+    assert searched.headers["X-Next-Skip"] == "5"
+    last = client.get("/recipes/search/Dish?sort=popular&skip=1&limit=5")
+    assert _ids(last) == expected[1:] and "X-Next-Skip" not in last.headers
+
+
+def test_scores_decay_incrementally_and_survive_a_rebase(db_session, recipes):
+    old, recent, _ = recipes
+    start = 1_000_000.0
+    popularity.flush(db_session, {old: 4}, HOUR, now=start)
+    # Two half-lives later one view outweighs the four older ones combined.
+    popularity.flush(db_session, {recent: 1}, HOUR, now=start + 2 * HOUR + 1)
+
+    def ranking():
+        return db_session.execute(
+            select(RecipePopularity.recipe_id, RecipePopularity.views)
+            .order_by(RecipePopularity.score.desc(), RecipePopularity.recipe_id)
+            .limit(2)
+        ).all()
+
+    assert ranking() == [(recent, 1), (old, 4)]
+    later = start + (popularity.MAX_EXPONENT + 10) * HOUR
+    popularity.flush(db_session, {old: 1}, HOUR, now=later)
+    assert popularity._epoch(db_session, later) > start
+    assert ranking() == [(old, 5), (recent, 1)]
+
+
+def test_striped_counter_keeps_every_view_and_retries_failed_flushes(monkeypatch):
+    counter = popularity.ViewCounter()
+
+    def record():
+        for recipe_id in range(200):
+            counter.record(recipe_id)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    def failing_flush(*args, **kwargs):
+        raise OperationalError("UPSERT", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(popularity, "flush", failing_flush)
+    flusher = popularity.PopularityFlusher(lambda: _NullSession(), counter, 1.0, 1.0)
+    assert flusher.flush_once() == 0
+    assert counter.drain() == {recipe_id: 8 for recipe_id in range(200)}
+
+
+class _NullSession:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
@@ -0,0 +1,73 @@
+import os
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth
+from config import Settings
+from profiling import ProfileStore, ProfilingMiddleware
+
+
+@pytest.fixture
+def profiled(tmp_path):
+    settings = Settings(admin_token="secret", profile_dir=str(tmp_path), profile_keep=2)
+    store = ProfileStore(settings.profile_dir, settings.profile_keep)
+    app = FastAPI()
+
+    @app.get("/recipes/filter/")
+    def slow_filter():
+        deadline = time.perf_counter() + 0.03
+        while time.perf_counter() < deadline:
+            pass
+        return {"ok": True}
+
+    app.add_middleware(ProfilingMiddleware, settings=settings, store=store)
+    with TestClient(app) as client:
+        yield client, store, tmp_path
+
+
+def _debug_headers(token="secret"):
+    return {"X-Debug-Profile": "1", "X-Admin-Token": token}
+
+
+def test_unrequested_and_unauthorized_calls_are_not_profiled(profiled):
+    client, store, directory = profiled
+    client.get("/recipes/filter/")
+    client.get("/recipes/filter/", headers=_debug_headers("wrong"))
+    assert store.latest() == []
+    assert os.listdir(directory) == []
+
+
+def test_authorized_request_writes_collapsed_stacks(profiled):
+    client, store, directory = profiled
+    assert client.get("/recipes/filter/", headers=_debug_headers()).status_code == 200
+
+    (summary,) = store.latest()
+    assert summary["route"] == "/recipes/filter/"
+    assert summary["status"] == 200
+    assert summary["duration_ms"] >= 30
+    assert "_GET_recipes-filter_" in summary["file"]
+    assert summary["file"].endswith(".collapsed")
+
+    content = (directory / summary["file"]).read_text()
+    assert "slow_filter" in content
+
+
+def test_capture_directory_is_rotated(profiled):
+    client, store, directory = profiled
+    for _ in range(3):
+        client.get("/recipes/filter/", headers=_debug_headers())
+        time.sleep(0.002)
+    assert len(os.listdir(directory)) == 2
+    assert len(store.latest()) == 2
+
+
+def test_profiles_endpoint_requires_admin_token(client, monkeypatch):
+    assert client.get("/debug/profiles").status_code == 404
+
+    monkeypatch.setattr(auth, "get_settings", lambda: Settings(admin_token="t0k"))
+    response = client.get("/debug/profiles", headers={"X-Admin-Token": "t0k"})
+    assert response.status_code == 200
+    assert "captures" in response.json()
@@ -0,0 +1,78 @@
+import json
+
+import crud
+import read_model
+from models import Recipe, RecipeDocument
+from schemas import RecipeCreate, UserCreate
+
+
+def _create(db_session, title, **extra):
+    payload = RecipeCreate(
+        title=title, ingredients="flour", instructions="bake", **extra
+    )
+    return crud.create_recipe(db_session, payload)
+
+
+def _stored(db_session, recipe_id):
+    db_session.expire_all()
+    document = db_session.get(RecipeDocument, recipe_id)
+    return json.loads(document.document) if document else None
+
+
+def test_write_path_keeps_documents_in_sync(db_session, outbox_worker):
+    first = crud.create_user(db_session, UserCreate(email="a@example.com"))
+    second = crud.create_user(db_session, UserCreate(email="b@example.com"))
+    recipe = _create(db_session, "Bread", owner_id=first.id, tags=["baking"])
+
+    document = _stored(db_session, recipe.id)
+    assert document["owner"]["email"] == "a@example.com"
+    assert [tag["name"] for tag in document["tags"]] == ["baking"]
+
+    crud.update_recipe(
+        db_session,
+        recipe.id,
+        RecipeCreate(
+            title="Bread",
+            ingredients="flour",
+            instructions="bake",
+            owner_id=second.id,
+            tags=["baking"],
+        ),
+    )
+    assert _stored(db_session, recipe.id)["owner"]["email"] == "b@example.com"
+
+    tag = recipe.tags[0]
+    crud.TagRepository(db_session).rename(tag, "bakery")
+    outbox_worker.run_once()
+    assert _stored(db_session, recipe.id)["tags"][0]["name"] == "bakery"
+
+    crud.UserRepository(db_session).update(second, {"name": "Baker"})
+    outbox_worker.run_once()
+    assert _stored(db_session, recipe.id)["owner"]["name"] == "Baker"
+
+    crud.delete_recipe(db_session, recipe.id)
+    assert _stored(db_session, recipe.id) is None
+
+
+def test_reads_fall_back_for_rows_without_documents(db_session):
+    db_session.add(Recipe(title="Legacy", ingredients="x", instructions="y"))
+    db_session.commit()
+
+    payload = json.loads(crud.get_recipes_payload(db_session))
+    assert [recipe["title"] for recipe in payload] == ["Legacy"]
+
+
+def test_consistency_check_and_rebuild(db_session):
+    recipe = _create(db_session, "Soup")
+    db_session.add(Recipe(title="Legacy", ingredients="x", instructions="y"))
+    db_session.get(RecipeDocument, recipe.id).document = b"{}"
+    db_session.commit()
+
+    report = read_model.check_consistency(db_session)
+    assert report.checked == 2
+    assert report.stale == [recipe.id]
+    assert len(report.missing) == 1
+    assert not report.consistent
+
+    assert read_model.rebuild(db_session) == 2
+    assert read_model.check_consistency(db_session).consistent
@@ -0,0 +1,76 @@
+from sqlalchemy import event
+
+from models import Recipe
+from shopping_list import ParsedIngredient, aggregate, parse_ingredient
+
+
+def test_parse_ingredient_quantities_and_units():
+    assert parse_ingredient("2 cups Flour") == ParsedIngredient("flour", 2.0, "cup")
+    assert parse_ingredient("1 1/2 tsp. salt") == ParsedIngredient("salt", 1.5, "tsp")
+    assert parse_ingredient("½ kg potatoes") == ParsedIngredient("potatoes", 500.0, "g")
+    assert parse_ingredient("3 eggs") == ParsedIngredient("eggs", 3.0, None)
+    assert parse_ingredient("1 T olive oil").unit == "tbsp"
+    assert parse_ingredient("basil") == ParsedIngredient("basil", None, None)
+
+
+def test_aggregate_merges_by_name_and_unit_with_servings():
+    rows = [
+        (1, "200 g pasta, 1 cup milk, salt"),
+        (2, "1 kg pasta\n2 cups milk\nSalt\n2 eggs"),
+    ]
+
+    items = {
+        (item.name, item.unit): item for item in aggregate(rows, servings={2: 0.5})
+    }
+
+    assert items[("pasta", "g")].quantity == 700.0
+    assert items[("milk", "cup")].quantity == 2.0
+    assert items[("salt", None)].quantity is None
+    assert items[("salt", None)].recipe_ids == [1, 2]
+    assert items[("eggs", None)].quantity == 1.0
+
+
+def test_shopping_list_endpoint_uses_one_query(client, db_session, test_engine):
+    recipes = [
+        Recipe(
+            title=f"Recipe {index}",
+            ingredients="2 cups rice, 1 onion",
+            instructions="Cook.",
+        )
+        for index in range(1500)
+    ]
+    db_session.add_all(recipes)
+    db_session.commit()
+    ids = [recipe.id for recipe in recipes]
+
+    statements = []
+    event.listen(
+        test_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    response = client.post(
+        "/shopping-list",
+        json={"recipe_ids": ids + [999999], "servings": {str(ids[0]): 3}},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["missing_recipe_ids"] == [999999]
+    rice = next(item for item in body["items"] if item["name"] == "rice")
+    assert rice["unit"] == "cup"
+    assert rice["quantity"] == 2 * 1499 + 6
+    assert len(rice["recipe_ids"]) == 1500
+    assert sum("FROM recipes" in statement for statement in statements) == 1
+
+    statements.clear()
+    repeated = client.post(
+        "/shopping-list",
+        json={"recipe_ids": [ids[0], ids[1], ids[0]], "servings": {str(ids[0]): 3}},
+    ).json()
+    rice = next(item for item in repeated["items"] if item["name"] == "rice")
+    assert rice["quantity"] == 2 * 3 * 2 + 2
+    assert rice["recipe_ids"] == [ids[0], ids[1]]
+    assert sum("FROM recipes" in statement for statement in statements) == 1
+
+    assert client.post("/shopping-list", json={"recipe_ids": []}).status_code == 422
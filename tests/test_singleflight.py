@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+
+import crud
+from schemas import RecipeCreate
+from singleflight import SingleFlight
+
+
+def _slow_call(counter, release, value="result"):
+    def run():
+        counter.append(1)
+        release.wait(timeout=2)
+        return value
+
+    return run
+
+
+def test_concurrent_sync_callers_share_one_execution():
+    flight = SingleFlight("test")
+    calls, release = [], threading.Event()
+    results = []
+
+    def worker():
+        results.append(flight.do("key", _slow_call(calls, release)))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["result"] * 5
+
+
+def test_async_follower_joins_sync_leader():
+    flight = SingleFlight("test")
+    calls, release = [], threading.Event()
+    leader = threading.Thread(
+        target=flight.do, args=("key", _slow_call(calls, release, "shared"))
+    )
+    leader.start()
+    time.sleep(0.02)
+
+    async def follower():
+        async def never_called():
+            raise AssertionError("follower should not run the work")
+
+        task = asyncio.ensure_future(flight.do_async("key", never_called))
+        await asyncio.sleep(0.02)
+        release.set()
+        return await task
+
+    assert asyncio.run(follower()) == "shared"
+    leader.join()
+    assert len(calls) == 1
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _followers(flight):
+    return sum(call.followers for call in list(flight._calls.values()))
+
+
+def test_invalidate_starts_a_new_flight_while_the_stale_one_runs():
+    flight = SingleFlight("test")
+    calls, release = [], threading.Event()
+    results = []
+
+    def stale_caller():
+        results.append(flight.do("key", _slow_call(calls, release, "stale")))
+
+    threads = [threading.Thread(target=stale_caller) for _ in range(2)]
+    threads[0].start()
+    _wait_for(lambda: calls)  # the leader is inside the slow call
+    threads[1].start()
+    _wait_for(lambda: _followers(flight) == 1)
+
+    flight.invalidate()
+    # A caller after the write runs its own call instead of joining.
+    fresh = []
+    caller = threading.Thread(target=lambda: fresh.append(flight.do("key", list)))
+    caller.start()
+    caller.join(timeout=1)
+    assert fresh == [[]], "joined the stale flight"
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["stale", "stale"]
+
+
+def test_a_failure_reaches_every_waiter_of_the_flight():
+    flight = SingleFlight("errors")
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait(timeout=2)
+        raise ValueError("boom")
+
+    def caller():
+        try:
+            flight.do("key", fail)
+        except ValueError as error:
+            errors.append(error)
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    started.wait(timeout=2)
+    followers = [threading.Thread(target=caller) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    _wait_for(lambda: _followers(flight) == 3)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert len(errors) == 4
+    assert all(error is errors[0] for error in errors)
+    assert not flight._calls
+
+
+def test_service_payloads_reflect_writes(db_session):
+    service = crud.RecipeService(crud.RecipeRepository(db_session))
+    service.create(
+        RecipeCreate(
+            title="Coalesced",
+            ingredients="x",
+            instructions="y",
+            cuisine="Italian",
+        )
+    )
+
+    payload, next_skip = service.filter_payload(cuisine="Italian")
+    assert b'"title":"Coalesced"' in payload
+    assert next_skip is None
+    assert service.get_payload(999) is None
@@ -0,0 +1,63 @@
+import json
+import logging
+
+import pytest
+from sqlalchemy import text
+
+import crud
+from slow_query_log import SlowQueryLog, _request_scope, fingerprint
+
+
+def test_fingerprint_ignores_literals_and_in_list_size():
+    assert fingerprint("SELECT * FROM recipes WHERE id IN (?, ?)") == fingerprint(
+        "select *  from recipes where id in (?, ?, ?, ?)"
+    )
+    assert fingerprint("SELECT 1 FROM t WHERE name = 'a'") == fingerprint(
+        "SELECT 2 FROM t WHERE name = 'bb'"
+    )
+    assert fingerprint("SELECT a FROM t") != fingerprint("SELECT b FROM t")
+
+
+@pytest.fixture
+def slow_records(test_engine, caplog):
+    SlowQueryLog(threshold_ms=0).install(test_engine)
+    caplog.set_level(logging.WARNING, logger="slow_query")
+
+    def records():
+        return [json.loads(record.getMessage()) for record in caplog.records]
+
+    return records
+
+
+def test_slow_statements_are_logged_with_plan_and_caller(db_session, slow_records):
+    token = _request_scope.set({"method": "GET", "path": "/recipes/search/x"})
+    try:
+        crud.RecipeRepository(db_session).search_documents("pasta")
+    finally:
+        _request_scope.reset(token)
+
+    (record,) = [r for r in slow_records() if "recipe_documents" in r["statement"]]
+    assert record["route"] == "GET /recipes/search/x"
+    assert record["repository_method"] == "RecipeRepository._document_rows"
+    assert record["parameters"][0] == "%pasta%"
+    assert record["full_scan"] is True
+    assert any(detail.startswith("SCAN") for detail in record["plan"])
+
+
+def test_indexed_lookup_is_not_flagged_as_scan(db_session, slow_records):
+    db_session.execute(
+        text("SELECT id FROM recipes WHERE cuisine = :cuisine"), {"cuisine": "Thai"}
+    )
+    (record,) = [r for r in slow_records() if "cuisine =" in r["statement"]]
+    assert record["full_scan"] is False
+    assert record["repository_method"] is None
+    assert record["parameters_truncated"] is False
+
+
+def test_truncated_parameters_are_flagged(db_session, slow_records):
+    db_session.execute(
+        text("SELECT id FROM recipes WHERE title = :title"), {"title": "x" * 500}
+    )
+    (record,) = [r for r in slow_records() if "title =" in r["statement"]]
+    assert record["parameters"][0] == "x" * 200 + "..."
+    assert record["parameters_truncated"] is True
@@ -0,0 +1,203 @@
+import pytest
+from sqlalchemy import text
+
+import crud
+import snapshots
+from config import Settings
+
+AUTH = {"Authorization": "Bearer bypass-snapshots"}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        snapshots,
+        "settings",
+        Settings(snapshot_dir=str(tmp_path), recipes_page_size=2),
+    )
+    monkeypatch.setattr(snapshots, "_stores", {})
+    return snapshots.active_store()
+
+
+def _create(client, title, cuisine, tags=()):
+    response = client.post(
+        "/recipes/",
+        json={
+            "title": title,
+            "ingredients": f"{title} ingredients",
+            "instructions": "Cook.",
+            "cuisine": cuisine,
+            "tags": list(tags),
+        },
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_shard_for_request_matches_only_exact_pages():
+    assert snapshots.shard_for_request("/recipes/", "", 2) == "page/0"
+    assert snapshots.shard_for_request("/recipes/", "skip=4&limit=2", 2) == "page/2"
+    assert snapshots.shard_for_request("/recipes/", "skip=3", 2) is None
+    assert snapshots.shard_for_request("/recipes/", "total=true", 2) is None
+    assert (
+        snapshots.shard_for_request("/recipes/filter/", "cuisine=Thai", 2)
+        == "cuisine/Thai"
+    )
+    assert (
+        snapshots.shard_for_request("/recipes/filter/", "cuisine=Thai&skip=2", 2)
+        is None
+    )
+    assert snapshots.shard_for_request("/tags/7/recipes", "", 2) == "tag/7"
+
+
+def test_snapshots_match_the_api_and_revalidate(client, db_session, store):
+    for index in range(5):
+        _create(client, f"Dish {index}", "Thai" if index % 2 else "Greek", ["quick"])
+    tag_id = client.get("/tags/").json()[0]["id"]
+
+    # Three pages, two cuisines and one tag.
+    assert snapshots.build(db_session, store) == 6
+    for path in ("/recipes/?skip=2&limit=2", "/recipes/filter/?cuisine=Thai"):
+        served = client.get(path)
+        assert served.headers["content-encoding"] == "gzip"
+        assert served.json() == client.get(path, headers=AUTH).json()
+
+    served = client.get(f"/tags/{tag_id}/recipes")
+    assert len(served.json()) == 5
+    assert served.json() == client.get(f"/tags/{tag_id}/recipes", headers=AUTH).json()
+
+    etag = client.get("/recipes/filter/?cuisine=Thai").headers["etag"]
+    revalidated = client.get(
+        "/recipes/filter/?cuisine=Thai", headers={"If-None-Match": etag}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+
+
+def test_large_facets_serve_their_first_page_and_point_at_the_next(
+    client, db_session, store, monkeypatch
+):
+    monkeypatch.setattr(crud, "settings", Settings(recipes_page_size=2))
+    for index in range(3):
+        _create(client, f"Dish {index}", "Greek")
+    snapshots.build(db_session, store)
+
+    served = client.get("/recipes/filter/?cuisine=Greek")
+    from_api = client.get("/recipes/filter/?cuisine=Greek", headers=AUTH)
+
+    assert "etag" in served.headers and "etag" not in from_api.headers
+    assert served.json() == from_api.json()
+    assert [recipe["title"] for recipe in served.json()] == ["Dish 0", "Dish 1"]
+    assert served.headers["X-Next-Skip"] == from_api.headers["X-Next-Skip"] == "2"
+
+
+def test_writes_refresh_only_affected_shards(client, db_session, store, outbox_worker):
+    for index in range(4):
+        _create(client, f"Dish {index}", "Thai" if index % 2 else "Greek")
+    snapshots.build(db_session, store)
+    before = dict(store.manifest()["shards"])
+    outbox_worker.run_once()  # events from the seed writes
+
+    first = client.get("/recipes/").json()
+    client.delete(f"/recipes/{first[0]['id']}")
+    outbox_worker.run_once()
+
+    after = store.manifest()["shards"]
+    assert after["cuisine/Thai"] == before["cuisine/Thai"]
+    assert after["cuisine/Greek"] != before["cuisine/Greek"]
+    assert after["page/0"] != before["page/0"]
+    assert "page/2" not in after
+    assert client.get("/recipes/").json() == client.get("/recipes/?limit=2").json()
+    assert [recipe["title"] for recipe in client.get("/recipes/").json()] == [
+        "Dish 1",
+        "Dish 2",
+    ]
+
+
+def test_tag_and_owner_changes_refresh_their_shards_after_commit(
+    client, db_session, store, outbox_worker, test_engine, monkeypatch
+):
+    owner_id = client.post("/users/", json={"email": "a@example.com"}).json()["id"]
+    for title, cuisine, tags in (
+        ("A", "Thai", ["spicy"]),
+        ("B", "Greek", []),
+        ("C", "Greek", []),
+        ("D", "Italian", ["spicy"]),
+        ("E", "Greek", ["quick"]),
+    ):
+        _create(client, title, cuisine, tags)
+    client.put(
+        "/recipes/1",
+        json={
+            "title": "A",
+            "ingredients": "A ingredients",
+            "instructions": "Cook.",
+            "cuisine": "Thai",
+            "tags": ["spicy"],
+            "owner_id": owner_id,
+        },
+    ).raise_for_status()
+    outbox_worker.run_once()
+    snapshots.build(db_session, store)
+    tags = {tag["name"]: tag["id"] for tag in client.get("/tags/").json()}
+    before = dict(store.manifest()["shards"])
+
+    published_while = []
+    publish = store.publish
+
+    def record_pending(shards, replace=False):
+        with test_engine.connect() as conn:
+            published_while.append(
+                conn.execute(
+                    text(
+                        "SELECT count(*) FROM outbox_events "
+                        "WHERE topic != 'snapshots.refresh' AND status != 'done'"
+                    )
+                ).scalar()
+            )
+        publish(shards, replace)
+
+    monkeypatch.setattr(store, "publish", record_pending)
+    client.put(f"/tags/{tags['spicy']}", json={"name": "hot"})
+    outbox_worker.run_once()
+
+    # Rendered by the follow-up event, after the rename's event committed.
+    assert published_while == [0]
+    after = store.manifest()["shards"]
+    changed = {shard for shard in before if after.get(shard) != before[shard]}
+    assert changed == {
+        "page/0",
+        "page/1",
+        "cuisine/Thai",
+        "cuisine/Italian",
+        f"tag/{tags['spicy']}",
+    }
+    assert client.get("/recipes/").json()[0]["tags"] == [
+        {"id": tags["spicy"], "name": "hot"}
+    ]
+
+    client.put(f"/users/{owner_id}", json={"email": "a@example.com", "name": "Ada"})
+    outbox_worker.run_once()
+    changed = {
+        shard
+        for shard, etag in after.items()
+        if store.manifest()["shards"][shard] != etag
+    }
+    assert changed == {"page/0", "cuisine/Thai", f"tag/{tags['spicy']}"}
+    assert (
+        client.get("/recipes/filter/?cuisine=Thai").json()[0]["owner"]["name"] == "Ada"
+    )
+
+    client.post(f"/tags/{tags['quick']}/merge", json={"target_id": tags["spicy"]})
+    outbox_worker.run_once()
+    assert f"tag/{tags['quick']}" not in store.manifest()["shards"]
+    assert len(client.get(f"/tags/{tags['spicy']}/recipes").json()) == 3
+
+
+def test_disabled_snapshots_fall_through(client, monkeypatch):
+    monkeypatch.setattr(snapshots, "settings", Settings(snapshot_dir=""))
+
+    response = client.get("/recipes/")
+
+    assert response.status_code == 200
+    assert "etag" not in response.headers
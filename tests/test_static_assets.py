@@ -0,0 +1,70 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import static_assets
+
+
+@pytest.fixture
+def build_dir(tmp_path):
+    js_dir = tmp_path / "static" / "js"
+    js_dir.mkdir(parents=True)
+    (js_dir / "main.1a2b3c4d.js").write_text("console.log('recipes');" * 100)
+    (tmp_path / "index.html").write_text("<html><body>app</body></html>" * 20)
+    static_assets.precompress(str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def frontend_client(build_dir):
+    app = FastAPI()
+
+    @app.get("/recipes/")
+    def recipes():
+        return []
+
+    static_assets.mount_frontend(app, str(build_dir))
+    with TestClient(app) as client:
+        yield client
+
+
+def test_precompress_writes_gzip_siblings(build_dir):
+    compressed = build_dir / "static" / "js" / "main.1a2b3c4d.js.gz"
+    original = build_dir / "static" / "js" / "main.1a2b3c4d.js"
+    assert gzip.decompress(compressed.read_bytes()) == original.read_bytes()
+
+
+def test_hashed_assets_are_immutable_and_negotiated(frontend_client):
+    response = frontend_client.get(
+        "/static/js/main.1a2b3c4d.js", headers={"accept-encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/javascript")
+    assert response.headers["cache-control"] == static_assets.IMMUTABLE_CACHE_CONTROL
+    assert response.text.startswith("console.log")
+
+    plain = frontend_client.get(
+        "/static/js/main.1a2b3c4d.js", headers={"accept-encoding": "identity"}
+    )
+    assert "content-encoding" not in plain.headers
+
+
+def test_index_is_served_from_memory_with_etag(frontend_client):
+    response = frontend_client.get("/some/client/route")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+
+    revalidated = frontend_client.get("/another/route", headers={"if-none-match": etag})
+    assert revalidated.status_code == 304
+
+
+def test_api_routes_are_not_shadowed(frontend_client):
+    assert frontend_client.get("/recipes/").json() == []
+    assert frontend_client.get("/recipes/unknown/path").status_code == 404
+    unknown_admin = frontend_client.get("/admin/unknown")
+    assert unknown_admin.status_code == 404
+    assert unknown_admin.json() == {"detail": "Not Found"}
@@ -0,0 +1,104 @@
+import json
+
+from prometheus_client import REGISTRY
+
+import crud
+from config import Settings
+from models import Recipe
+
+
+def _streamed_count():
+    return (
+        REGISTRY.get_sample_value(
+            "recipes_response_first_byte_seconds_count", {"mode": "streamed"}
+        )
+        or 0
+    )
+
+
+def _seed(db_session, count):
+    db_session.add_all(
+        Recipe(
+            title=f"Recipe {index}",
+            ingredients="rice",
+            instructions="cook",
+            cuisine="Thai" if index % 2 else "Italian",
+        )
+        for index in range(count)
+    )
+    db_session.commit()
+
+
+def test_large_pages_stream_in_chunks_and_respect_the_cap(
+    client, db_session, monkeypatch
+):
+    _seed(db_session, 12)
+    monkeypatch.setattr(
+        crud,
+        "settings",
+        Settings(
+            recipes_max_page_size=9,
+            recipes_stream_threshold=3,
+            recipes_stream_chunk_size=2,
+        ),
+    )
+    before = _streamed_count()
+
+    response = client.get("/recipes/", params={"skip": 1, "limit": 1000})
+
+    assert response.status_code == 200
+    assert "content-length" not in response.headers
+    titles = [recipe["title"] for recipe in json.loads(response.content)]
+    assert titles == [f"Recipe {index}" for index in range(1, 10)]
+    assert _streamed_count() == before + 1
+
+    italian = client.get("/recipes/filter/", params={"cuisine": "Italian"}).json()
+    assert [recipe["title"] for recipe in italian] == [
+        f"Recipe {index}" for index in range(0, 12, 2)
+    ]
+    searched = client.get("/recipes/search/Recipe", params={"skip": 10}).json()
+    assert [recipe["title"] for recipe in searched] == ["Recipe 10", "Recipe 11"]
+
+
+def test_search_and_filter_pages_point_at_the_next_page(
+    client, db_session, monkeypatch
+):
+    _seed(db_session, 12)
+    monkeypatch.setattr(
+        crud,
+        "settings",
+        Settings(
+            recipes_page_size=5,
+            recipes_stream_threshold=2,
+            recipes_stream_chunk_size=1,
+        ),
+    )
+
+    titles, skip = [], 0
+    while skip is not None:
+        page = client.get("/recipes/search/Recipe", params={"skip": skip})
+        assert len(page.json()) <= 5
+        titles += [recipe["title"] for recipe in page.json()]
+        skip = page.headers.get("X-Next-Skip")
+    assert titles == [f"Recipe {index}" for index in range(12)]
+
+    # Streamed pages (past the threshold of 2) look past their end up front.
+    thai = {"cuisine": "Thai"}
+    assert client.get("/recipes/filter/", params=thai).headers["X-Next-Skip"] == "5"
+    last = client.get("/recipes/filter/", params={**thai, "limit": 6})
+    assert len(last.json()) == 6 and "X-Next-Skip" not in last.headers
+
+
+def test_small_pages_stay_buffered(client, db_session, monkeypatch):
+    _seed(db_session, 5)
+    monkeypatch.setattr(crud, "settings", Settings(recipes_stream_threshold=10))
+
+    response = client.get("/recipes/", params={"limit": 10})
+
+    assert response.headers["content-length"] == str(len(response.content))
+    assert len(response.json()) == 5
+
+
+def test_settings_clamp_page_sizes():
+    settings = Settings(recipes_page_size=50_000, recipes_max_page_size=1000)
+    assert settings.recipes_page_size == 1000